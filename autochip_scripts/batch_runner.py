@@ -0,0 +1,227 @@
+import getopt
+import json
+import os
+import sys
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from time import time
+
+import config_handler as c
+import llm_cache
+import model_pool
+import model_router
+import search_scheduler
+import tree_search
+
+usage = """
+    Usage: python batch_runner.py [options]
+    Runs AutoChip on every prompt in a directory laid out like the VerilogEval suites:
+    <prompt_dir>/<name>/<name>.sv (prompt) and <prompt_dir>/<name>/<name>_tb.sv (testbench).
+    Options:
+      -h, --help                      Show help
+      -c, --config <file>             Config file for the remaining settings (default: config.json)
+      -d, --prompt-dir <directory>    Directory of prompt/testbench pairs
+      -o, --outdir <directory>        Output directory, one subdirectory per prompt
+      -n, --name <name>               Module name expected by the testbenches (default: top_module)
+      -i, --iter <iterations>         Number of iterations
+      -f, --model-family <family>     Model family (e.g., ChatGPT, Claude)
+      -m, --model-id <id>             Model ID (e.g., gpt-4)
+      -k, --num-candidates <number>   Number of candidates
+      -j, --jobs <number>             Prompts worked on at the same time (default: 4)
+      --llm-concurrency <number>      LLM requests in flight across all prompts (default: 4)
+      --sim-seats <number>            Simulations running at the same time (default: CPU count)
+      --simulator <name>              Simulator backend
+      --rerun                         Run prompts again even if they already finished
+"""
+
+RESULT_FILE = "result.json"
+
+
+def find_prompts(prompt_dir):
+    """Return (name, prompt file, testbench file) for every complete prompt directory, sorted by name."""
+    prompts = []
+    for name in sorted(os.listdir(prompt_dir)):
+        path = os.path.join(prompt_dir, name)
+        prompt_file = os.path.join(path, f"{name}.sv")
+        testbench_file = os.path.join(path, f"{name}_tb.sv")
+        if not os.path.isdir(path):
+            continue
+        if not (os.path.exists(prompt_file) and os.path.exists(testbench_file)):
+            print(f"Warning: Skipping {name}: missing {name}.sv or {name}_tb.sv")
+            continue
+        prompts.append((name, os.path.abspath(prompt_file), os.path.abspath(testbench_file)))
+    return prompts
+
+
+def load_result(prompt_outdir):
+    """Return the recorded result of a finished prompt, or None if it has not finished."""
+    try:
+        with open(os.path.join(prompt_outdir, RESULT_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_result(prompt_outdir, result):
+    # Written last and atomically, so a prompt interrupted mid-run is simply run again on resume
+    path = os.path.join(prompt_outdir, RESULT_FILE)
+    with open(path + ".tmp", 'w') as f:
+        json.dump(result, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def run_prompt(name, prompt_file, testbench_file, settings, executor, llm_semaphore):
+    """Run the generate/evaluate loop for one prompt and record its result."""
+    prompt_outdir = os.path.join(settings['outdir'], name)
+    os.makedirs(prompt_outdir, exist_ok=True)
+    with open(prompt_file, 'r') as f:
+        prompt = f.read()
+
+    start_time = time()
+    scheduler = search_scheduler.from_config(settings)
+    best = tree_search.search_loop(settings)(
+        prompt, settings['name'], testbench_file, settings['iterations'], settings.get('model_family'),
+        settings.get('model_id', ""), settings['num_candidates'], prompt_outdir,
+        os.path.join(prompt_outdir, settings['log']) if settings.get('log') else None,
+        settings.get('mixed_model_config', {}), executor=executor, llm_semaphore=llm_semaphore,
+        simulator=settings['simulator'], shared_testbench=settings['shared_testbench'],
+        syntax_prescreen=settings['syntax_prescreen'], early_stop=settings['early_stop'],
+        context_tokens=settings['context_tokens'], context_policy=settings['context_policy'],
+        vcd_windows=settings['vcd_windows'], early_abort=settings['early_abort'],
+        mismatch_budget=settings['mismatch_budget'], scheduler=scheduler,
+        router=model_router.from_config(settings, settings.get('mixed_model_config', {})), cache_dir=settings['cache_dir'],
+        persistent_simulator=settings['persistent_simulator'], syntax_simulator=settings['syntax_simulator'])
+
+    result = {
+        "name": name,
+        "success": best.mismatches == 0,
+        "mismatches": best.mismatches if best.mismatches != float('inf') else None,
+        "rank": best.rank,
+        "seconds": round(time() - start_time, 2),
+        "tokens": scheduler.tokens_used,
+        "sim_seconds": round(scheduler.sim_seconds, 2),
+    }
+    write_result(prompt_outdir, result)
+    return result
+
+
+def run_batch(prompts, settings, jobs=4, llm_concurrency=4, sim_seats=None, rerun=False):
+    """Run every prompt, resuming from the results already in settings['outdir'].
+
+    Prompts run in threads that share one process pool for simulation, so sim_seats caps
+    concurrent simulations and llm_concurrency caps concurrent LLM requests independently.
+    Returns the results of all prompts, including ones finished by an earlier run.
+    """
+    results = {}
+    pending = []
+    for name, prompt_file, testbench_file in prompts:
+        previous = None if rerun else load_result(os.path.join(settings['outdir'], name))
+        if previous is not None:
+            print(f"Skipping {name}: already finished")
+            results[name] = previous
+        else:
+            pending.append((name, prompt_file, testbench_file))
+
+    print(f"Running {len(pending)} of {len(prompts)} prompts")
+    llm_semaphore = threading.BoundedSemaphore(llm_concurrency)
+    with ProcessPoolExecutor(max_workers=sim_seats or os.cpu_count()) as sim_pool, \
+         ThreadPoolExecutor(max_workers=max(1, jobs)) as prompt_pool:
+        futures = {
+            prompt_pool.submit(run_prompt, name, prompt_file, testbench_file, settings, sim_pool, llm_semaphore): name
+            for name, prompt_file, testbench_file in pending
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+                print(f"Finished {name}: {'PASS' if results[name]['success'] else 'FAIL'} "
+                      f"in {results[name]['seconds']}s")
+            except Exception:
+                # No result file is written, so the prompt is retried on the next run
+                print(f"Error: {name} failed:\n{traceback.format_exc()}")
+    return [results[name] for name, _, _ in prompts if name in results]
+
+
+def main():
+    try:
+        opts, _ = getopt.getopt(
+            sys.argv[1:],
+            "hc:d:o:n:i:f:m:k:j:",
+            ["help", "config=", "prompt-dir=", "outdir=", "name=", "iter=", "model-family=", "model-id=",
+             "num-candidates=", "jobs=", "llm-concurrency=", "sim-seats=", "simulator=", "rerun"]
+        )
+    except getopt.GetoptError as err:
+        print(err)
+        print(usage)
+        sys.exit(2)
+
+    config_file = "config.json"
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print(usage)
+            sys.exit()
+        elif opt in ("-c", "--config"):
+            config_file = arg
+
+    settings, mixed_model_config = c.load_config(config_file) if os.path.exists(config_file) else ({}, {})
+    prompt_dir = None
+    jobs, llm_concurrency, sim_seats, rerun = 4, 4, None, False
+    for opt, arg in opts:
+        if opt in ("-d", "--prompt-dir"):
+            prompt_dir = arg
+        elif opt in ("-o", "--outdir"):
+            settings['outdir'] = arg
+        elif opt in ("-n", "--name"):
+            settings['name'] = arg
+        elif opt in ("-i", "--iter"):
+            settings['iterations'] = int(arg)
+        elif opt in ("-f", "--model-family"):
+            settings['model_family'] = arg
+        elif opt in ("-m", "--model-id"):
+            settings['model_id'] = arg
+        elif opt in ("-k", "--num-candidates"):
+            settings['num_candidates'] = int(arg)
+        elif opt in ("-j", "--jobs"):
+            jobs = int(arg)
+        elif opt == "--llm-concurrency":
+            llm_concurrency = int(arg)
+        elif opt == "--sim-seats":
+            sim_seats = int(arg)
+        elif opt == "--simulator":
+            settings['simulator'] = arg
+        elif opt == "--rerun":
+            rerun = True
+
+    if not prompt_dir or 'outdir' not in settings:
+        print("A prompt directory and an output directory are required.")
+        print(usage)
+        sys.exit(2)
+
+    # The single-prompt options do not apply to a batch
+    settings.pop('prompt', None)
+    settings.pop('testbench', None)
+    settings['name'] = settings.get('name') if settings.get('name') not in (None, "") else "top_module"
+    settings.setdefault('log', "conversation.jsonl")
+    c.apply_defaults(settings)
+    # Prompts share the process-wide model pool, so local weights load once for the whole batch
+    model_pool.configure(max_memory_gb=settings['model_memory_gb'], device=settings['model_device'])
+    response_cache = llm_cache.configure(settings['llm_cache_dir'], settings['llm_cache_mode'])
+    if mixed_model_config:
+        settings['mixed_model_config'] = c.validate_mixed_model_config(mixed_model_config, settings['iterations'])
+    settings['outdir'] = os.path.abspath(settings['outdir'])
+    os.makedirs(settings['outdir'], exist_ok=True)
+
+    start_time = time()
+    results = run_batch(find_prompts(prompt_dir), settings, jobs, llm_concurrency, sim_seats, rerun)
+    passed = sum(1 for result in results if result['success'])
+    summary = {"passed": passed, "finished": len(results), "results": results}
+    with open(os.path.join(settings['outdir'], "summary.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    if response_cache:
+        print(response_cache.report())
+    print(f"{passed}/{len(results)} prompts passed in {time() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
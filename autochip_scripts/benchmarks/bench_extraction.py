@@ -0,0 +1,104 @@
+"""Time module extraction on adversarial LLM responses, old regex pipeline vs. the tokenizer.
+
+The corpus is generated, so no files are needed:
+
+    python benchmarks/bench_extraction.py --scale 1.0 --timeout 10
+
+Each case runs in a child process so a catastrophically backtracking regex is reported as a
+timeout instead of hanging the benchmark.
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import verilog_extract
+
+GOOD_MODULE = """module top_module #(parameter WIDTH = 8) (
+    input clk,
+    input [WIDTH-1:0] a,
+    output reg [WIDTH-1:0] q
+);
+    always @(posedge clk) q <= a;
+endmodule"""
+
+
+def build_corpus(scale):
+    n = max(1, int(1000 * scale))
+    return {
+        "typical response": "Here is the implementation:\n```verilog\n" + GOOD_MODULE + "\n```\nThis module registers a.\n",
+        "huge prose after code": "```verilog\n" + GOOD_MODULE + "\n```\n" + "The design works as follows. " * (n * 40),
+        "many modules": "\n\n".join(GOOD_MODULE.replace("top_module", f"m{i}") for i in range(n)),
+        "unbalanced parentheses": "module top_module(input a, output b;\n" + "assign b = (a & (a | (a ;\n" * n,
+        "nested port lists": ("module top_module #(parameter W = ((1 + (2 * (3 + 4))))) (input [(W*(2+1))-1:0] a, "
+                              "output [W-1:0] b);\n" + "assign b = a[(W-1):0];\n" * n + "endmodule\n"),
+        "headers without endmodule": "module top_module(input a);\n" * n,
+        "module in prose": "This module implements a module that drives the module output.\n" * n + GOOD_MODULE,
+        "unterminated comment": "/* " + "module top_module(input a); assign x = a; " * n,
+    }
+
+
+# The extraction regexes previously used by find_verilog_modules
+_OLD_PATTERNS = [
+    (r'(?:^|\n)\s*(?:`timescale\s+[^`\n]*\s*\n)?\s*(?:`define\s+[^`\n]*\s*\n)*\s*module\s+[\w\\_]+\s*(?:#\s*\([^)]*\))?\s*\([^)]*\)\s*;.*?endmodule',
+     re.DOTALL | re.MULTILINE),
+    (r'module\s+[\w\\_]+\s*(?:#\s*\([^)]*\))?\s*\([^)]*\)\s*;.*?endmodule', re.DOTALL),
+]
+
+
+def old_extract(text):
+    text = re.sub(r'```verilog|```', '', text)
+    text = re.sub(r"Here's .*?:\s*", '', text)
+    text = re.sub(r"Here is .*?:\s*", '', text)
+    text = re.sub(r'\n\s*\n', '\n\n', text).strip()
+    for pattern, flags in _OLD_PATTERNS:
+        matches = re.findall(pattern, text, flags)
+        if matches:
+            return [match.strip() for match in matches]
+    return []
+
+
+def _timed(function, text, queue):
+    start = time.perf_counter()
+    modules = function(text)
+    queue.put((time.perf_counter() - start, len(modules)))
+
+
+def measure(function, text, timeout):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_timed, args=(function, text, queue))
+    process.start()
+    process.join(timeout)
+    if process.is_alive():
+        process.kill()
+        process.join()
+        return None
+    return queue.get()
+
+
+def describe(result):
+    if result is None:
+        return f"{'timeout':>10} {'':>8}"
+    seconds, modules = result
+    return f"{seconds * 1000:>8.1f}ms {modules:>8}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the size of every case")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds before a case counts as hung")
+    args = parser.parse_args()
+
+    print(f"{'case':<28} {'size':>9} {'regex':>10} {'modules':>8} {'tokenizer':>10} {'modules':>8}")
+    for name, text in build_corpus(args.scale).items():
+        old = measure(old_extract, text, args.timeout)
+        new = measure(verilog_extract.extract_modules, text, args.timeout)
+        print(f"{name:<28} {len(text):>9} {describe(old)} {describe(new)}")
+
+
+if __name__ == "__main__":
+    main()
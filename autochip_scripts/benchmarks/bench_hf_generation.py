@@ -0,0 +1,111 @@
+"""Compare per-candidate generate calls against batched sampling for local models.
+
+Also measures time-to-first-token over a growing conversation with and without the
+prompt-prefix KV cache. Runs a tiny Hugging Face model on the CPU by default, so it needs transformers and torch
+but no GPU or large download:
+
+    python benchmarks/bench_hf_generation.py --model sshleifer/tiny-gpt2 --candidates 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import languagemodels as lm
+from conversation import Conversation
+
+
+def make_conversation():
+    conversation = Conversation()
+    conversation.add_message("system", "You are a Verilog code generator.")
+    conversation.add_message("user", "Implement module top_module(input a, input b, output out) computing a AND b.")
+    return conversation
+
+
+def count_tokens(model, completions):
+    return sum(len(model.tokenizer(text, add_special_tokens=False)["input_ids"]) for text in completions)
+
+
+def run(label, model, generate, candidates):
+    start = time.perf_counter()
+    completions = generate()
+    elapsed = time.perf_counter() - start
+    tokens = count_tokens(model, completions)
+    print(f"{label:<32} {elapsed:>8.2f}s {tokens:>8} tokens {tokens / elapsed:>10.1f} tokens/s "
+          f"({candidates / elapsed:.2f} candidates/s)")
+
+
+def generate_per_candidate(model, conversation, candidates):
+    """The loop local models ran before batching: one plain model.generate call per candidate."""
+    inputs = model.tokenizer(model._format_prompt(conversation), return_tensors="pt").to(model.device)
+    completions = []
+    with model.torch.inference_mode():
+        for _ in range(candidates):
+            output = model.model.generate(inputs["input_ids"], attention_mask=inputs["attention_mask"],
+                                          max_new_tokens=model.max_new_tokens, **model.sampling,
+                                          pad_token_id=model.tokenizer.pad_token_id)
+            completions.append(model.tokenizer.decode(output[0, inputs["input_ids"].shape[1]:],
+                                                      skip_special_tokens=True))
+    return completions
+
+
+def time_to_first_token(model, iterations):
+    """Seconds per single-token generation while the conversation grows like verilog_loop's."""
+    conversation = make_conversation()
+    model_tokens = model.max_new_tokens
+    model.max_new_tokens = 1
+    timings = []
+    try:
+        for iteration in range(iterations):
+            start = time.perf_counter()
+            model.generate_batch([conversation], 1)
+            timings.append(time.perf_counter() - start)
+            conversation.add_message("assistant", f"module top_module(input a, input b, output out); // attempt {iteration}\n"
+                                                  "assign out = a | b;\nendmodule")
+            conversation.add_message("user", "Detected 4 mismatches out of 20 samples\n- Signal out: 4 mismatches")
+    finally:
+        model.max_new_tokens = model_tokens
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="sshleifer/tiny-gpt2")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--candidates", type=int, default=5)
+    parser.add_argument("--prompts", type=int, default=4, help="concurrent prompts for the multi-prompt batch")
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--iterations", type=int, default=5, help="conversation turns for the time-to-first-token run")
+    args = parser.parse_args()
+
+    lm.HuggingFaceLLM.max_new_tokens = args.max_new_tokens
+    model = lm.HuggingFaceLLM(args.model, device=args.device)
+    conversation = make_conversation()
+    k = args.candidates
+
+    # Batching is measured on its own; the prefix cache is compared below
+    prefix_cache = model.prefix_cache
+    model.prefix_cache = None
+    # Warm up so one-time initialisation is not billed to the first mode
+    model.generate_batch([conversation], 1)
+
+    print(f"{args.model} on {model.device}, {k} candidates, up to {args.max_new_tokens} new tokens each")
+    run("one generate call per candidate", model, lambda: generate_per_candidate(model, conversation, k), k)
+    run("one call for all candidates", model,
+        lambda: model.generate_batch([conversation], k)[0], k)
+    run(f"{args.prompts} prompts in one batch", model,
+        lambda: [text for texts in model.generate_batch([conversation] * args.prompts, k) for text in texts],
+        k * args.prompts)
+
+    for label, cache in (("without prefix cache", None), ("with prefix cache", prefix_cache)):
+        model.prefix_cache = cache
+        if cache is not None:
+            cache.clear()
+        timings = time_to_first_token(model, args.iterations)
+        print(f"time to first token {label:<21} " + " ".join(f"{t * 1000:7.1f}ms" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Measure the startup cost of the AutoChip modules and of each model provider's SDK.
+
+Every measurement runs in a fresh interpreter so earlier imports do not hide later ones:
+
+    python benchmarks/bench_imports.py --repeat 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter: import the target, then report seconds and peak RSS
+PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, {scripts_dir!r})
+start = time.perf_counter()
+error = None
+try:
+    {statement}
+except ImportError as e:
+    error = str(e)
+elapsed = time.perf_counter() - start
+# On Linux ru_maxrss keeps the parent's peak across fork and exec, so VmHWM is read when it exists
+try:
+    with open("/proc/self/status") as f:
+        rss_kb = int(next(line.split()[1] for line in f if line.startswith("VmHWM:")))
+except (OSError, StopIteration):
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss_kb / 1024, "error": error}}))
+"""
+
+
+def measure(statement, repeat):
+    """Return the fastest of repeat fresh-interpreter runs of statement."""
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(scripts_dir=SCRIPTS_DIR, statement=statement)],
+            stdout=subprocess.PIPE, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    import languagemodels as lm
+
+    targets = [
+        ("python (baseline)", "pass"),
+        ("languagemodels", "import languagemodels"),
+        ("verilog_handling", "import verilog_handling"),
+    ]
+    for family, cls in sorted(lm.MODEL_REGISTRY.items()):
+        if cls.sdk_modules:
+            targets.append((f"{family} SDK ({', '.join(cls.sdk_modules)})",
+                            f"import languagemodels; languagemodels.get_model_class({family!r}).load_sdk()"))
+
+    print(f"{'import':<50} {'seconds':>8} {'peak RSS MB':>12}")
+    for label, statement in targets:
+        result = measure(statement, args.repeat)
+        if result["error"]:
+            print(f"{label:<50} {'not installed':>21}")
+        else:
+            print(f"{label:<50} {result['seconds']:>8.3f} {result['rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
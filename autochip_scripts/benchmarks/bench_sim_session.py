@@ -0,0 +1,79 @@
+"""Compare one vsimsa process per candidate against a persistent simulator session.
+
+Both modes run through RivieraPROBackend against the scripted fake simulator in
+fake_vsimsa.py, so the numbers isolate the fixed per-process cost:
+
+    python benchmarks/bench_sim_session.py --designs 20 --startup 1.0
+"""
+import argparse
+import os
+import stat
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rivierapro_backend import RivieraPROBackend
+from simulator_session import SimulatorSession
+
+FAKE_TOOLS = {
+    "vlib": "#!/bin/sh\nmkdir -p \"$1\"\n",
+    "vlog": "#!/bin/sh\necho \"Compile success 0 Errors 0 Warnings\"\n",
+    "vsimsa": f"#!/bin/sh\nexec \"{sys.executable}\" \"{os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_vsimsa.py')}\" \"$@\"\n",
+}
+
+
+def install_fake_tools(bin_dir):
+    for name, script in FAKE_TOOLS.items():
+        path = os.path.join(bin_dir, name)
+        with open(path, 'w') as f:
+            f.write(script)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+
+
+def run_designs(root, count, session):
+    testbench = os.path.join(root, "tb.sv")
+    with open(testbench, 'w') as f:
+        f.write("module tb; top_module dut(); endmodule\n")
+
+    start = time.perf_counter()
+    for idx in range(count):
+        run_dir = os.path.join(root, f"{'session' if session else 'process'}{idx}")
+        os.makedirs(run_dir, exist_ok=True)
+        design = os.path.join(run_dir, "top_module.sv")
+        with open(design, 'w') as f:
+            f.write(f"module top_module; // candidate {idx}\nendmodule\n")
+        backend = RivieraPROBackend(design, testbench, run_dir=run_dir, session=session)
+        backend.compile()
+        backend.simulate()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--designs", type=int, default=20)
+    parser.add_argument("--startup", type=float, default=1.0, help="fake simulator startup seconds")
+    parser.add_argument("--run", type=float, default=0.05, help="fake simulation seconds per design")
+    args = parser.parse_args()
+
+    os.environ["FAKE_VSIMSA_STARTUP"] = str(args.startup)
+    os.environ["FAKE_VSIMSA_RUN"] = str(args.run)
+
+    with tempfile.TemporaryDirectory() as root:
+        install_fake_tools(root)
+        per_process = run_designs(root, args.designs, None)
+        session = SimulatorSession()
+        try:
+            persistent = run_designs(root, args.designs, session)
+        finally:
+            session.close()
+
+    print(f"\n{args.designs} designs, {args.startup}s startup, {args.run}s per run")
+    print(f"one process per design: {per_process:.2f}s ({args.designs / per_process:.2f} designs/s)")
+    print(f"persistent session:     {persistent:.2f}s ({args.designs / persistent:.2f} designs/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Time mismatch-window extraction on a generated VerilogEval-style waveform dump.
+
+    python benchmarks/bench_vcd.py --megabytes 300 --windows 3 [--trace-memory]
+
+The dump is written to a temporary directory and removed afterwards. With --trace-memory
+a second, much slower read reports the peak Python heap, showing the file is streamed
+through a memory map rather than loaded (mapped pages are shared page cache).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vcd_reader
+
+HEADER = """$timescale 1ps $end
+$scope module tb $end
+$scope module stim1 $end
+$var reg 1 ! clk $end
+$upscope $end
+$var wire 1 " tb_mismatch $end
+$var reg 1 # ring $end
+$var reg 8 $ data [7:0] $end
+$var logic 1 % out_ref $end
+$var logic 1 & out_dut $end
+$var logic 8 ' q_ref [7:0] $end
+$var logic 8 ( q_dut [7:0] $end
+$upscope $end
+$enddefinitions $end
+#0
+$dumpvars
+0!
+0"
+0#
+b0 $
+0%
+0&
+b0 '
+b0 (
+$end
+"""
+
+
+def write_dump(path, megabytes, mismatch_every):
+    """Write a dump where q disagrees every mismatch_every steps and out only in the last steps."""
+    target = megabytes * 1024 * 1024
+    with open(path, 'w') as f:
+        f.write(HEADER)
+        step = 1
+        written = len(HEADER)
+        while written < target:
+            lines = []
+            for _ in range(10000):
+                value = step % 256
+                q_dut = value ^ 1 if step % mismatch_every == 0 else value
+                lines.append(f"#{step * 10}\n{step % 2}!\n{step % 3 % 2}#\nb{value:b} $\n"
+                             f"b{value:b} '\nb{q_dut:b} (\n")
+                step += 1
+            chunk = "".join(lines)
+            f.write(chunk)
+            written += len(chunk)
+        f.write(f"#{step * 10}\n1&\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=300, help="size of the generated dump")
+    parser.add_argument("--windows", type=int, default=3, help="mismatch windows to collect per output")
+    parser.add_argument("--mismatch-every", type=int, default=5000, help="timesteps between q mismatches")
+    parser.add_argument("--max-megabytes", type=int, default=vcd_reader.MAX_BYTES // (1024 * 1024),
+                        help="value changes to read at most (0 reads the whole dump)")
+    parser.add_argument("--trace-memory", action="store_true", help="also report the peak Python heap")
+    args = parser.parse_args()
+
+    max_bytes = args.max_megabytes * 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "wave.vcd")
+        write_dump(path, args.megabytes, args.mismatch_every)
+        start = time.perf_counter()
+        windows = vcd_reader.mismatch_windows(path, args.windows, max_bytes=max_bytes)
+        elapsed = time.perf_counter() - start
+        print(f"dump: {os.path.getsize(path) / 1e6:.0f} MB, read in {elapsed:.2f}s")
+        print("\n".join(vcd_reader.format_mismatch_windows(windows)))
+
+        if args.trace_memory:
+            tracemalloc.start()
+            vcd_reader.mismatch_windows(path, args.windows, max_bytes=max_bytes)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"peak Python heap while reading: {peak / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Scripted stand-in for vsimsa used by the benchmarks.
+
+It pays a fixed startup cost (FAKE_VSIMSA_STARTUP seconds, modelling tool start and
+license checkout) and a per-run cost (FAKE_VSIMSA_RUN seconds), then prints the same
+summary lines the VerilogEval testbenches print. Commands are read from a do-file when
+started with -do, and from stdin otherwise.
+"""
+import os
+import sys
+import time
+
+
+def execute(command):
+    words = command.strip().rstrip(';').split()
+    if not words:
+        return True
+    if words[0] == "echo":
+        print(" ".join(words[1:]), flush=True)
+    elif words[0] == "cd":
+        os.chdir(" ".join(words[1:]).strip("{}"))
+    elif words[0] == "run":
+        time.sleep(float(os.environ.get("FAKE_VSIMSA_RUN", "0.05")))
+        print("Hint: Output 'out' has 2 mismatches. First mismatch occurred at time 40.", flush=True)
+        print("Hint: Total mismatched samples is 2 out of 100 samples", flush=True)
+        print("Mismatches: 2 in 100 samples", flush=True)
+    elif words[0] == "quit":
+        return False
+    return True
+
+
+def main():
+    time.sleep(float(os.environ.get("FAKE_VSIMSA_STARTUP", "1.0")))
+    if len(sys.argv) > 2 and sys.argv[1] == "-do":
+        with open(sys.argv[2]) as do_file:
+            for command in do_file:
+                if not execute(command):
+                    break
+        return
+    for command in sys.stdin:
+        if not execute(command):
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,282 @@
-import os
-
-class Conversation:
-    """A class to manage conversation messages, supporting logging, retrieval, and modification."""
-    
-    def __init__(self, log_file=None):
-        self.messages = []
-        self.log_file = log_file
-
-        # Initialize the log file by clearing it if it already exists
-        if self.log_file and os.path.exists(self.log_file):
-            open(self.log_file, 'w').close()
-
-    def add_message(self, role, content):
-        """Add a new message to the conversation and log it if a log file is set."""
-        self.messages.append({'role': role, 'content': content})
-        
-        # Append the new message to the log file
-        if self.log_file:
-            with open(self.log_file, 'a') as file:
-                file.write(f"{role}: {content}\n")
-
-    def get_messages(self):
-        """Retrieve all messages in the conversation."""
-        return self.messages
-
-    def get_last_n_messages(self, n):
-        """Retrieve the last n messages from the conversation."""
-        return self.messages[-n:] if n <= len(self.messages) else self.messages
-
-    def remove_message(self, index):
-        """Remove a specific message by index, if it exists."""
-        if 0 <= index < len(self.messages):
-            del self.messages[index]
-
-    def get_message(self, index):
-        """Retrieve a specific message by index, if it exists."""
-        return self.messages[index] if 0 <= index < len(self.messages) else None
-
-    def clear_messages(self):
-        """Clear all messages from the conversation and reset the log file."""
-        self.messages = []
-        if self.log_file:
-            open(self.log_file, 'w').close()
-
-    def __str__(self):
-        """Return the conversation as a formatted string."""
-        return "\n".join([f"{msg['role']}: {msg['content']}" for msg in self.messages])
+import atexit
+import itertools
+import json
+import os
+import threading
+import time
+import weakref
+
+# Encoding used to count tokens; close enough for every provider to keep requests bounded
+TOKEN_ENCODING = "cl100k_base"
+CONTEXT_POLICIES = ("collapse", "evict")
+
+_encoder = None
+_encoder_loaded = False
+
+
+def count_tokens(text):
+    """Count the tokens in text with tiktoken, or estimate ~4 characters per token without it."""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception as e:
+            # tiktoken may be missing or unable to fetch its encoding files offline
+            print(f"Warning: tiktoken unavailable ({e}); estimating token counts from length")
+    if _encoder is not None:
+        return len(_encoder.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+class ConversationLog:
+    """Buffered JSON-lines log that stores every conversation message once.
+
+    Each line is {"id", "role", "content", "time"}. Records are collected in memory and
+    written by a background timer flush_interval seconds after the first unwritten one
+    (or at once when max_buffered are waiting), so adding a message never waits for disk.
+    """
+
+    def __init__(self, path, flush_interval=1.0, max_buffered=100):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._buffer = []
+        self._timer = None
+        self._lock = threading.Lock()
+        # Start from an empty file, as the plain-text log did
+        open(path, 'w').close()
+        _open_logs.add(self)
+
+    def write(self, record):
+        """Queue a record for writing."""
+        with self._lock:
+            self._buffer.append(json.dumps(record) + "\n")
+            if len(self._buffer) >= self.max_buffered:
+                flush_now = True
+            else:
+                flush_now = False
+                if self._timer is None:
+                    self._timer = threading.Timer(self.flush_interval, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if flush_now:
+            self.flush()
+
+    def flush(self):
+        """Write every queued record to disk."""
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if lines:
+                with open(self.path, 'a') as file:
+                    file.writelines(lines)
+
+    def clear(self):
+        """Drop queued records and empty the file."""
+        with self._lock:
+            self._buffer = []
+            open(self.path, 'w').close()
+
+
+# Logs with records that must still be written when the process exits
+_open_logs = weakref.WeakSet()
+
+
+@atexit.register
+def flush_logs():
+    """Write the queued records of every open ConversationLog."""
+    for log in list(_open_logs):
+        log.flush()
+
+
+def read_log(log_file):
+    """Return the records of a conversation log in the order they were written."""
+    with open(log_file, 'r') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def messages_by_id(log_file):
+    """Return the records of a conversation log keyed by message id."""
+    return {record["id"]: record for record in read_log(log_file)}
+
+
+def resolve_messages(log_file, message_ids):
+    """Return the logged messages with the given ids, in the given order."""
+    records = messages_by_id(log_file)
+    return [records[message_id] for message_id in message_ids]
+
+
+class Conversation:
+    """A class to manage conversation messages, supporting logging, retrieval, and modification.
+
+    With a token_budget, get_messages() returns a window of the conversation that fits the
+    budget: pinned messages (system and design prompt) are always sent, and older unpinned
+    turns are collapsed to a one-line summary ("collapse") or dropped ("evict"), oldest
+    first. With max_turns, only the unpinned messages of the last max_turns turns (each
+    starting at an assistant message) are sent. The full history stays in self.messages.
+    """
+
+    def __init__(self, log_file=None, token_budget=None, policy="collapse", keep_recent=2, max_turns=None):
+        if policy not in CONTEXT_POLICIES:
+            raise ValueError(f"Invalid context policy '{policy}'. Must be one of: {', '.join(CONTEXT_POLICIES)}")
+        self.messages = []
+        self.log_file = log_file
+        self.token_budget = token_budget
+        self.policy = policy
+        # The newest messages are never collapsed, so the latest feedback reaches the model intact
+        self.keep_recent = keep_recent
+        self.max_turns = max_turns
+        self._pinned = set()
+        self._token_counts = {}
+        # Message ids in the log, keyed by id() of the message dict
+        self._message_ids = {}
+        # Shared with forks, so ids stay unique in the log they also share
+        self._ids = itertools.count()
+
+        self.log = ConversationLog(log_file) if log_file else None
+
+    def add_message(self, role, content, pinned=False):
+        """Add a new message to the conversation and log it if a log file is set.
+
+        Pinned messages are kept verbatim in every request regardless of the token budget.
+        """
+        message = {'role': role, 'content': content}
+        self.messages.append(message)
+        if pinned:
+            self._pinned.add(id(message))
+        message_id = next(self._ids)
+        self._message_ids[id(message)] = message_id
+
+        if self.log is not None:
+            self.log.write({"id": message_id, "role": role, "content": content, "time": time.time()})
+        return message_id
+
+    def fork(self):
+        """Return a branch of this conversation that shares its history and log.
+
+        Messages added to either conversation afterwards are not seen by the other; they
+        are written to the same log with ids that never collide.
+        """
+        branch = Conversation(token_budget=self.token_budget, policy=self.policy, keep_recent=self.keep_recent,
+                              max_turns=self.max_turns)
+        branch.messages = list(self.messages)
+        branch.log_file = self.log_file
+        branch.log = self.log
+        branch._pinned = set(self._pinned)
+        branch._token_counts = self._token_counts
+        branch._message_ids = dict(self._message_ids)
+        branch._ids = self._ids
+        return branch
+
+    def get_messages(self):
+        """Retrieve the messages to send, windowed to the token budget and turn limit if set."""
+        if self.token_budget is None and self.max_turns is None:
+            return self.messages
+        return [sent for _, sent in self._window()]
+
+    def request_message_ids(self):
+        """Log ids of the messages the next request will send (collapsed ones included)."""
+        if self.token_budget is None and self.max_turns is None:
+            return [self._message_ids[id(message)] for message in self.messages]
+        return [self._message_ids[id(original)] for original, _ in self._window()]
+
+    def request_records(self):
+        """The messages the next request will send, as {"id", "role", "content"} records like the log's.
+
+        Collapsed messages are given in full, as the log has them.
+        """
+        originals = self.messages if self.token_budget is None and self.max_turns is None else \
+            [original for original, _ in self._window()]
+        return [{"id": self._message_ids[id(message)], "role": message['role'], "content": message['content']}
+                for message in originals]
+
+    def flush_log(self):
+        """Write any buffered log records to disk."""
+        if self.log is not None:
+            self.log.flush()
+
+    def message_tokens(self, message):
+        """Token count of a single message's content, cached by content."""
+        content = message['content']
+        if content not in self._token_counts:
+            self._token_counts[content] = count_tokens(content)
+        return self._token_counts[content]
+
+    def request_tokens(self):
+        """Tokens in the messages the next request will send."""
+        return sum(self.message_tokens(message) for message in self.get_messages())
+
+    def _collapse(self, message):
+        lines = [line.strip() for line in message['content'].split('\n') if line.strip()]
+        summary = lines[0][:120] if lines else ""
+        omitted = self.message_tokens(message)
+        return {'role': message['role'], 'content': f"{summary} [earlier {message['role']} message, {omitted} tokens omitted]"}
+
+    def _window(self):
+        """Return (original, sent) message pairs within the turn limit that fit the token budget."""
+        window = list(self.messages)
+        if self.max_turns is not None:
+            turn_starts = [idx for idx, message in enumerate(self.messages) if message['role'] == "assistant"]
+            if len(turn_starts) > self.max_turns:
+                first_kept = turn_starts[-self.max_turns] if self.max_turns else len(self.messages)
+                for idx in range(first_kept):
+                    if id(self.messages[idx]) not in self._pinned:
+                        window[idx] = None
+        if self.token_budget is None:
+            return [(original, sent) for original, sent in zip(self.messages, window) if sent is not None]
+
+        total = sum(self.message_tokens(message) for message in window if message is not None)
+        recent = {id(message) for message in self.messages[-self.keep_recent:]} if self.keep_recent else set()
+
+        if self.policy == "collapse":
+            for idx, message in enumerate(window):
+                if total <= self.token_budget:
+                    break
+                if message is None or id(message) in self._pinned or id(message) in recent:
+                    continue
+                collapsed = self._collapse(message)
+                saved = self.message_tokens(message) - self.message_tokens(collapsed)
+                if saved > 0:
+                    window[idx] = collapsed
+                    total -= saved
+
+        # Still over budget: drop the oldest unpinned messages, but never the newest one
+        for idx, message in enumerate(self.messages[:-1]):
+            if total <= self.token_budget:
+                break
+            if id(message) in self._pinned or window[idx] is None:
+                continue
+            total -= self.message_tokens(window[idx])
+            window[idx] = None
+        return [(original, sent) for original, sent in zip(self.messages, window) if sent is not None]
+
+    def get_last_n_messages(self, n):
+        """Retrieve the last n messages from the conversation."""
+        return self.messages[-n:] if n <= len(self.messages) else self.messages
+
+    def remove_message(self, index):
+        """Remove a specific message by index, if it exists."""
+        if 0 <= index < len(self.messages):
+            self._pinned.discard(id(self.messages[index]))
+            self._message_ids.pop(id(self.messages[index]), None)
+            del self.messages[index]
+
+    def get_message(self, index):
+        """Retrieve a specific message by index, if it exists."""
+        return self.messages[index] if 0 <= index < len(self.messages) else None
+
+    def clear_messages(self):
+        """Clear all messages from the conversation and reset the log file."""
+        self.messages = []
+        self._pinned.clear()
+        self._message_ids.clear()
+        if self.log is not None:
+            self.log.clear()
+
+    def __str__(self):
+        """Return the conversation as a formatted string."""
+        return "\n".join([f"{msg['role']}: {msg['content']}" for msg in self.messages])
@@ -0,0 +1,59 @@
+import subprocess
+from tools import AbstractCompilationTool, register_simulator
+from sim_result import SimulationResult
+
+@register_simulator("Icarus")
+class IcarusBackend(AbstractCompilationTool):
+    """Icarus Verilog backend: iverilog compiles to a vvp image that vvp then runs."""
+
+    executables = ("iverilog", "vvp")
+    iverilog_flags = ["-g2012"]
+    supports_early_abort = True
+
+    def __init__(self, verilog_file, testbench_file, run_dir=None, cache=None, **options):
+        super().__init__(verilog_file, testbench_file, run_dir=run_dir, cache=cache, **options)
+        self.image = "sim.vvp"
+        self._returncode = None
+
+    def cache_flags(self):
+        return f"{self.name}|{' '.join(self.iverilog_flags)}|{self.tb_module}"
+
+    def compile_succeeded(self, compile_output):
+        if self._returncode is not None:
+            return self._returncode == 0
+        # Cached output: iverilog only prints diagnostics, and errors always say so
+        return "error" not in compile_output.lower() and "I give up" not in compile_output
+
+    def _iverilog(self, arguments):
+        try:
+            result = self._run_tool(["iverilog"] + self.iverilog_flags + arguments)
+        except OSError as e:
+            print(f"Compilation failed with exception: {e}")
+            self._returncode = -1
+            return str(e)
+        self._returncode = result.returncode
+        return result.stdout + result.stderr
+
+    def _compile(self):
+        """Compile the design and testbench into a vvp image."""
+        arguments = ["-o", self.image, "-s", self.tb_module, self.verilog_file, self.testbench_file]
+        if self.early_abort:
+            arguments += ["-s", self.abort_monitor_module, self.abort_monitor_file()]
+        return self._iverilog(arguments)
+
+    def check_syntax(self):
+        """Parse and elaborate the design alone without producing an image."""
+        return self._iverilog(["-t", "null", self.verilog_file])
+
+    def _simulate(self):
+        """Run the vvp image."""
+        try:
+            print("Simulating with Icarus Verilog...")
+            result = self._run_tool(["vvp", "-n", self.image] + self.abort_plusargs(), timeout=300)
+        except subprocess.TimeoutExpired:
+            print("Simulation timed out after 300 seconds")
+            return SimulationResult.failed("Simulation timeout")
+        except OSError as e:
+            print(f"Simulation failed: {e}")
+            return SimulationResult.failed(str(e))
+        return self.parse_results(result.stdout, result.returncode, result.stderr)
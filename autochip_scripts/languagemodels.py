@@ -1,247 +1,646 @@
-import os
-from abc import ABC, abstractmethod
-
-# OPENAI
-import openai
-
-# ANTHROPIC
-from anthropic import Anthropic
-from anthropic import HUMAN_PROMPT, AI_PROMPT
-
-# GEMINI
-import google.generativeai as genai
-
-# VERIGEN
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import torch
-
-# HUMAN INPUT
-import subprocess
-import tempfile
-
-# GENERAL AUTOCHIP
-from conversation import Conversation
-import verilog_handling as vh
-import regex as re
-
-
-# Abstract Large Language Model
-class AbstractLLM(ABC):
-    """Abstract Large Language Model."""
-
-    @abstractmethod
-    def generate(self, conversation: Conversation, num_candidates=1):
-        """Generate a response based on the given conversation."""
-        pass
-
-
-class ChatGPT(AbstractLLM):
-    """ChatGPT Large Language Model."""
-
-    def __init__(self, model_id="gpt-3.5-turbo-16k"):
-        openai.api_key = os.environ['OPENAI_API_KEY']
-        self.model_id = model_id
-
-    def generate(self, conversation: Conversation, num_candidates=1):
-        messages = [{"role": msg["role"], "content": msg["content"]} for msg in conversation.get_messages()]
-        response = openai.ChatCompletion.create(
-            model=self.model_id,
-            n=num_candidates,
-            messages=messages,
-        )
-        return [choice.message['content'] for choice in response.choices]
-
-
-class Claude(AbstractLLM):
-    """Claude Large Language Model."""
-
-    def __init__(self, model_id="claude-2"):
-        self.anthropic = Anthropic(api_key=os.environ['ANTHROPIC_API_KEY'])
-        self.model_id = model_id
-
-    def generate(self, conversation: Conversation, num_candidates=1):
-        messages = conversation.get_messages()
-        system = next((item for item in messages if item["role"] == "system"), None)
-        messages = [item for item in messages if item["role"] != "system"]
-
-        responses = []
-        for _ in range(num_candidates):
-            completion = self.anthropic.completions.create(
-                model=self.model_id,
-                messages=messages,
-                max_tokens=3000,
-            )
-            responses.append(completion.completion)
-        return responses
-
-
-class Gemini(AbstractLLM):
-    """Gemini Large Language Model."""
-
-    def __init__(self, model_id="gemini-pro"):
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        self.model = genai.GenerativeModel(model_id)
-
-    def generate(self, conversation: Conversation, num_candidates=1):
-        conv_messages = conversation.get_messages()
-        messages = [{"role": msg["role"], "parts": [msg["content"]]} for msg in conv_messages]
-
-        responses = []
-        for _ in range(num_candidates):
-            response = self.model.generate_content(messages)
-            responses.append(response.candidates[0].content.parts[0])
-        return responses
-
-
-class CodeLlama(AbstractLLM):
-    """CodeLlama Large Language Model."""
-
-    def __init__(self, model_id="codellama/CodeLlama-13b-hf"):
-        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
-        self.model = AutoModelForCausalLM.from_pretrained(model_id, device_map="auto", torch_dtype="auto")
-
-    def generate(self, conversation: Conversation, num_candidates=1):
-        prompt = self._format_prompt(conversation)
-        inputs = self.tokenizer(prompt, return_tensors="pt").to("cuda")
-
-        responses = []
-        for _ in range(num_candidates):
-            output = self.model.generate(
-                inputs["input_ids"],
-                max_new_tokens=3000,
-                do_sample=True,
-                top_p=0.9,
-                temperature=0.1,
-            )
-            response = self.tokenizer.decode(output[0], skip_special_tokens=True)
-            responses.append(response)
-        return responses
-
-    def _format_prompt(self, conversation: Conversation) -> str:
-        messages = conversation.get_messages()
-        prompt = ""
-        for message in messages:
-            if message['role'] == 'system':
-                prompt += f"<<SYS>>\n{message['content']}\n<</SYS>>\n\n"
-            elif message['role'] == 'user':
-                prompt += f"<s>[INST] {message['content'].strip()} [/INST] "
-            elif message['role'] == 'assistant':
-                prompt += f"{message['content']}"
-        return prompt
-
-
-class HumanInput(AbstractLLM):
-    """Human Input Large Language Model."""
-
-    def generate(self, conversation: Conversation, num_candidates=1):
-        editor = os.getenv('EDITOR', 'nano')
-        initial_text = conversation.get_messages()[-1]['content']
-        with tempfile.NamedTemporaryFile(suffix=".v") as tf:
-            tf.write(initial_text.encode())
-            tf.flush()
-            subprocess.run([editor, tf.name])
-            tf.seek(0)
-            return tf.read().decode()
-
-
-class RTLCoder(AbstractLLM):
-    """RTLCoder Large Language Model."""
-
-    def __init__(self, model_id="ishorn5/RTLCoder-Deepseek-v1.1"):
-        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
-        self.model = AutoModelForCausalLM.from_pretrained(model_id, device_map="auto", offload_folder="offload", torch_dtype=torch.float16)
-
-    def generate(self, conversation: Conversation, num_candidates=1):
-        prompt = self._format_prompt(conversation)
-        inputs = self.tokenizer(prompt, return_tensors="pt").to("cuda")
-
-        responses = []
-        for _ in range(num_candidates):
-            output = self.model.generate(
-                inputs["input_ids"],
-                max_new_tokens=3000,
-                do_sample=True,
-                top_p=0.9,
-                temperature=0.1,
-            )
-            response = self.tokenizer.decode(output[0], skip_special_tokens=True)
-            responses.append(response)
-        return responses
-
-    def _format_prompt(self, conversation: Conversation) -> str:
-        messages = conversation.get_messages()
-        prompt = ""
-        for message in messages:
-            if message['role'] == 'system':
-                prompt += f"<<SYS>>\n{message['content']}\n<</SYS>>\n\n"
-            elif message['role'] == 'user':
-                prompt += f"<s>[INST] {message['content'].strip()} [/INST] "
-            elif message['role'] == 'assistant':
-                prompt += f"{message['content']}"
-        return prompt
-
-
-class LLMResponse:
-    """Class to store the response from the LLM"""
-
-    def __init__(self, iteration, response_num, full_text):
-        self.iteration = iteration
-        self.response_num = response_num
-        self.full_text = full_text
-        self.tokens = 0
-        self.parsed_text = ""
-        self.parsed_length = 0
-        self.feedback = ""
-        self.compiled = False
-        self.rank = -3
-        self.message = ""
-
-    def set_parsed_text(self, parsed_text):
-        self.parsed_text = parsed_text
-        self.parsed_length = len(parsed_text)
-
-    def parse_verilog(self):
-        """Parse Verilog code from the response text."""
-        # First try to find complete module definitions
-        module_list = vh.find_verilog_modules(self.full_text)
-        
-        if module_list:
-            self.parsed_text = "\n\n".join(module_list)
-        else:
-            # If no complete modules found, use the full text as is
-            self.parsed_text = self.full_text
-            
-        # Add necessary headers if they're missing
-        if not self.parsed_text.strip().startswith('`timescale'):
-            self.parsed_text = '`timescale 1ns / 1ps\n\n' + self.parsed_text
-            
-        if '`define RESET_VAL' not in self.parsed_text:
-            self.parsed_text = '`define RESET_VAL 4\'b0000\n\n' + self.parsed_text
-            
-        self.parsed_length = len(self.parsed_text)
-
-    def calculate_rank(self, outdir, module, testbench):
-        # Create output directory if it doesn't exist
-        os.makedirs(outdir, exist_ok=True)
-        
-        # Save the parsed text to a file
-        output_file = os.path.join(outdir, "response.v")
-        with open(output_file, 'w') as f:
-            f.write(self.parsed_text)
-        
-        try:
-            # Try to compile and simulate
-            return_code, stderr, stdout = vh.compile_and_simulate_verilog(output_file, testbench, self)
-            
-            if return_code == 0 and not stderr:
-                self.rank = 1  # Success
-                self.compiled = True
-            else:
-                self.rank = 0  # Failure
-                self.compiled = False
-                self.message = stderr if stderr else "Compilation failed"
-                
-        except Exception as e:
-            self.rank = -1  # Error
-            self.compiled = False
-            self.message = str(e)
+import os
+import asyncio
+import copy
+import importlib
+import queue
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# HUMAN INPUT
+import subprocess
+import tempfile
+
+# GENERAL AUTOCHIP
+from conversation import Conversation
+from verilog_extract import ModuleStreamExtractor, find_verilog_modules
+import verilog_header
+
+# Provider SDKs (openai, anthropic, google.generativeai, transformers, torch) are imported
+# by each provider when it is first constructed, so a run only pays for the SDK it uses
+
+# model_family -> provider class, filled by register_model
+MODEL_REGISTRY = {}
+
+
+def register_model(family):
+    """Class decorator that makes a provider selectable by its config 'model_family' value."""
+    def decorator(cls):
+        cls.family = family
+        MODEL_REGISTRY[family] = cls
+        return cls
+    return decorator
+
+
+def get_model_class(family):
+    """Return the provider class registered under family."""
+    if family not in MODEL_REGISTRY:
+        raise ValueError(f"Invalid model type '{family}'. Known model families: {', '.join(sorted(MODEL_REGISTRY))}")
+    return MODEL_REGISTRY[family]
+
+
+def create_model(family, model_id="", **options):
+    """Construct the provider registered under family, using its default model when model_id is empty.
+
+    options (e.g. device) are passed to the provider's constructor.
+    """
+    cls = get_model_class(family)
+    return cls(model_id, **options) if model_id else cls(**options)
+
+
+# Abstract Large Language Model
+class AbstractLLM(ABC):
+    """Abstract Large Language Model."""
+
+    # Bound on the number of requests generate_async keeps in flight at once
+    max_concurrency = 8
+    # Rate-limit retries per candidate and the exponential backoff they follow
+    max_retries = 5
+    backoff_base = 1.0
+    backoff_max = 60.0
+
+    # Per-provider time before which no new request is sent, shared by all instances
+    _backoff_until = {}
+
+    family = None
+    # Modules the provider needs, imported by load_sdk on first construction
+    sdk_modules = ()
+    # Sampling settings sent with every request; part of the response cache key
+    sampling = {}
+
+    @classmethod
+    def sampling_params(cls):
+        """Return the settings that, besides the conversation, determine a response."""
+        return dict(cls.sampling)
+
+    @classmethod
+    def load_sdk(cls):
+        """Import the provider's SDK modules, returning them in sdk_modules order."""
+        try:
+            return [importlib.import_module(name) for name in cls.sdk_modules]
+        except ImportError as e:
+            raise ImportError(f"The {cls.family or cls.__name__} model family needs the '{e.name}' package: {e}") from e
+
+    @abstractmethod
+    def generate(self, conversation: Conversation, num_candidates=1, stop_at_module=None):
+        """Generate a response based on the given conversation.
+
+        Providers that can stream stop reading a candidate once module stop_at_module is
+        complete; the others ignore it.
+        """
+        pass
+
+    def generate_streaming(self, conversation: Conversation, num_candidates=1, stop_at_module=None):
+        """Yield (candidate index, text) pairs as candidates complete.
+
+        Providers that answer all candidates with one request yield them together once it ends.
+        """
+        yield from enumerate(self.generate(conversation, num_candidates, stop_at_module))
+
+    def stream_one(self, conversation: Conversation):
+        """Yield the text of a single candidate as it arrives. Closing the generator cancels the request."""
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming")
+
+    def generate_one_streaming(self, conversation: Conversation, stop_at_module="top_module"):
+        """Stream a single candidate and cancel it as soon as the rest would be discarded."""
+        extractor = ModuleStreamExtractor(stop_at_module)
+        chunks = self.stream_one(conversation)
+        try:
+            for chunk in chunks:
+                if extractor.feed(chunk):
+                    print(f"Debug: Stopped {type(self).__name__} response after {len(extractor.text)} characters: "
+                          f"{extractor.reason}")
+                    break
+        finally:
+            chunks.close()
+        return extractor.text
+
+    def memory_footprint(self):
+        """Bytes of model weights held in this process; 0 for remote APIs."""
+        return 0
+
+    def release(self):
+        """Free the resources held by the model once it is no longer used."""
+        pass
+
+    def generate_one(self, conversation: Conversation):
+        """Generate a single candidate. Providers without a native multi-candidate API implement this."""
+        raise NotImplementedError(f"{type(self).__name__} does not support single-candidate requests")
+
+    def is_rate_limit_error(self, error):
+        """Return True if the error means the provider wants us to slow down."""
+        status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+        return status == 429 or type(error).__name__ in ('RateLimitError', 'ResourceExhausted', 'TooManyRequests')
+
+    def _register_rate_limit(self, error, attempt):
+        """Push back the provider-wide backoff deadline after a rate-limit error."""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * (1 + random.random())
+        response = getattr(error, 'response', None)
+        retry_after = getattr(response, 'headers', {}).get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        provider = type(self)
+        AbstractLLM._backoff_until[provider] = max(AbstractLLM._backoff_until.get(provider, 0), time.monotonic() + delay)
+
+    async def _wait_for_backoff(self):
+        delay = AbstractLLM._backoff_until.get(type(self), 0) - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _sample(self, conversation: Conversation, generate_one, semaphore):
+        """Request one candidate, retrying with backoff while the provider rate-limits us."""
+        loop = asyncio.get_running_loop()
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._wait_for_backoff()
+                try:
+                    return await loop.run_in_executor(None, generate_one, conversation)
+                except Exception as e:
+                    if attempt == self.max_retries or not self.is_rate_limit_error(e):
+                        raise
+                    print(f"Rate limited by {type(self).__name__}, backing off (attempt {attempt + 1})")
+                    self._register_rate_limit(e, attempt)
+
+    def _candidate_function(self, stop_at_module=None):
+        if stop_at_module:
+            return partial(self.generate_one_streaming, stop_at_module=stop_at_module)
+        return self.generate_one
+
+    async def generate_async(self, conversation: Conversation, num_candidates=1, stop_at_module=None):
+        """Request all candidates concurrently, at most max_concurrency at a time."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        generate_one = self._candidate_function(stop_at_module)
+        return list(await asyncio.gather(*(self._sample(conversation, generate_one, semaphore)
+                                           for _ in range(num_candidates))))
+
+    def generate_concurrently(self, conversation: Conversation, num_candidates=1, stop_at_module=None):
+        """Synchronous wrapper around generate_async, usable with or without a running event loop."""
+        requests = self.generate_async(conversation, num_candidates, stop_at_module)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(requests)
+        # asyncio.run cannot be nested in a running loop (e.g. a notebook), so the requests get a thread of their own
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, requests).result()
+
+    def generate_concurrently_streaming(self, conversation: Conversation, num_candidates=1, stop_at_module=None):
+        """Like generate_concurrently, but yield (index, text) as each candidate completes."""
+        completed = queue.Queue()
+        generate_one = self._candidate_function(stop_at_module)
+
+        async def request_all():
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def indexed(idx):
+                try:
+                    completed.put((idx, await self._sample(conversation, generate_one, semaphore)))
+                except Exception as e:
+                    completed.put((idx, e))
+
+            await asyncio.gather(*(indexed(idx) for idx in range(num_candidates)))
+
+        # The requests run on their own event loop, in their own thread, so candidates can be handed out
+        # while others are pending and callers may already be running an event loop
+        threading.Thread(target=asyncio.run, args=(request_all(),), daemon=True).start()
+        for _ in range(num_candidates):
+            idx, text = completed.get()
+            if isinstance(text, Exception):
+                raise text
+            yield idx, text
+
+
+@register_model("ChatGPT")
+class ChatGPT(AbstractLLM):
+    """ChatGPT Large Language Model."""
+
+    sdk_modules = ("openai",)
+
+    def __init__(self, model_id="gpt-3.5-turbo-16k"):
+        openai, = self.load_sdk()
+        openai.api_key = os.environ['OPENAI_API_KEY']
+        self.openai = openai
+        self.model_id = model_id
+
+    def generate(self, conversation: Conversation, num_candidates=1, stop_at_module=None):
+        messages = [{"role": msg["role"], "content": msg["content"]} for msg in conversation.get_messages()]
+        if stop_at_module:
+            return self._generate_streaming(messages, num_candidates, stop_at_module)
+        response = self.openai.ChatCompletion.create(
+            model=self.model_id,
+            n=num_candidates,
+            messages=messages,
+        )
+        return [choice.message['content'] for choice in response.choices]
+
+    def _generate_streaming(self, messages, num_candidates, stop_at_module):
+        """Stream all n candidates of one request, closing it once every candidate is complete."""
+        extractors = [ModuleStreamExtractor(stop_at_module) for _ in range(num_candidates)]
+        response = self.openai.ChatCompletion.create(
+            model=self.model_id,
+            n=num_candidates,
+            messages=messages,
+            stream=True,
+        )
+        try:
+            for chunk in response:
+                for choice in chunk.choices:
+                    extractors[choice.index].feed(choice.delta.get("content") or "")
+                if all(extractor.done for extractor in extractors):
+                    print(f"Debug: Stopped ChatGPT stream early: {', '.join(e.reason for e in extractors)}")
+                    break
+        finally:
+            response.close()
+        return [extractor.text for extractor in extractors]
+
+
+@register_model("Claude")
+class Claude(AbstractLLM):
+    """Claude Large Language Model."""
+
+    sdk_modules = ("anthropic",)
+    sampling = {"max_tokens": 3000}
+
+    def __init__(self, model_id="claude-2"):
+        anthropic, = self.load_sdk()
+        # The client honours ANTHROPIC_BASE_URL, which lets it be pointed at a local mock server
+        self.anthropic = anthropic.Anthropic(api_key=os.environ['ANTHROPIC_API_KEY'])
+        self.model_id = model_id
+
+    def generate(self, conversation: Conversation, num_candidates=1, stop_at_module=None):
+        return self.generate_concurrently(conversation, num_candidates, stop_at_module)
+
+    def generate_streaming(self, conversation: Conversation, num_candidates=1, stop_at_module=None):
+        return self.generate_concurrently_streaming(conversation, num_candidates, stop_at_module)
+
+    def _request(self, conversation: Conversation):
+        messages = conversation.get_messages()
+        system = next((item for item in messages if item["role"] == "system"), None)
+        messages = [{"role": item["role"], "content": item["content"]} for item in messages if item["role"] != "system"]
+
+        kwargs = {"system": system["content"]} if system else {}
+        return dict(model=self.model_id, messages=messages, **self.sampling, **kwargs)
+
+    def generate_one(self, conversation: Conversation):
+        message = self.anthropic.messages.create(**self._request(conversation))
+        return message.content[0].text
+
+    def stream_one(self, conversation: Conversation):
+        # Leaving the stream context closes the HTTP response, which ends generation server-side
+        with self.anthropic.messages.stream(**self._request(conversation)) as stream:
+            yield from stream.text_stream
+
+
+@register_model("Gemini")
+class Gemini(AbstractLLM):
+    """Gemini Large Language Model."""
+
+    sdk_modules = ("google.generativeai",)
+
+    def __init__(self, model_id="gemini-pro"):
+        genai, = self.load_sdk()
+        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+        self.model = genai.GenerativeModel(model_id)
+
+    def generate(self, conversation: Conversation, num_candidates=1, stop_at_module=None):
+        return self.generate_concurrently(conversation, num_candidates, stop_at_module)
+
+    def generate_streaming(self, conversation: Conversation, num_candidates=1, stop_at_module=None):
+        return self.generate_concurrently_streaming(conversation, num_candidates, stop_at_module)
+
+    def _messages(self, conversation: Conversation):
+        return [{"role": msg["role"], "parts": [msg["content"]]} for msg in conversation.get_messages()]
+
+    def generate_one(self, conversation: Conversation):
+        response = self.model.generate_content(self._messages(conversation))
+        return response.candidates[0].content.parts[0].text
+
+    def stream_one(self, conversation: Conversation):
+        for chunk in self.model.generate_content(self._messages(conversation), stream=True):
+            yield chunk.text
+
+
+class GenerationBatcher:
+    """Groups generate requests arriving from concurrent threads into shared batches.
+
+    The first request of a batch waits window seconds for others to join, then runs every
+    pending request with the same candidate count in one call to generate_batch.
+    """
+
+    def __init__(self, generate_batch, window=0.05, max_prompts=8):
+        self.generate_batch = generate_batch
+        self.window = window
+        self.max_prompts = max_prompts
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def submit(self, conversation, num_candidates=1):
+        """Return num_candidates completions for conversation, batched with concurrent requests."""
+        request = {"conversation": conversation, "num_candidates": num_candidates,
+                   "done": threading.Event(), "result": None, "error": None}
+        with self._lock:
+            self._pending.append(request)
+            leader = len(self._pending) == 1
+        if leader:
+            if self.window > 0:
+                time.sleep(self.window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+            self._run(batch)
+        request["done"].wait()
+        if request["error"] is not None:
+            raise request["error"]
+        return request["result"]
+
+    def _run(self, batch):
+        groups = {}
+        for request in batch:
+            groups.setdefault(request["num_candidates"], []).append(request)
+        for num_candidates, requests in groups.items():
+            for start in range(0, len(requests), self.max_prompts):
+                chunk = requests[start:start + self.max_prompts]
+                try:
+                    results = self.generate_batch([request["conversation"] for request in chunk], num_candidates)
+                    for request, result in zip(chunk, results):
+                        request["result"] = result
+                except Exception as e:
+                    for request in chunk:
+                        request["error"] = e
+                for request in chunk:
+                    request["done"].set()
+
+
+class PrefixCache:
+    """LRU cache of past_key_values keyed by the prompt token ids they were computed for.
+
+    Iterations of one run share the system and design prompt, so a new prompt usually
+    starts with tokens whose keys and values were already computed; only the rest needs
+    a prefill.
+    """
+
+    def __init__(self, max_entries=2):
+        self.max_entries = max_entries
+        self.reused_tokens = 0
+        self.prefilled_tokens = 0
+        self._entries = OrderedDict()
+
+    def lookup(self, token_ids):
+        """Return (length, past_key_values) for the longest cached prefix of token_ids.
+
+        The returned cache is a private copy cropped to length, or None when nothing matches.
+        """
+        best_key, best_length = None, 0
+        for key in self._entries:
+            length = 0
+            for cached, token in zip(key, token_ids):
+                if cached != token:
+                    break
+                length += 1
+            if length > best_length:
+                best_key, best_length = key, length
+        if best_key is None:
+            return 0, None
+        self._entries.move_to_end(best_key)
+        past_key_values = copy.deepcopy(self._entries[best_key])
+        # A negative crop removes that many trailing tokens in every transformers version
+        excess = past_key_values.get_seq_length() - best_length
+        if excess > 0:
+            past_key_values.crop(-excess)
+        return best_length, past_key_values
+
+    def store(self, token_ids, past_key_values):
+        self._entries[tuple(token_ids)] = past_key_values
+        self._entries.move_to_end(tuple(token_ids))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class HuggingFaceLLM(AbstractLLM):
+    """Base class for models run locally through transformers."""
+
+    sdk_modules = ("transformers", "torch")
+    max_new_tokens = 3000
+    sampling = {"do_sample": True, "top_p": 0.9, "temperature": 0.1}
+    # Seconds generate() waits for requests from concurrent runs to share its batch
+    batch_window = 0.05
+    max_batch_prompts = 8
+    # Prompt prefixes whose past_key_values are kept between iterations; 0 disables the cache
+    prefix_cache_entries = 2
+
+    def __init__(self, model_id, device="auto"):
+        transformers, torch = self.load_sdk()
+        # "auto" runs on the GPU when one is available and falls back to the CPU
+        if device in (None, "auto"):
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = device
+        self.model_id = model_id
+        self.torch = torch
+        self.transformers = transformers
+        self.prefix_cache = PrefixCache(self.prefix_cache_entries) if self.prefix_cache_entries else None
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_id)
+        # Decoder-only models continue from the right, so batched prompts are padded on the left
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = transformers.AutoModelForCausalLM.from_pretrained(model_id, **self._load_options(torch))
+        if device == "cpu":
+            self.model.to(device)
+        self.model.eval()
+        self._generate_lock = threading.Lock()
+        self._batcher = GenerationBatcher(self.generate_batch, self.batch_window, self.max_batch_prompts)
+
+    @classmethod
+    def sampling_params(cls):
+        return dict(cls.sampling, max_new_tokens=cls.max_new_tokens)
+
+    def _load_options(self, torch):
+        """Keyword arguments for from_pretrained on self.device."""
+        if self.device == "cpu":
+            return {"torch_dtype": torch.float32}
+        return {"device_map": "auto", "torch_dtype": "auto"}
+
+    def memory_footprint(self):
+        return self.model.get_memory_footprint()
+
+    def release(self):
+        self.model = None
+        self.tokenizer = None
+        if self.prefix_cache is not None:
+            self.prefix_cache.clear()
+        if self.device != "cpu":
+            self.torch.cuda.empty_cache()
+
+    def generate(self, conversation: Conversation, num_candidates=1, stop_at_module=None):
+        return self._batcher.submit(conversation, num_candidates)
+
+    def generate_batch(self, conversations, num_candidates=1):
+        """Sample num_candidates completions for each conversation in one model.generate call.
+
+        Returns one list of completions per conversation. Prompts are left-padded into a
+        single batch and num_return_sequences samples every candidate of a prompt together,
+        so the prompts are encoded once and only the generated tokens are decoded.
+        """
+        prompts = [self._format_prompt(conversation) for conversation in conversations]
+        if len(prompts) == 1 and self.prefix_cache is not None:
+            return [self._generate_with_prefix_cache(prompts[0], num_candidates)]
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.device)
+
+        with self._generate_lock, self.torch.inference_mode():
+            output = self.model.generate(
+                **inputs,
+                max_new_tokens=self.max_new_tokens,
+                **self.sampling,
+                num_return_sequences=num_candidates,
+                pad_token_id=self.tokenizer.pad_token_id,
+            )
+        # Rows are grouped by prompt: the candidates of prompt i are rows i*k .. i*k + k - 1
+        texts = self.tokenizer.batch_decode(output[:, inputs["input_ids"].shape[1]:], skip_special_tokens=True)
+        return [texts[i * num_candidates:(i + 1) * num_candidates] for i in range(len(prompts))]
+
+    def _generate_with_prefix_cache(self, prompt, num_candidates):
+        """Sample num_candidates completions of one prompt, prefilling only tokens not in the prefix cache.
+
+        The prompt is prefilled once and its cache repeated for every candidate, so k
+        candidates cost one prefill.
+        """
+        input_ids = self.tokenizer(prompt, return_tensors="pt")["input_ids"].to(self.device)
+        token_ids = input_ids[0].tolist()
+        # generate needs at least one uncached token, so the last prompt token is never cached
+        prefix_ids = token_ids[:-1]
+
+        with self._generate_lock, self.torch.inference_mode():
+            cached_length, past_key_values = self.prefix_cache.lookup(prefix_ids)
+            if past_key_values is None:
+                past_key_values = self.transformers.DynamicCache()
+            if cached_length < len(prefix_ids):
+                past_key_values = self.model(input_ids[:, cached_length:-1], past_key_values=past_key_values,
+                                             use_cache=True).past_key_values
+            self.prefix_cache.store(prefix_ids, past_key_values)
+            self.prefix_cache.reused_tokens += cached_length
+            self.prefix_cache.prefilled_tokens += len(prefix_ids) - cached_length
+            print(f"Debug: Prefix cache reused {cached_length} of {len(token_ids)} prompt tokens")
+
+            # generate extends the cache it is given, so the stored entry gets a copy
+            candidate_cache = copy.deepcopy(past_key_values)
+            candidate_cache.batch_repeat_interleave(num_candidates)
+            candidate_ids = input_ids.repeat(num_candidates, 1)
+            output = self.model.generate(
+                candidate_ids,
+                attention_mask=self.torch.ones_like(candidate_ids),
+                past_key_values=candidate_cache,
+                max_new_tokens=self.max_new_tokens,
+                **self.sampling,
+                pad_token_id=self.tokenizer.pad_token_id,
+            )
+        return self.tokenizer.batch_decode(output[:, input_ids.shape[1]:], skip_special_tokens=True)
+
+    def _format_prompt(self, conversation: Conversation) -> str:
+        messages = conversation.get_messages()
+        prompt = ""
+        for message in messages:
+            if message['role'] == 'system':
+                prompt += f"<<SYS>>\n{message['content']}\n<</SYS>>\n\n"
+            elif message['role'] == 'user':
+                prompt += f"<s>[INST] {message['content'].strip()} [/INST] "
+            elif message['role'] == 'assistant':
+                prompt += f"{message['content']}"
+        return prompt
+
+
+@register_model("CodeLlama")
+class CodeLlama(HuggingFaceLLM):
+    """CodeLlama Large Language Model."""
+
+    def __init__(self, model_id="codellama/CodeLlama-13b-hf", device="auto"):
+        super().__init__(model_id, device)
+
+
+@register_model("Human")
+class HumanInput(AbstractLLM):
+    """Human Input Large Language Model."""
+
+    def __init__(self, model_id=None):
+        pass
+
+    def generate(self, conversation: Conversation, num_candidates=1, stop_at_module=None):
+        editor = os.getenv('EDITOR', 'nano')
+        initial_text = conversation.get_messages()[-1]['content']
+        with tempfile.NamedTemporaryFile(suffix=".v") as tf:
+            tf.write(initial_text.encode())
+            tf.flush()
+            subprocess.run([editor, tf.name])
+            tf.seek(0)
+            return tf.read().decode()
+
+
+@register_model("RTLCoder")
+class RTLCoder(HuggingFaceLLM):
+    """RTLCoder Large Language Model."""
+
+    def __init__(self, model_id="ishorn5/RTLCoder-Deepseek-v1.1", device="auto"):
+        super().__init__(model_id, device)
+
+    def _load_options(self, torch):
+        if self.device == "cpu":
+            return {"torch_dtype": torch.float32}
+        return {"device_map": "auto", "offload_folder": "offload", "torch_dtype": torch.float16}
+
+
+class LLMResponse:
+    """Class to store the response from the LLM"""
+
+    def __init__(self, iteration, response_num, full_text):
+        self.iteration = iteration
+        self.response_num = response_num
+        self.full_text = full_text
+        self.tokens = 0
+        self.parsed_text = ""
+        self.parsed_length = 0
+        self.feedback = ""
+        self.compiled = False
+        self.rank = -3
+        self.message = ""
+        # Testbench mismatches of the simulated design, inf until it has been simulated
+        self.mismatches = float('inf')
+        # Per-output {'count', 'first_time'} of the simulated design, from SimulationResult.signal_mismatches()
+        self.output_mismatches = {}
+
+    def set_parsed_text(self, parsed_text):
+        self.parsed_text = parsed_text
+        self.parsed_length = len(parsed_text)
+
+    def parse_verilog(self, header=None):
+        """Parse Verilog code from the response text.
+
+        With header (a verilog_header.ModuleHeader), bare module bodies are wrapped in it and
+        a module of the same name whose ports disagree with it gets its header repaired.
+        """
+        # First try to find complete module definitions
+        module_list = find_verilog_modules(self.full_text, header)
+        if header is not None:
+            module_list = [verilog_header.repair_module(module, header) for module in module_list]
+        
+        if module_list:
+            self.parsed_text = "\n\n".join(module_list)
+        else:
+            # If no complete modules found, use the full text as is
+            self.parsed_text = self.full_text
+            
+        # Add necessary headers if they're missing
+        if not self.parsed_text.strip().startswith('`timescale'):
+            self.parsed_text = '`timescale 1ns / 1ps\n\n' + self.parsed_text
+            
+        if '`define RESET_VAL' not in self.parsed_text:
+            self.parsed_text = '`define RESET_VAL 4\'b0000\n\n' + self.parsed_text
+            
+        self.parsed_length = len(self.parsed_text)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import languagemodels as lm
+
+MODES = ("record", "replay")
+
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a response was never recorded."""
+
+
+def canonical_messages(conversation):
+    """Return the conversation messages in a form that ignores line-ending and trailing-space noise."""
+    messages = []
+    for message in conversation.get_messages():
+        content = message["content"].replace('\r\n', '\n')
+        messages.append({"role": message["role"], "content": '\n'.join(line.rstrip() for line in content.split('\n')).strip()})
+    return messages
+
+
+class ResponseCache:
+    """On-disk cache of LLM responses, one JSON file per candidate.
+
+    Entries are keyed by provider, model_id, the canonicalized conversation, the sampling
+    settings and the candidate index. In "record" mode misses go to the provider and are
+    stored; in "replay" mode only stored responses are served and a miss raises
+    CacheMissError, so runs are offline and deterministic.
+    """
+
+    def __init__(self, cache_dir, mode="record"):
+        if mode not in MODES:
+            raise ValueError(f"Invalid LLM cache mode '{mode}'. Must be one of: {', '.join(MODES)}")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, family, model_id, conversation, sampling, candidate, stop_at_module=None):
+        """Hash everything that determines one candidate response."""
+        request = {
+            "family": family,
+            "model_id": model_id or "",
+            "messages": canonical_messages(conversation),
+            "sampling": sampling,
+            "candidate": candidate,
+            "stop_at_module": stop_at_module,
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        """Return the cached response text for key, or None on a miss."""
+        try:
+            with open(self._entry_path(key), 'r') as f:
+                text = json.load(f)["text"]
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key, text, family, model_id):
+        """Store a response, replacing any previous one for key."""
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump({"text": text, "family": family, "model_id": model_id, "created": time.time()}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write LLM cache entry: {e}")
+
+    def report(self):
+        """Return a one-line summary of the cache statistics."""
+        lookups = self.hits + self.misses
+        return (f"LLM response cache ({self.mode}): {self.hits} hits, {self.misses} misses "
+                f"({self.hits / lookups if lookups else 0.0:.0%} hit rate)")
+
+
+class CachedLLM(lm.AbstractLLM):
+    """Serves generate() from a ResponseCache, asking the real provider only for missing candidates.
+
+    The provider is built by load_model on the first miss, so replaying needs neither the
+    provider SDK nor an API key.
+    """
+
+    def __init__(self, cache, family, model_id, load_model):
+        self.cache = cache
+        self.family = family
+        self.model_id = model_id or ""
+        self.load_model = load_model
+        self.sampling = lm.get_model_class(family).sampling_params()
+
+    def generate(self, conversation, num_candidates=1, stop_at_module=None):
+        keys = [self.cache.make_key(self.family, self.model_id, conversation, self.sampling, candidate, stop_at_module)
+                for candidate in range(num_candidates)]
+        texts = [self.cache.get(key) for key in keys]
+        missing = [idx for idx, text in enumerate(texts) if text is None]
+        if not missing:
+            return texts
+        if self.cache.mode == "replay":
+            raise CacheMissError(f"No recorded {self.family} {self.model_id} response for candidate(s) "
+                                 f"{missing} of this conversation in {self.cache.cache_dir}")
+
+        generated = self.load_model().generate(conversation, len(missing), stop_at_module=stop_at_module)
+        for idx, text in zip(missing, generated):
+            texts[idx] = text
+            self.cache.put(keys[idx], text, self.family, self.model_id)
+        return texts
+
+    def generate_streaming(self, conversation, num_candidates=1, stop_at_module=None):
+        """Yield the cached candidates at once, then the missing ones as the provider completes them."""
+        keys = [self.cache.make_key(self.family, self.model_id, conversation, self.sampling, candidate, stop_at_module)
+                for candidate in range(num_candidates)]
+        missing = []
+        for idx, key in enumerate(keys):
+            text = self.cache.get(key)
+            if text is None:
+                missing.append(idx)
+            else:
+                yield idx, text
+        if not missing:
+            return
+        if self.cache.mode == "replay":
+            raise CacheMissError(f"No recorded {self.family} {self.model_id} response for candidate(s) "
+                                 f"{missing} of this conversation in {self.cache.cache_dir}")
+
+        generated = self.load_model().generate_streaming(conversation, len(missing), stop_at_module=stop_at_module)
+        for position, text in generated:
+            idx = missing[position]
+            self.cache.put(keys[idx], text, self.family, self.model_id)
+            yield idx, text
+
+
+# Cache used by generate_verilog_responses, set by configure
+_cache = None
+
+
+def configure(cache_dir=None, mode="record"):
+    """Put a ResponseCache in front of every model, or remove it when cache_dir is None."""
+    global _cache
+    _cache = ResponseCache(cache_dir, mode) if cache_dir else None
+    return _cache
+
+
+def get_cache():
+    """Return the configured ResponseCache, or None."""
+    return _cache
@@ -0,0 +1,134 @@
+import threading
+from collections import OrderedDict
+
+import languagemodels as lm
+
+
+class _Loading:
+    """A model being constructed by one caller, which the others asking for it wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.model = None
+        self.error = None
+
+
+class ModelPool:
+    """Model instances constructed once per process and shared by every caller.
+
+    Instances are keyed by (model_family, model_id), so local weights are loaded the first
+    time a model is asked for and reused afterwards. Least recently used models are
+    released once more than max_models are held or their weights exceed max_memory_gb.
+    Weights are loaded outside the pool's lock, so a slow load only holds up the callers
+    waiting for that same model.
+    """
+
+    def __init__(self, max_models=None, max_memory_gb=None, device="auto"):
+        self.max_models = max_models
+        self.max_memory_gb = max_memory_gb
+        # Device for locally run models: "auto", "cpu" or "cuda"
+        self.device = device
+        self.loads = 0
+        self.evictions = 0
+        self._models = OrderedDict()
+        # Keys being loaded -> _Loading
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def get(self, family, model_id=""):
+        """Return the model for (family, model_id), constructing it on first use."""
+        key = (family, model_id or "")
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+            loading = self._loading.get(key)
+            owner = loading is None
+            if owner:
+                loading = self._loading[key] = _Loading()
+
+        if not owner:
+            loading.done.wait()
+            if loading.error is not None:
+                raise loading.error
+            return loading.model
+
+        try:
+            options = {"device": self.device} if issubclass(lm.get_model_class(family), lm.HuggingFaceLLM) else {}
+            print(f"Loading model {family} {model_id}".rstrip())
+            model = lm.create_model(family, model_id, **options)
+        except Exception as e:
+            # Callers waiting for this load get the same error; the next request tries again
+            with self._lock:
+                del self._loading[key]
+            loading.error = e
+            loading.done.set()
+            raise
+        with self._lock:
+            self.loads += 1
+            self._models[key] = model
+            del self._loading[key]
+            self._enforce_limits(keep=key)
+        loading.model = model
+        loading.done.set()
+        return model
+
+    def evict(self, family=None, model_id=None):
+        """Release the models matching family and model_id (all models when both are None)."""
+        with self._lock:
+            keys = [key for key in self._models
+                    if (family is None or key[0] == family) and (model_id is None or key[1] == model_id)]
+            for key in keys:
+                self._release(key)
+            return len(keys)
+
+    def clear(self):
+        """Release every model in the pool."""
+        return self.evict()
+
+    def memory_bytes(self):
+        """Bytes of model weights currently held by the pool."""
+        return sum(model.memory_footprint() for model in self._models.values())
+
+    def _release(self, key):
+        model = self._models.pop(key)
+        model.release()
+        self.evictions += 1
+        print(f"Released model {key[0]} {key[1]}".rstrip())
+
+    def _enforce_limits(self, keep):
+        # The model just requested is never evicted, even if it alone exceeds the cap
+        for key in list(self._models):
+            over_count = self.max_models is not None and len(self._models) > self.max_models
+            over_memory = self.max_memory_gb is not None and self.memory_bytes() > self.max_memory_gb * 1024 ** 3
+            if not (over_count or over_memory):
+                break
+            if key != keep:
+                self._release(key)
+
+
+# Pool shared by the whole process
+_pool = ModelPool()
+
+
+def configure(max_models=None, max_memory_gb=None, device="auto"):
+    """Set the limits and device of the process-wide pool, releasing models over the new limits."""
+    _pool.max_models = max_models
+    _pool.max_memory_gb = max_memory_gb
+    if device != _pool.device:
+        # Models already loaded live on the old device
+        _pool.clear()
+    _pool.device = device
+    with _pool._lock:
+        _pool._enforce_limits(keep=None)
+    return _pool
+
+
+def get_pool():
+    """Return the process-wide pool."""
+    return _pool
+
+
+def get_model(family, model_id=""):
+    """Return the shared model instance for (family, model_id)."""
+    return _pool.get(family, model_id)
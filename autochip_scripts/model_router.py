@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+from collections import namedtuple
+
+ROUTING_MODES = ("schedule", "adaptive")
+
+# One entry of the mixed-models config. cost is the relative price of its tokens (e.g. dollars
+# per 1K tokens); without one, models are assumed to get pricier in start_iteration order.
+RoutedModel = namedtuple("RoutedModel", ["name", "model_family", "model_id", "start_iteration", "cost"])
+
+
+class RoutingStats:
+    """Per-model request statistics, kept across runs in a JSON file.
+
+    For every model: requests made, iterations in which it improved on the best mismatch
+    count, and the tokens and seconds its requests took. The file is rewritten after every
+    record, so concurrent loops and later runs all see the same numbers.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.models = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.models = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not read routing statistics {path}: {e}")
+
+    @staticmethod
+    def key(model_family, model_id):
+        return f"{model_family}/{model_id or ''}"
+
+    def get(self, model_family, model_id):
+        return self.models.get(self.key(model_family, model_id),
+                               {"requests": 0, "improvements": 0, "tokens": 0, "seconds": 0.0})
+
+    def record(self, model_family, model_id, tokens, seconds, improved):
+        with self._lock:
+            entry = self.models.setdefault(self.key(model_family, model_id),
+                                           {"requests": 0, "improvements": 0, "tokens": 0, "seconds": 0.0})
+            entry["requests"] += 1
+            entry["improvements"] += int(improved)
+            entry["tokens"] += tokens
+            entry["seconds"] += seconds
+            if self.path:
+                with open(self.path + ".tmp", 'w') as f:
+                    json.dump(self.models, f, indent=1)
+                os.replace(self.path + ".tmp", self.path)
+
+    def progress_rate(self, model_family, model_id):
+        """Share of requests that improved the best candidate, starting from an even prior."""
+        entry = self.get(model_family, model_id)
+        return (entry["improvements"] + 1) / (entry["requests"] + 2)
+
+    def mean_tokens(self, model_family, model_id):
+        entry = self.get(model_family, model_id)
+        return entry["tokens"] / entry["requests"] if entry["requests"] else None
+
+
+# Statistics files already loaded, shared by every loop of the process
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def load_stats(path=None):
+    """Return the RoutingStats stored at path (kept in memory only when path is None)."""
+    if path is None:
+        return RoutingStats()
+    with _stats_lock:
+        if path not in _stats:
+            _stats[path] = RoutingStats(path)
+        return _stats[path]
+
+
+class ModelRouter:
+    """Chooses the model of every iteration from the mixed-models config.
+
+    "schedule" mode switches models at their start_iteration. "adaptive" mode ignores it:
+    models are ordered by cost, and every iteration uses the model with the lowest expected
+    cost per improvement (price times the tokens its requests take, over the share of its
+    requests that improved the best candidate, both from stats). A model that makes no
+    progress for stall_iterations iterations in a row is not used again in this run, which
+    escalates to the next model. The models are ordered once, when the router is built.
+    """
+
+    def __init__(self, mixed_model_config, mode="schedule", stats=None, stall_iterations=2):
+        if mode not in ROUTING_MODES:
+            raise ValueError(f"Invalid routing mode '{mode}'. Must be one of: {', '.join(ROUTING_MODES)}")
+        self.mode = mode
+        self.stats = stats if stats is not None else RoutingStats()
+        self.stall_iterations = stall_iterations
+        self.schedule = sorted((RoutedModel(name, info['model_family'], info['model_id'], info['start_iteration'],
+                                            info.get('cost')) for name, info in mixed_model_config.items()),
+                               key=lambda model: model.start_iteration)
+        self.ladder = [model._replace(cost=position + 1 if model.cost is None else model.cost)
+                       for position, model in enumerate(self.schedule)]
+        self.ladder.sort(key=lambda model: model.cost)
+        self._level = 0
+        self._stalled = 0
+
+    def choose(self, iteration):
+        """Return (model_family, model_id) for iteration. Does not change the router."""
+        if self.mode == "schedule":
+            model = next((model for model in reversed(self.schedule) if iteration >= model.start_iteration),
+                         self.schedule[0])
+        else:
+            model = min(self.ladder[self._level:], key=self.expected_cost)
+        return model.model_family, model.model_id
+
+    def expected_cost(self, model):
+        """Cost of a request to model divided by its chance of improving the best candidate."""
+        tokens = self.stats.mean_tokens(model.model_family, model.model_id) or 1000
+        return model.cost * tokens / self.stats.progress_rate(model.model_family, model.model_id)
+
+    def record(self, model_family, model_id, tokens, seconds, improved):
+        """Account for an iteration's request to a model and whether it improved the best candidate."""
+        self.stats.record(model_family, model_id, tokens, seconds, improved)
+        self._stalled = 0 if improved else self._stalled + 1
+        if self.mode != "adaptive" or self._stalled < self.stall_iterations:
+            return
+        position = next((idx for idx, model in enumerate(self.ladder)
+                         if (model.model_family, model.model_id) == (model_family, model_id)), None)
+        if position is not None and position + 1 < len(self.ladder) and position >= self._level:
+            self._level = position + 1
+            print(f"Debug: {model_family} {model_id} made no progress in {self._stalled} iterations; "
+                  f"escalating to {self.ladder[self._level].model_family} {self.ladder[self._level].model_id}")
+        self._stalled = 0
+
+
+def from_config(config_values, mixed_model_config):
+    """The router described by a config, or None without a mixed-models section."""
+    if not mixed_model_config:
+        return None
+    return ModelRouter(mixed_model_config, mode=config_values['routing'],
+                       stats=load_stats(config_values['routing_stats']),
+                       stall_iterations=config_values['stall_iterations'])
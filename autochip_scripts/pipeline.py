@@ -0,0 +1,101 @@
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import time
+
+# A next-round request started before the round finished. messages are the (role, content)
+# pairs it added to conversation, a fork of the round's conversation; it is only used if the
+# round ends up adding exactly the same messages and asking the same model for as many candidates.
+Speculation = namedtuple("Speculation", ["messages", "model_type", "model_id", "num_candidates", "conversation",
+                                         "request_tokens", "request_message_ids", "future"])
+
+_DONE = object()
+
+
+def _produce(stream, items):
+    """Put every item of stream on the queue, then the exception that ended it, if any, and _DONE."""
+    try:
+        for item in stream:
+            items.put(item)
+    except Exception as e:
+        items.put(e)
+    finally:
+        items.put(_DONE)
+
+
+def run_round(stream, prepare, evaluate, workers=1, executor=None, on_first_result=None):
+    """Evaluate candidates while they are still being generated; returns ({index: result}, sim seconds).
+
+    stream yields (index, candidate) pairs, typically from a model streaming its candidates.
+    It is read by a producer thread into a queue, so generation goes on while this thread
+    calls prepare(index, candidate), which returns (job, None) or (None, result) for a
+    candidate that needs no evaluation, and submits each job as evaluate(*job) to executor
+    (or to a thread pool of workers). Finished jobs are put on the same queue, so
+    on_first_result(index, result) is called once, as soon as the first result comes in
+    while candidates are still being generated or evaluated. The returned seconds are the
+    wall-clock time during which a job was being evaluated.
+    """
+    items = queue.Queue()
+    threading.Thread(target=_produce, args=(stream, items), daemon=True).start()
+    pool = None
+    if executor is None:
+        executor = pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    results = {}
+    pending = {}
+    started = None
+    streaming = True
+    try:
+        while streaming or pending:
+            item = items.get()
+            if item is _DONE:
+                streaming = False
+                continue
+            if isinstance(item, Exception):
+                raise item
+            if isinstance(item, Future):
+                idx = pending.pop(item)
+                results[idx] = item.result()
+                if on_first_result is not None and (streaming or pending):
+                    on_first_result(idx, results[idx])
+                    on_first_result = None
+                continue
+            idx, candidate = item
+            job, result = prepare(idx, candidate)
+            if job is None:
+                results[idx] = result
+                continue
+            if started is None:
+                started = time()
+            future = executor.submit(evaluate, *job)
+            pending[future] = idx
+            future.add_done_callback(items.put)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    return results, (time() - started if started is not None else 0.0)
+
+
+def speculate(conversation, messages, generate, model_type, model_id, num_candidates, executor):
+    """Fork conversation, add messages and start generate(fork, model_type, model_id, num_candidates) on executor."""
+    branch = conversation.fork()
+    for role, content in messages:
+        branch.add_message(role, content)
+    future = executor.submit(generate, branch, model_type, model_id, num_candidates)
+    return Speculation(list(messages), model_type, model_id, num_candidates, branch, branch.request_tokens(),
+                       branch.request_message_ids(), future)
+
+
+def matches(speculation, messages, model_type, model_id, num_candidates):
+    """True if speculation made the request the round actually ended with."""
+    return (speculation is not None and speculation.messages == list(messages)
+            and (speculation.model_type, speculation.model_id, speculation.num_candidates)
+            == (model_type, model_id, num_candidates))
+
+
+def discard(speculation, scheduler):
+    """Account for the tokens of a speculative request that will not be used, once it completes."""
+    def record(future):
+        if future.exception() is None:
+            scheduler.record_generation(speculation.request_tokens, [response.full_text for response in future.result()])
+    speculation.future.add_done_callback(record)
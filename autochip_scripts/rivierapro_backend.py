@@ -1,136 +1,216 @@
-import subprocess
-import os
-import re
-import shutil
-
-class RivieraPROBackend:
-   def __init__(self, verilog_file, testbench_file):
-       self.verilog_file = verilog_file
-       self.testbench_file = testbench_file
-       self.work_dir = "./work"
-       self.tb_module = self._get_testbench_module_name()
-
-   def _get_testbench_module_name(self):
-       """Extract the testbench module name from the testbench file."""
-       try:
-           with open(self.testbench_file, 'r') as f:
-               content = f.read()
-               # Look for the main testbench module that isn't stimulus_gen or reference_module
-               for pattern in [
-                   r'module\s+(\w+)\s*[;(]',
-                   r'module\s+(\w+)\s*#\s*\([^)]*\)\s*[(;]',
-                   r'module\s+(\w+)\s*\([^)]*\)\s*;'
-               ]:
-                   matches = re.finditer(pattern, content)
-                   for match in matches:
-                       module_name = match.group(1)
-                       if module_name not in ['stimulus_gen', 'reference_module']:
-                           return module_name
-               return "tb"  # Default fallback
-       except Exception as e:
-           print(f"Warning: Could not extract testbench module name: {e}")
-           return "tb"
-
-   def initialize_library(self):
-       """Initialize a library directory for Riviera-PRO."""
-       if os.path.exists(self.work_dir):
-           shutil.rmtree(self.work_dir)
-           
-       init_lib_cmd = f"vlib {self.work_dir}"
-       try:
-           print("Initializing library for Riviera-PRO...")
-           result = subprocess.run(
-               init_lib_cmd,
-               shell=True,
-               check=True,
-               stdout=subprocess.PIPE,
-               stderr=subprocess.PIPE,
-               text=True
-           )
-           print("Debug: Library initialized successfully.")
-           return result.stdout + result.stderr
-       except subprocess.CalledProcessError as e:
-           print(f"Library initialization failed: {e}")
-           return e.stdout + e.stderr if e.stdout or e.stderr else str(e)
-
-   def compile(self):
-       """Compile the Verilog design and testbench with Riviera-PRO."""
-       self.initialize_library()
-       
-       compile_cmd = f"vlog -work {self.work_dir} -dbg -sv2k12 {self.verilog_file} {self.testbench_file}"
-       try:
-           print(f"Debug: Running command: {compile_cmd}")
-           result = subprocess.run(
-               compile_cmd,
-               shell=True,
-               check=False,
-               stdout=subprocess.PIPE,
-               stderr=subprocess.PIPE,
-               text=True,
-               encoding='utf-8'
-           )
-           print(f"Debug: Command return code: {result.returncode}")
-           print(f"Debug: Stdout: {result.stdout}")
-           print(f"Debug: Stderr: {result.stderr}")
-           
-           if "SUCCESS" in result.stdout:
-               print("Debug: Compilation successful.")
-               return result.stdout + result.stderr
-           else:
-               print("Debug: Compilation had errors.")
-               return result.stdout + result.stderr
-       except Exception as e:
-           print(f"Compilation failed with exception: {str(e)}")
-           return str(e)
-
-   def simulate(self):
-    """Simulate the design using Riviera-PRO."""
-    do_file_path = "temp_simulation.do"
-    try:
-        with open(do_file_path, "w") as do_file:
-            do_file.write("onbreak {resume}\n")
-            do_file.write("amap work work\n")
-            do_file.write(f"asim +access +r {self.tb_module}\n")
-            do_file.write("run -all;\n")
-            do_file.write("quit;\n")
-    except Exception as e:
-        print(f"Error: Failed to create simulation .do file: {e}")
-        return False, None, str(e)
-
-    simulate_cmd = f"vsimsa -do {do_file_path}"
-    try:
-        print("Simulating with Riviera-PRO...")
-        result = subprocess.run(
-            simulate_cmd,
-            shell=True,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=300
-        )
-        
-        if result.returncode == 0:
-            stdout = result.stdout
-            stderr = result.stderr
-
-            # Parse total mismatches from output
-            mismatch_pattern = r"Mismatches:\s*(\d+)\s*in\s*(\d+)\s*samples"
-            match = re.search(mismatch_pattern, stdout)
-            if match:
-                total_mismatches = int(match.group(1))
-                if total_mismatches == 0:
-                    return 0, stderr, stdout  # Perfect match
-                else:
-                    return result.returncode, stdout, stderr  # Has mismatches
-            return result.returncode, stdout, stderr
-                
-    except subprocess.TimeoutExpired:
-        print("Simulation timed out after 300 seconds")
-        return False, None, "Simulation timeout"
-    except subprocess.CalledProcessError as e:
-        print(f"Simulation failed: {e}")
-        return False, e.stdout, e.stderr
-    finally:
-        if os.path.exists(do_file_path):
-            os.remove(do_file_path)
+import subprocess
+import hashlib
+import os
+import re
+import shutil
+from tools import AbstractCompilationTool, register_simulator
+from sim_result import SimulationResult
+
+@register_simulator("RivieraPRO")
+class RivieraPROBackend(AbstractCompilationTool):
+   executables = ("vlib", "vlog", "vsimsa")
+   supports_early_abort = True
+   vlog_flags = "-dbg -sv2k12"
+   asim_flags = "+access +r"
+   # Written into a testbench library once it compiled, holding the fingerprint of its source
+   testbench_stamp = "testbench.sha256"
+
+   def __init__(self, verilog_file, testbench_file, run_dir=None, cache=None, tb_lib_dir=None, session=None, **options):
+       # Optional SimulatorSession that runs the simulation in an already started vsimsa
+       self.session = session
+       # When set, the testbench lives in a shared precompiled library and only the
+       # design is compiled into this backend's work library
+       self.tb_lib_dir = os.path.abspath(tb_lib_dir) if tb_lib_dir else None
+       self.work_dir = "./work"
+       super().__init__(verilog_file, testbench_file, run_dir=run_dir, cache=cache, **options)
+
+   def initialize_library(self):
+       """Initialize a library directory for Riviera-PRO."""
+       if os.path.exists(self._run_path(self.work_dir)):
+           shutil.rmtree(self._run_path(self.work_dir))
+           
+       init_lib_cmd = f"vlib {self.work_dir}"
+       try:
+           print("Initializing library for Riviera-PRO...")
+           result = subprocess.run(
+               init_lib_cmd,
+               shell=True,
+               check=True,
+               stdout=subprocess.PIPE,
+               stderr=subprocess.PIPE,
+               text=True,
+               cwd=self.run_dir
+           )
+           print("Debug: Library initialized successfully.")
+           return result.stdout + result.stderr
+       except subprocess.CalledProcessError as e:
+           print(f"Library initialization failed: {e}")
+           return e.stdout + e.stderr if e.stdout or e.stderr else str(e)
+
+   def cache_flags(self):
+       return f"{self.vlog_flags}|{self.asim_flags}|{self.tb_module}"
+
+   def compile_succeeded(self, compile_output):
+       """vlog reports "Compile success 0 Errors" on success."""
+       return bool(compile_output) and ("SUCCESS" in compile_output or re.search(r"(?<!\d)0 Errors", compile_output) is not None)
+
+   @classmethod
+   def prepare_testbench_library(cls, testbench_file, tb_lib_dir):
+       """Compile the testbench into tb_lib_dir once; later calls reuse it until the testbench changes.
+
+       Returns (success, compile output).
+       """
+       tb_lib_dir = os.path.abspath(tb_lib_dir)
+       fingerprint = cls._testbench_fingerprint(testbench_file)
+       if cls.testbench_library_ready(testbench_file, tb_lib_dir, fingerprint):
+           return True, ""
+
+       if os.path.exists(tb_lib_dir):
+           shutil.rmtree(tb_lib_dir)
+       os.makedirs(tb_lib_dir)
+       compile_cmd = f"vlib tb_lib && vlog -work tb_lib {cls.vlog_flags} {os.path.abspath(testbench_file)}"
+       print(f"Debug: Compiling shared testbench library: {compile_cmd}")
+       result = subprocess.run(
+           compile_cmd,
+           shell=True,
+           check=False,
+           stdout=subprocess.PIPE,
+           stderr=subprocess.PIPE,
+           text=True,
+           encoding='utf-8',
+           cwd=tb_lib_dir
+       )
+       output = result.stdout + result.stderr
+       if result.returncode != 0 or "0 Errors" not in output:
+           print("Debug: Testbench library compilation had errors.")
+           return False, output
+
+       with open(os.path.join(tb_lib_dir, cls.testbench_stamp), 'w') as f:
+           f.write(fingerprint)
+       return True, output
+
+   @classmethod
+   def _testbench_fingerprint(cls, testbench_file):
+       with open(testbench_file, 'rb') as f:
+           return hashlib.sha256(f.read() + cls.vlog_flags.encode()).hexdigest()
+
+   @classmethod
+   def testbench_library_ready(cls, testbench_file, tb_lib_dir, fingerprint=None):
+       """True if tb_lib_dir holds the testbench compiled by prepare_testbench_library. Never changes it."""
+       stamp_file = os.path.join(tb_lib_dir, cls.testbench_stamp)
+       if not os.path.exists(stamp_file):
+           return False
+       with open(stamp_file, 'r') as f:
+           return f.read().strip() == (fingerprint or cls._testbench_fingerprint(testbench_file))
+
+   def _compile(self):
+       """Compile the Verilog design (and testbench, unless it is precompiled) with Riviera-PRO."""
+       # The library is prepared once by the parent process (prepare_shared_testbench); a worker
+       # only reads it, so a missing or stale one is compiled with the design instead of rebuilt
+       if self.tb_lib_dir and not self.testbench_library_ready(self.testbench_file, self.tb_lib_dir):
+           print(f"Warning: Shared testbench library {self.tb_lib_dir} is not ready; compiling the testbench with the design")
+           self.tb_lib_dir = None
+       if self.tb_lib_dir:
+           sources = self.verilog_file
+       else:
+           sources = f"{self.verilog_file} {self.testbench_file}"
+       if self.early_abort:
+           sources += f" {self.abort_monitor_file()}"
+
+       self.initialize_library()
+       
+       compile_cmd = f"vlog -work {self.work_dir} {self.vlog_flags} {sources}"
+       try:
+           print(f"Debug: Running command: {compile_cmd}")
+           result = subprocess.run(
+               compile_cmd,
+               shell=True,
+               check=False,
+               stdout=subprocess.PIPE,
+               stderr=subprocess.PIPE,
+               text=True,
+               encoding='utf-8',
+               cwd=self.run_dir
+           )
+           print(f"Debug: Command return code: {result.returncode}")
+           print(f"Debug: Stdout: {result.stdout}")
+           print(f"Debug: Stderr: {result.stderr}")
+           
+           if "SUCCESS" in result.stdout:
+               print("Debug: Compilation successful.")
+               return result.stdout + result.stderr
+           else:
+               print("Debug: Compilation had errors.")
+               return result.stdout + result.stderr
+       except Exception as e:
+           print(f"Compilation failed with exception: {str(e)}")
+           return str(e)
+
+   def _elaboration_commands(self):
+       """Simulator commands that map the libraries and elaborate the testbench."""
+       commands = ["amap work work"]
+       asim_flags = " ".join([self.asim_flags] + self.abort_plusargs())
+       monitor = f" work.{self.abort_monitor_module}" if self.early_abort else ""
+       if self.tb_lib_dir:
+           # Elaborate the shared testbench, resolving top_module from this candidate's library first
+           commands.append(f"amap tb_lib {os.path.join(self.tb_lib_dir, 'tb_lib')}")
+           commands.append(f"asim {asim_flags} -L work -L tb_lib tb_lib.{self.tb_module}{monitor}")
+       else:
+           commands.append(f"asim {asim_flags} {self.tb_module}{monitor}")
+       return commands
+
+   def _simulate_in_session(self):
+       """Simulate the design in the persistent simulator session."""
+       try:
+           print("Simulating with persistent Riviera-PRO session...")
+           stdout = self.session.simulate(self.run_dir or ".", self._elaboration_commands())
+           return self.parse_results(stdout)
+       except TimeoutError as e:
+           print(e)
+           return SimulationResult.failed("Simulation timeout")
+       except RuntimeError as e:
+           print(f"Simulation failed: {e}")
+           return SimulationResult.failed(str(e))
+
+   def _simulate(self):
+    """Simulate the design using Riviera-PRO."""
+    if self.session is not None:
+        return self._simulate_in_session()
+
+    do_file_name = "temp_simulation.do"
+    do_file_path = self._run_path(do_file_name)
+    try:
+        with open(do_file_path, "w") as do_file:
+            do_file.write("onbreak {resume}\n")
+            for command in self._elaboration_commands():
+                do_file.write(command + "\n")
+            do_file.write("run -all;\n")
+            do_file.write("quit;\n")
+    except Exception as e:
+        print(f"Error: Failed to create simulation .do file: {e}")
+        return SimulationResult.failed(str(e))
+
+    simulate_cmd = f"vsimsa -do {do_file_name}"
+    try:
+        print("Simulating with Riviera-PRO...")
+        result = subprocess.run(
+            simulate_cmd,
+            shell=True,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=300,
+            cwd=self.run_dir
+        )
+        return self.parse_results(result.stdout, result.returncode, result.stderr)
+    except subprocess.TimeoutExpired:
+        print("Simulation timed out after 300 seconds")
+        return SimulationResult.failed("Simulation timeout")
+    except subprocess.CalledProcessError as e:
+        print(f"Simulation failed: {e}")
+        # The testbench may still have printed its summary before vsimsa exited with an error
+        return self.parse_results(e.stdout, e.returncode, e.stderr)
+    finally:
+        if os.path.exists(do_file_path):
+            os.remove(do_file_path)
@@ -0,0 +1,150 @@
+import math
+from time import time
+
+from conversation import count_tokens
+
+SEARCH_MODES = ("fixed", "adaptive")
+
+
+class SearchScheduler:
+    """Decides how much each iteration of the repair loop may spend, and on which candidates.
+
+    In "adaptive" mode an iteration starts with max_candidates while nothing simulates, and
+    narrows toward min_candidates as the best mismatch count falls relative to the first one
+    seen. Candidates are then simulated by successive halving: every rung simulates the
+    remaining candidates with a mismatch budget (enforced by the early-abort monitor) that
+    doubles from rung to rung, keeping only the keep_fraction that got furthest before
+    exceeding it. A candidate that finishes within a rung's budget beats every candidate
+    that did not, so the search stops there. "fixed" mode keeps num_candidates and simulates
+    every candidate once.
+
+    In both modes the whole loop is limited by token_budget (prompt plus response tokens)
+    and sim_seconds_budget (wall-clock seconds spent simulating), when set.
+    """
+
+    def __init__(self, max_candidates, mode="fixed", min_candidates=1, keep_fraction=0.5, first_rung_budget=4,
+                 token_budget=None, sim_seconds_budget=None):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Invalid search mode '{mode}'. Must be one of: {', '.join(SEARCH_MODES)}")
+        self.max_candidates = max(1, max_candidates)
+        self.mode = mode
+        self.min_candidates = max(1, min(min_candidates, self.max_candidates))
+        self.keep_fraction = keep_fraction
+        self.first_rung_budget = first_rung_budget
+        self.token_budget = token_budget
+        self.sim_seconds_budget = sim_seconds_budget
+        self.tokens_used = 0
+        self.sim_seconds = 0.0
+        # Simulation results seen, and how many of them came from the simulation cache. They are
+        # counted here because the cache's own counters live in whichever worker process used it.
+        self.simulations = 0
+        self.cached_simulations = 0
+        self._initial_mismatches = None
+        self._tokens_per_candidate = None
+
+    @property
+    def adaptive(self):
+        return self.mode == "adaptive"
+
+    def num_candidates(self, best_mismatches=float('inf')):
+        """Candidates to generate in the next iteration."""
+        if not self.adaptive:
+            count = self.max_candidates
+        else:
+            if self._initial_mismatches is None and best_mismatches != float('inf'):
+                self._initial_mismatches = max(best_mismatches, 1)
+            if self._initial_mismatches is None:
+                count = self.max_candidates
+            else:
+                progress = min(best_mismatches / self._initial_mismatches, 1.0)
+                count = self.min_candidates + math.ceil((self.max_candidates - self.min_candidates) * progress)
+        # Never start more candidates than the remaining token budget is likely to pay for
+        if self.token_budget is not None and self._tokens_per_candidate:
+            affordable = int((self.token_budget - self.tokens_used) // self._tokens_per_candidate)
+            count = min(count, max(1, affordable))
+        return count
+
+    def record_generation(self, prompt_tokens, response_texts):
+        """Account for one request: its prompt and the responses it returned. Returns its tokens."""
+        if not response_texts:
+            return 0
+        tokens = prompt_tokens + sum(count_tokens(text) for text in response_texts)
+        self.tokens_used += tokens
+        self._tokens_per_candidate = tokens / len(response_texts)
+        return tokens
+
+    def record_simulation(self, seconds):
+        self.sim_seconds += seconds
+
+    def record_results(self, results):
+        """Count the (compile output, SimulationResult or None) results of evaluated candidates."""
+        for _, sim_output in results:
+            if sim_output is not None:
+                self.simulations += 1
+                self.cached_simulations += int(sim_output.cached)
+
+    def exhausted(self):
+        """Return why the search must stop, or None while budget remains."""
+        if self.token_budget is not None and self.tokens_used >= self.token_budget:
+            return f"token budget spent ({self.tokens_used}/{self.token_budget} tokens)"
+        if self.sim_seconds_budget is not None and self.sim_seconds >= self.sim_seconds_budget:
+            return f"simulation budget spent ({self.sim_seconds:.1f}/{self.sim_seconds_budget} s)"
+        return None
+
+    def keep(self, count):
+        """How many of count unfinished candidates go on to the next rung."""
+        return max(1, math.ceil(count * self.keep_fraction))
+
+    def evaluate(self, jobs, evaluate, final_budget=None):
+        """Simulate jobs, by successive halving in adaptive mode, and return results in job order.
+
+        evaluate(jobs, mismatch_budget) returns a (compile output, SimulationResult or None)
+        pair per job. final_budget is the mismatch budget of the last rung (None or 0 for a
+        complete simulation). Candidates dropped at a rung keep their aborted result.
+        """
+        if not self.adaptive or len(jobs) <= 1:
+            return self._timed(evaluate, jobs, final_budget)
+
+        results = [None] * len(jobs)
+        pending = list(range(len(jobs)))
+        rung_budget = self.first_rung_budget
+        while pending:
+            last = len(pending) <= 1 or (final_budget and final_budget <= rung_budget)
+            budget = (final_budget or 0) if last else rung_budget
+            for idx, result in zip(pending, self._timed(evaluate, [jobs[idx] for idx in pending], budget)):
+                results[idx] = result
+            aborted = [idx for idx in pending if results[idx][1] is not None and results[idx][1].aborted]
+            finished = len(aborted) < len([idx for idx in pending if results[idx][1] is not None])
+            if last or finished or not aborted:
+                break
+            # The candidates that got through the most samples before exceeding the budget go on
+            aborted.sort(key=lambda idx: results[idx][1].samples or 0, reverse=True)
+            pending = aborted[:self.keep(len(aborted))]
+            print(f"Debug: Successive halving: {len(pending)} of {len(aborted)} candidates continue "
+                  f"past {rung_budget} mismatches")
+            rung_budget *= 2
+        return results
+
+    def _timed(self, evaluate, jobs, budget):
+        start = time()
+        results = evaluate(jobs, budget)
+        self.record_simulation(time() - start)
+        self.record_results(results)
+        return results
+
+    def report(self):
+        """Return a one-line summary of what the search spent."""
+        return (f"Search ({self.mode}): {self.tokens_used} tokens"
+                + (f" of {self.token_budget}" if self.token_budget is not None else "")
+                + f", {self.sim_seconds:.1f} s simulating"
+                + (f" of {self.sim_seconds_budget}" if self.sim_seconds_budget is not None else "")
+                + (f", {self.cached_simulations} of {self.simulations} simulations from the cache"
+                   if self.cached_simulations else ""))
+
+
+def from_config(config_values):
+    """Build the scheduler described by the search settings of a config (see config_handler)."""
+    return SearchScheduler(config_values['num_candidates'], mode=config_values['search'],
+                           min_candidates=config_values['min_candidates'], keep_fraction=config_values['keep_fraction'],
+                           token_budget=config_values['token_budget'],
+                           sim_seconds_budget=config_values['sim_seconds_budget'])
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+from verilog_lint import tokenize
+
+_HORIZONTAL_WHITESPACE = re.compile(r'[ \t]+')
+
+# Puts since each cache directory was last checked for eviction, per process. Workers make a
+# SimulationCache per candidate, so the count cannot live on the instance.
+_puts_since_eviction = {}
+
+
+def normalize_design(text):
+    """Normalize whitespace so trivially different designs share a cache entry.
+
+    Line structure is kept so line numbers in cached compiler messages stay valid, and
+    string literals are kept as they are, since the whitespace in them is printed.
+    """
+    text = text.replace('\r\n', '\n')
+    parts = []
+    position = 0
+    for token in tokenize(text, keep_comments=True):
+        if token.kind == "string":
+            parts.append(_HORIZONTAL_WHITESPACE.sub(' ', text[position:token.start]))
+            parts.append(token.value)
+            position = token.end
+    parts.append(_HORIZONTAL_WHITESPACE.sub(' ', text[position:]))
+    return '\n'.join(line.strip() for line in "".join(parts).split('\n')).rstrip('\n')
+
+
+class SimulationCache:
+    """On-disk, content-addressed cache of compile and simulation results.
+
+    Entries are JSON files named by the hash of the normalized design, the testbench
+    content and the simulator flags. The least recently used entries are removed once
+    more than max_entries are stored. Listing the directory for that costs as much as the
+    cache saves once it is large, so it is only checked every evict_interval puts (by
+    default a tenth of max_entries) and may briefly hold that many entries more.
+    """
+
+    def __init__(self, cache_dir, max_entries=1000, evict_interval=None):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.evict_interval = evict_interval or max(1, max_entries // 10)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, design_text, testbench_text, flags=""):
+        """Hash the inputs that determine a compile/simulate result."""
+        digest = hashlib.sha256()
+        for part in (normalize_design(design_text), testbench_text, flags):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key):
+        """Return the cached entry for key, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        # Touch the entry so eviction sees it as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """Store an entry, replacing any previous one for key."""
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        entry = dict(entry, created=time.time())
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write simulation cache entry: {e}")
+            return
+        directory = os.path.abspath(self.cache_dir)
+        puts = _puts_since_eviction.get(directory, 0) + 1
+        if puts >= self.evict_interval:
+            self._evict()
+            puts = 0
+        _puts_since_eviction[directory] = puts
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                pass
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries()),
+        }
+
+    def report(self):
+        """Return a one-line summary of the cache statistics."""
+        stats = self.stats()
+        return (f"Simulation cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries, "
+                f"{stats['evictions']} evictions")
@@ -0,0 +1,99 @@
+import re
+from collections import namedtuple
+
+_SUMMARY_PATTERN = re.compile(r'Mismatches:\s*(\d+)\s*in\s*(\d+)')
+_SIGNAL_PATTERN = re.compile(r"Output '(\w+)' has (\d+) mismatches\. First mismatch occurred at time (\d+)")
+_ABORT_MARKER = 'AutoChip: early abort'
+# Lines the testbenches print about the comparison with the reference model, and the abort monitor's
+_SUMMARY_MARKERS = ('Hint:', 'Mismatches:', 'Total', _ABORT_MARKER)
+
+SignalMismatch = namedtuple("SignalMismatch", ["name", "count", "first_time"])
+
+_FIELDS = ["returncode", "stdout", "stderr", "mismatches", "samples", "signals", "summary", "error", "aborted",
+           "cached"]
+
+
+class SimulationResult(namedtuple("SimulationResult", _FIELDS)):
+    """The outcome of one simulation, parsed once from the simulator output.
+
+    mismatches and samples come from the testbench's "Mismatches: N in M samples" line and
+    are None when it never printed one; signals holds a SignalMismatch per "Hint: Output"
+    line and summary every comparison line, in output order. error is set (and returncode
+    is False) when the simulator could not be run or timed out. aborted is True when the
+    early-abort monitor stopped the run, so the counts cover only the samples before that.
+    cached is True when the result was read from the simulation cache instead of simulated.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, returncode, stdout, stderr=""):
+        """Build a result from the simulator's output in a single pass over its lines."""
+        mismatches = samples = None
+        aborted = False
+        signals = []
+        summary = []
+        for line in (stdout or "").split('\n'):
+            if not any(marker in line for marker in _SUMMARY_MARKERS):
+                continue
+            summary.append(line.strip())
+            if _ABORT_MARKER in line:
+                aborted = True
+                continue
+            match = _SIGNAL_PATTERN.search(line)
+            if match:
+                signals.append(SignalMismatch(match.group(1), int(match.group(2)), int(match.group(3))))
+                continue
+            match = _SUMMARY_PATTERN.search(line)
+            if match and mismatches is None:
+                mismatches, samples = int(match.group(1)), int(match.group(2))
+        return cls(returncode, stdout or "", stderr or "", mismatches, samples, tuple(signals), tuple(summary), None,
+                   aborted, False)
+
+    @classmethod
+    def failed(cls, error, stdout="", stderr=""):
+        """A simulation that did not run to completion."""
+        return cls(False, stdout or "", stderr or "", None, None, (), (), error, False, False)
+
+    @property
+    def mismatch_count(self):
+        """Total mismatches, or inf when the testbench reported none, for ranking."""
+        return float('inf') if self.mismatches is None else self.mismatches
+
+    @property
+    def passed(self):
+        return self.mismatches == 0
+
+    def signal_mismatches(self):
+        """Per-signal {'count', 'first_time'} keyed by output name."""
+        return {signal.name: {"count": signal.count, "first_time": signal.first_time} for signal in self.signals}
+
+    def feedback(self):
+        """Lines describing the mismatches, for the next prompt."""
+        lines = []
+        if self.mismatches is not None:
+            lines.append(f"\nDetected {self.mismatches} mismatches out of {self.samples} samples")
+        if self.aborted:
+            lines.append("The simulation was stopped early once the mismatches exceeded the budget, "
+                         "so these counts cover only the samples up to that point")
+        for signal in self.signals:
+            if signal.count > 0:
+                lines.append(f"- Signal {signal.name}: {signal.count} mismatches, first occurred at time {signal.first_time}")
+        return lines
+
+    def to_dict(self, include_output=True):
+        """JSON-serializable form, as stored in the simulation cache."""
+        record = self._asdict()
+        record["signals"] = [signal._asdict() for signal in self.signals]
+        record["summary"] = list(self.summary)
+        if not include_output:
+            del record["stdout"], record["stderr"]
+        return record
+
+    @classmethod
+    def from_dict(cls, record):
+        record = dict(record)
+        record.setdefault("aborted", False)
+        record.setdefault("cached", False)
+        record["signals"] = tuple(SignalMismatch(**signal) for signal in record["signals"])
+        record["summary"] = tuple(record["summary"])
+        return cls(**record)
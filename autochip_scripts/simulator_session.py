@@ -0,0 +1,129 @@
+import atexit
+import os
+import queue
+import subprocess
+import threading
+import time
+
+# Sessions shared by every backend in this process, keyed by simulator command
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class SimulatorSession:
+    """A long-lived vsimsa process that runs one simulation after another.
+
+    Commands are written to the simulator's stdin and its output is read back until a
+    sentinel echoed after the last command, so startup and license checkout are paid
+    once per session instead of once per candidate.
+    """
+
+    def __init__(self, command=("vsimsa",), timeout=300):
+        self.command = list(command)
+        self.timeout = timeout
+        self.process = None
+        self.simulations = 0
+        self._output = None
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the simulator process if it is not already running."""
+        if self.process is not None and self.process.poll() is None:
+            return
+        print(f"Starting persistent simulator session: {' '.join(self.command)}")
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1
+        )
+        self._output = queue.Queue()
+        threading.Thread(target=self._read_output, args=(self.process, self._output), daemon=True).start()
+
+    @staticmethod
+    def _read_output(process, output):
+        for line in process.stdout:
+            output.put(line)
+        output.put(None)
+
+    def run(self, commands, timeout=None):
+        """Send commands to the simulator and return everything it printed while running them."""
+        timeout = timeout or self.timeout
+        with self._lock:
+            self.start()
+            self._sequence += 1
+            sentinel = f"AUTOCHIP_SESSION_DONE_{self._sequence}"
+            try:
+                for command in list(commands) + [f"echo {sentinel}"]:
+                    self.process.stdin.write(command + "\n")
+                self.process.stdin.flush()
+            except OSError as e:
+                self._kill()
+                raise RuntimeError(f"Simulator session died: {e}")
+
+            lines = []
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    line = self._output.get(timeout=max(remaining, 0))
+                except queue.Empty:
+                    # A stuck simulation leaves the session in an unknown state, so start over
+                    self._kill()
+                    raise TimeoutError(f"Simulation did not finish within {timeout} seconds")
+                if line is None:
+                    self._kill()
+                    raise RuntimeError("Simulator session exited unexpectedly:\n" + "".join(lines))
+                # Ignore the console echoing the command itself
+                if line.strip().endswith(sentinel) and "echo" not in line:
+                    break
+                lines.append(line)
+            return "".join(lines)
+
+    def simulate(self, run_dir, elaboration_commands, timeout=None):
+        """Run one complete simulation from run_dir and leave the session ready for the next."""
+        commands = [f"cd {{{os.path.abspath(run_dir)}}}"]
+        commands += list(elaboration_commands)
+        commands += ["run -all", "endsim"]
+        output = self.run(commands, timeout)
+        self.simulations += 1
+        return output
+
+    def _kill(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def close(self):
+        """Ask the simulator to quit, killing it if it does not."""
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.write("quit\n")
+            self.process.stdin.close()
+            self.process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self._kill()
+
+
+def get_session(command=("vsimsa",)):
+    """Return the process-wide session for command, creating it on first use."""
+    key = tuple(command)
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = SimulatorSession(command)
+        return _sessions[key]
+
+
+@atexit.register
+def close_sessions():
+    """Shut down every session created through get_session."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The scripts import each other as top-level modules, as when run from autochip_scripts
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import batch_runner
+import config_handler
+import languagemodels as lm
+import tree_search
+
+
+class FakeLoop:
+    """Stands in for the repair loop: records what each prompt shares and how many requests overlap."""
+
+    def __init__(self, delay=0.05, failing=()):
+        self.delay = delay
+        self.failing = failing
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def search_loop(self, settings):
+        return self
+
+    def __call__(self, prompt, module, testbench, iterations, model_type, model_id, num_candidates, outdir, log,
+                 mixed_model_config, executor=None, llm_semaphore=None, **options):
+        self.calls.append((os.path.basename(outdir), executor, llm_semaphore))
+        if os.path.basename(outdir) in self.failing:
+            raise RuntimeError("model unavailable")
+        with llm_semaphore:
+            with self._lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(self.delay)
+            with self._lock:
+                self.active -= 1
+        best = lm.LLMResponse(0, 0, prompt)
+        best.rank, best.mismatches = 1, (0 if "pass" in prompt else 3)
+        return best
+
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    prompt_dir = tmp_path / "prompts"
+    for name, text in (("a", "pass"), ("b", "fail"), ("c", "pass"), ("d", "pass")):
+        (prompt_dir / name).mkdir(parents=True)
+        (prompt_dir / name / f"{name}.sv").write_text(text)
+        (prompt_dir / name / f"{name}_tb.sv").write_text("")
+    settings = config_handler.apply_defaults({"outdir": str(tmp_path / "out"), "name": "top_module", "log": None})
+    loop = FakeLoop()
+    monkeypatch.setattr(tree_search, "search_loop", loop.search_loop)
+    return batch_runner.find_prompts(str(prompt_dir)), settings, loop
+
+
+def test_prompts_share_one_sim_pool_and_llm_limit(batch):
+    prompts, settings, loop = batch
+    results = batch_runner.run_batch(prompts, settings, jobs=4, llm_concurrency=2, sim_seats=1)
+    assert [(result["name"], result["success"]) for result in results] == [
+        ("a", True), ("b", False), ("c", True), ("d", True)]
+    assert len({id(executor) for _, executor, _ in loop.calls}) == 1
+    assert len({id(semaphore) for _, _, semaphore in loop.calls}) == 1
+    assert loop.max_active == 2
+
+
+def test_resume_skips_finished_prompts(batch):
+    prompts, settings, loop = batch
+    os.makedirs(os.path.join(settings["outdir"], "a"))
+    batch_runner.write_result(os.path.join(settings["outdir"], "a"), {"name": "a", "success": False, "seconds": 1})
+    results = batch_runner.run_batch(prompts, settings, jobs=2)
+    assert sorted(name for name, _, _ in loop.calls) == ["b", "c", "d"]
+    # The earlier result is reported as it was recorded
+    assert results[0] == {"name": "a", "success": False, "seconds": 1}
+
+    loop.calls.clear()
+    batch_runner.run_batch(prompts, settings, jobs=2)
+    assert loop.calls == []
+    batch_runner.run_batch(prompts, settings, jobs=2, rerun=True)
+    assert sorted(name for name, _, _ in loop.calls) == ["a", "b", "c", "d"]
+
+
+def test_failed_prompt_is_retried_on_resume(batch):
+    prompts, settings, loop = batch
+    loop.failing = ("b",)
+    results = batch_runner.run_batch(prompts, settings, jobs=2)
+    assert [result["name"] for result in results] == ["a", "c", "d"]
+    assert batch_runner.load_result(os.path.join(settings["outdir"], "b")) is None
+    with open(os.path.join(settings["outdir"], "a", batch_runner.RESULT_FILE)) as f:
+        assert json.load(f)["success"]
+
+    loop.failing = ()
+    loop.calls.clear()
+    results = batch_runner.run_batch(prompts, settings, jobs=2)
+    assert [name for name, _, _ in loop.calls] == ["b"]
+    assert len(results) == 4
+
+
+def test_defaults_match_the_single_prompt_entry_point(tmp_path, monkeypatch):
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"general": {"prompt": "p.sv", "name": "top_module", "testbench": "tb.sv",
+                                              "outdir": str(tmp_path / "out"), "log": "", "model_family": "Claude",
+                                              "model_id": "claude-2", "vcd_windows": 1}}))
+    monkeypatch.setattr("sys.argv", ["generate_verilog.py", "-c", str(config)])
+    config_values, _, _ = config_handler.parse_args_and_config()
+    assert {key: config_values[key] for key in config_handler.DEFAULTS} == dict(config_handler.DEFAULTS,
+                                                                                 vcd_windows=1)
@@ -0,0 +1,39 @@
+"""Every module must import on its own, whatever it imports first."""
+import glob
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import SCRIPTS_DIR
+
+# parse_data and parse_parameter_sweep are scripts that read ./outputs as soon as they are imported
+SCRIPTS = {"parse_data", "parse_parameter_sweep"}
+MODULES = sorted(os.path.splitext(os.path.basename(path))[0] for path in glob.glob(os.path.join(SCRIPTS_DIR, "*.py"))
+                 if os.path.splitext(os.path.basename(path))[0] not in SCRIPTS)
+BENCHMARKS = sorted(os.path.relpath(path, SCRIPTS_DIR) for path in glob.glob(os.path.join(SCRIPTS_DIR, "benchmarks", "*.py")))
+
+
+def run_fresh(code):
+    # A fresh interpreter, so modules already imported by the test session cannot hide a cycle
+    return subprocess.run([sys.executable, "-c", code], cwd=SCRIPTS_DIR, capture_output=True, text=True, timeout=60)
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_module_imports(module):
+    result = run_fresh(f"import {module}")
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.mark.parametrize("path", BENCHMARKS)
+def test_benchmark_imports(path):
+    # run_path without __main__ only executes the imports and definitions
+    result = run_fresh(f"import runpy; runpy.run_path({path!r}, run_name='benchmark')")
+    assert result.returncode == 0, result.stderr
+
+
+def test_languagemodels_does_not_import_the_loop():
+    # verilog_handling imports languagemodels and llm_cache, so importing it back would be a cycle
+    result = run_fresh("import sys, languagemodels, llm_cache, model_pool; assert 'verilog_handling' not in sys.modules")
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from conversation import Conversation
+from languagemodels import AbstractLLM
+
+
+class RateLimitError(Exception):
+    """What the provider SDKs raise on a 429: a status code and the response with its headers."""
+
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.status_code = error.code
+        self.response = error
+
+
+class HTTPModel(AbstractLLM):
+    """A provider that requests each candidate from a local server."""
+
+    backoff_base = 0.01
+
+    def __init__(self, url, max_concurrency=2):
+        self.url = url
+        self.max_concurrency = max_concurrency
+
+    def generate(self, conversation, num_candidates=1, stop_at_module=None):
+        return self.generate_concurrently(conversation, num_candidates, stop_at_module)
+
+    def generate_one(self, conversation):
+        try:
+            with urllib.request.urlopen(self.url) as response:
+                return response.read().decode()
+        except urllib.error.HTTPError as e:
+            raise RateLimitError(e) from e
+
+
+class Server:
+    """Answers with its arrival number after delays[arrival] seconds, or 429 for the arrivals in rate_limited."""
+
+    def __init__(self, delays=(), rate_limited=(), retry_after="0"):
+        self.arrivals = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with lock:
+                    arrival = len(server.arrivals)
+                    server.arrivals.append(time.monotonic())
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                time.sleep(delays[arrival] if arrival < len(delays) else 0.05)
+                with lock:
+                    server.in_flight -= 1
+                if arrival in rate_limited:
+                    self.send_response(429)
+                    self.send_header("Retry-After", retry_after)
+                    self.end_headers()
+                    return
+                body = str(arrival).encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    monkeypatch.setattr(AbstractLLM, "_backoff_until", {})
+    servers = []
+
+    def start(**kwargs):
+        servers.append(Server(**kwargs))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def conversation():
+    conv = Conversation()
+    conv.add_message("user", "module top_module();")
+    return conv
+
+
+def test_in_flight_requests_are_bounded(serve):
+    server = serve(delays=[0.1] * 6)
+    texts = HTTPModel(server.url, max_concurrency=2).generate(conversation(), 6)
+    assert sorted(texts) == [str(arrival) for arrival in range(6)]
+    assert server.max_in_flight == 2
+
+
+def test_rate_limit_backs_off_for_retry_after(serve):
+    server = serve(rate_limited={1}, retry_after="0.3")
+    texts = HTTPModel(server.url, max_concurrency=1).generate(conversation(), 3)
+    # One request at a time, so candidates keep their order and the rate-limited one is retried in place
+    assert texts == ["0", "2", "3"]
+    assert server.arrivals[2] - server.arrivals[1] >= 0.3
+
+
+def test_streaming_yields_in_completion_order(serve):
+    # The first request to arrive is the slowest one
+    server = serve(delays=[0.5, 0.05, 0.05, 0.05])
+    streamed = list(HTTPModel(server.url).generate_concurrently_streaming(conversation(), 4))
+    assert sorted(idx for idx, _ in streamed) == [0, 1, 2, 3]
+    assert streamed[-1][1] == "0"
+
+
+def test_generate_inside_a_running_event_loop(serve):
+    server = serve()
+    model = HTTPModel(server.url)
+
+    async def caller():
+        return model.generate(conversation(), 3), list(model.generate_concurrently_streaming(conversation(), 2))
+
+    texts, streamed = asyncio.run(caller())
+    assert sorted(texts) == ["0", "1", "2"]
+    assert sorted(idx for idx, _ in streamed) == [0, 1]
@@ -0,0 +1,116 @@
+import pytest
+
+import languagemodels as lm
+from conversation import Conversation
+from llm_cache import CachedLLM, CacheMissError, ResponseCache
+
+
+class CountingModel(lm.AbstractLLM):
+    """A provider numbering its responses, so repeated requests are told apart."""
+
+    sampling = {"temperature": 0.7}
+
+    def __init__(self, model_id="m"):
+        self.model_id = model_id
+        self.requests = []
+
+    def generate(self, conversation, num_candidates=1, stop_at_module=None):
+        self.requests.append(num_candidates)
+        start = sum(self.requests[:-1])
+        return [f"response {start + idx}" for idx in range(num_candidates)]
+
+
+@pytest.fixture(autouse=True)
+def fake_family(monkeypatch):
+    monkeypatch.setitem(lm.MODEL_REGISTRY, "Counting", CountingModel)
+
+
+def conversation(prompt="module top_module();"):
+    conv = Conversation()
+    conv.add_message("system", "You write Verilog.")
+    conv.add_message("user", prompt)
+    return conv
+
+
+def cached(cache_dir, mode="record"):
+    model = CountingModel()
+    return CachedLLM(ResponseCache(cache_dir, mode), "Counting", "m", lambda: model), model
+
+
+def unavailable():
+    raise AssertionError("the provider is not needed when replaying")
+
+
+def test_record_then_replay(tmp_path):
+    recorder, model = cached(str(tmp_path))
+    texts = recorder.generate(conversation(), 3)
+    assert texts == ["response 0", "response 1", "response 2"]
+    assert recorder.generate(conversation(), 3) == texts
+    assert model.requests == [3]
+
+    replayer = CachedLLM(ResponseCache(str(tmp_path), "replay"), "Counting", "m", unavailable)
+    # Line endings and trailing spaces do not change the key
+    assert replayer.generate(conversation("module top_module();  \r\n"), 3) == texts
+    assert replayer.cache.hits == 3 and replayer.cache.misses == 0
+
+
+def test_key_covers_model_sampling_and_stop(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    key = cache.make_key("Counting", "m", conversation(), {"temperature": 0.7}, 0)
+    assert key == cache.make_key("Counting", "m", conversation(), {"temperature": 0.7}, 0)
+    assert key != cache.make_key("Counting", "other", conversation(), {"temperature": 0.7}, 0)
+    assert key != cache.make_key("Counting", "m", conversation(), {"temperature": 0.2}, 0)
+    assert key != cache.make_key("Counting", "m", conversation(), {"temperature": 0.7}, 1)
+    assert key != cache.make_key("Counting", "m", conversation(), {"temperature": 0.7}, 0, "top_module")
+    assert key != cache.make_key("Counting", "m", conversation("module other();"), {"temperature": 0.7}, 0)
+
+
+def test_replay_miss_raises(tmp_path):
+    recorder, _ = cached(str(tmp_path))
+    recorder.generate(conversation(), 2)
+    replayer = CachedLLM(ResponseCache(str(tmp_path), "replay"), "Counting", "m", unavailable)
+    with pytest.raises(CacheMissError, match=r"candidate\(s\) \[2, 3\]"):
+        replayer.generate(conversation(), 4)
+    with pytest.raises(CacheMissError):
+        replayer.generate(conversation("module other();"), 1)
+
+
+def test_partial_hit_only_requests_missing_candidates(tmp_path):
+    recorder, model = cached(str(tmp_path))
+    recorder.generate(conversation(), 2)
+    assert recorder.generate(conversation(), 4) == ["response 0", "response 1", "response 2", "response 3"]
+    assert model.requests == [2, 2]
+
+
+def test_partial_hit_streaming(tmp_path):
+    recorder, model = cached(str(tmp_path))
+    recorder.generate(conversation(), 2)
+    stream = recorder.generate_streaming(conversation(), 4)
+    # Cached candidates come before the provider is asked for anything
+    assert [next(stream), next(stream)] == [(0, "response 0"), (1, "response 1")]
+    assert model.requests == [2]
+    assert list(stream) == [(2, "response 2"), (3, "response 3")]
+    assert model.requests == [2, 2]
+
+    replayer = CachedLLM(ResponseCache(str(tmp_path), "replay"), "Counting", "m", unavailable)
+    assert list(replayer.generate_streaming(conversation(), 4))[-1] == (3, "response 3")
+    streamed = []
+    with pytest.raises(CacheMissError):
+        for item in replayer.generate_streaming(conversation(), 5):
+            streamed.append(item)
+    assert len(streamed) == 4
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    key = cache.make_key("Counting", "m", conversation(), {}, 0)
+    cache.put(key, "text", "Counting", "m")
+    with open(cache._entry_path(key), 'w') as f:
+        f.write("{truncated")
+    assert cache.get(key) is None
+    assert "0 hits, 1 misses" in cache.report()
+
+
+def test_invalid_mode(tmp_path):
+    with pytest.raises(ValueError, match="Invalid LLM cache mode"):
+        ResponseCache(str(tmp_path), "offline")
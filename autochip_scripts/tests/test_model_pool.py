@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+
+import languagemodels as lm
+from model_pool import ModelPool
+
+GB = 1024 ** 3
+
+
+class LocalModel(lm.AbstractLLM):
+    """A provider whose construction can be held up and whose weights have a set size."""
+
+    gates = {}
+    footprints = {}
+    failures = set()
+    constructed = []
+    released = []
+
+    def __init__(self, model_id="default"):
+        self.model_id = model_id
+        LocalModel.constructed.append(model_id)
+        gate = LocalModel.gates.get(model_id)
+        if gate is not None:
+            gate.wait(timeout=5)
+        if model_id in LocalModel.failures:
+            raise OSError(f"no weights for {model_id}")
+
+    def generate(self, conversation, num_candidates=1, stop_at_module=None):
+        return [self.model_id] * num_candidates
+
+    def memory_footprint(self):
+        return LocalModel.footprints.get(self.model_id, 0)
+
+    def release(self):
+        LocalModel.released.append(self.model_id)
+
+
+@pytest.fixture(autouse=True)
+def local_model(monkeypatch):
+    monkeypatch.setitem(lm.MODEL_REGISTRY, "Local", LocalModel)
+    for name in ("gates", "footprints"):
+        monkeypatch.setattr(LocalModel, name, {})
+    for name in ("constructed", "released"):
+        monkeypatch.setattr(LocalModel, name, [])
+    monkeypatch.setattr(LocalModel, "failures", set())
+
+
+def in_thread(function, *args):
+    """Start function(*args) in a thread; returns the thread and a list that receives its result."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function(*args)))
+    thread.start()
+    return thread, result
+
+
+def test_models_are_loaded_once():
+    pool = ModelPool()
+    assert pool.get("Local", "a") is pool.get("Local", "a")
+    assert pool.get("Local") is pool.get("Local", "")
+    assert LocalModel.constructed == ["a", "default"]
+    assert pool.loads == 2
+
+
+def test_concurrent_requests_share_one_load():
+    pool = ModelPool()
+    LocalModel.gates["a"] = gate = threading.Event()
+    started = [in_thread(pool.get, "Local", "a") for _ in range(3)]
+    gate.set()
+    for thread, _ in started:
+        thread.join(timeout=5)
+    models = [result[0] for _, result in started]
+    assert models[0] is models[1] is models[2]
+    assert LocalModel.constructed == ["a"]
+
+
+def test_loading_does_not_block_other_models():
+    pool = ModelPool()
+    LocalModel.gates["slow"] = gate = threading.Event()
+    slow, slow_result = in_thread(pool.get, "Local", "slow")
+    # Another model, and the pool's other methods, are served while the slow one loads
+    assert pool.get("Local", "fast").model_id == "fast"
+    assert pool.memory_bytes() == 0
+    assert slow_result == []
+    gate.set()
+    slow.join(timeout=5)
+    assert slow_result[0].model_id == "slow"
+
+
+def test_failed_load_is_retried():
+    pool = ModelPool()
+    LocalModel.failures.add("a")
+    LocalModel.gates["a"] = gate = threading.Event()
+    errors = []
+    waiter = threading.Thread(target=lambda: errors.append(pytest.raises(OSError, pool.get, "Local", "a")))
+    waiter.start()
+    while not LocalModel.constructed:
+        time.sleep(0.01)
+    other = threading.Thread(target=lambda: errors.append(pytest.raises(OSError, pool.get, "Local", "a")))
+    other.start()
+    gate.set()
+    waiter.join(timeout=5)
+    other.join(timeout=5)
+    assert len(errors) == 2
+    LocalModel.failures.clear()
+    assert pool.get("Local", "a").model_id == "a"
+    assert pool.loads == 1
+
+
+def test_least_recently_used_model_is_released():
+    pool = ModelPool(max_models=2)
+    pool.get("Local", "a")
+    pool.get("Local", "b")
+    pool.get("Local", "a")
+    pool.get("Local", "c")
+    assert LocalModel.released == ["b"]
+    assert pool.evictions == 1
+    assert pool.evict("Local", "a") == 1 and LocalModel.released == ["b", "a"]
+
+
+def test_memory_limit_keeps_the_requested_model():
+    LocalModel.footprints.update(a=0.6 * GB, b=0.6 * GB, huge=2 * GB)
+    pool = ModelPool(max_memory_gb=1)
+    pool.get("Local", "a")
+    pool.get("Local", "b")
+    assert LocalModel.released == ["a"]
+    # A model over the limit on its own is still served
+    assert pool.get("Local", "huge").model_id == "huge"
+    assert LocalModel.released == ["a", "b"]
+    assert pool.memory_bytes() == 2 * GB
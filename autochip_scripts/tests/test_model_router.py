@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+
+import pytest
+
+import model_router
+from model_router import ModelRouter, RoutingStats
+
+MIXED = {
+    "small": {"model_family": "Claude", "model_id": "claude-haiku", "start_iteration": 0},
+    "large": {"model_family": "Claude", "model_id": "claude-opus", "start_iteration": 4},
+    "medium": {"model_family": "ChatGPT", "model_id": "gpt-4", "start_iteration": 2},
+}
+
+
+def test_schedule_switches_at_start_iterations():
+    router = ModelRouter(MIXED)
+    assert [router.choose(iteration)[1] for iteration in range(6)] == [
+        "claude-haiku", "claude-haiku", "gpt-4", "gpt-4", "claude-opus", "claude-opus"]
+    # Schedule mode never escalates, however little progress is made
+    for _ in range(5):
+        router.record("Claude", "claude-haiku", 100, 1.0, False)
+    assert router.choose(0) == ("Claude", "claude-haiku")
+
+
+def test_adaptive_starts_with_the_cheapest_model():
+    router = ModelRouter(MIXED, mode="adaptive")
+    # Without costs, models get pricier in start_iteration order
+    assert [model.model_id for model in router.ladder] == ["claude-haiku", "gpt-4", "claude-opus"]
+    assert router.choose(5) == ("Claude", "claude-haiku")
+
+
+def test_adaptive_prefers_the_cheapest_progress():
+    stats = RoutingStats()
+    for improved in (False, False, False, False, False, False, False, True):
+        stats.record("Claude", "claude-haiku", 1000, 1.0, improved)
+    for improved in (True, True, True, False):
+        stats.record("ChatGPT", "gpt-4", 1000, 1.0, improved)
+    router = ModelRouter(MIXED, mode="adaptive", stats=stats, stall_iterations=100)
+    # haiku: 1 * 1000 / (2/10) = 5000; gpt-4: 2 * 1000 / (4/6) = 3000
+    assert router.expected_cost(router.ladder[0]) == pytest.approx(5000)
+    assert router.expected_cost(router.ladder[1]) == pytest.approx(3000)
+    assert router.choose(0) == ("ChatGPT", "gpt-4")
+
+
+def test_explicit_costs_order_the_ladder():
+    mixed = {name: dict(info, cost=cost) for (name, info), cost in zip(MIXED.items(), (0.5, 3.0, 1.0))}
+    router = ModelRouter(mixed, mode="adaptive")
+    assert [model.model_id for model in router.ladder] == ["claude-haiku", "gpt-4", "claude-opus"]
+    assert [model.cost for model in router.ladder] == [0.5, 1.0, 3.0]
+
+
+def test_stall_escalates_to_the_next_model():
+    router = ModelRouter(MIXED, mode="adaptive", stall_iterations=2)
+    router.record("Claude", "claude-haiku", 100, 1.0, False)
+    assert router.choose(1) == ("Claude", "claude-haiku")
+    router.record("Claude", "claude-haiku", 100, 1.0, True)
+    router.record("Claude", "claude-haiku", 100, 1.0, False)
+    # An improvement resets the count
+    assert router.choose(3) == ("Claude", "claude-haiku")
+    router.record("Claude", "claude-haiku", 100, 1.0, False)
+    assert router.choose(4) == ("ChatGPT", "gpt-4")
+    router.record("ChatGPT", "gpt-4", 100, 1.0, False)
+    router.record("ChatGPT", "gpt-4", 100, 1.0, False)
+    assert router.choose(6) == ("Claude", "claude-opus")
+    # The last model is kept
+    router.record("Claude", "claude-opus", 100, 1.0, False)
+    router.record("Claude", "claude-opus", 100, 1.0, False)
+    assert router.choose(8) == ("Claude", "claude-opus")
+
+
+def test_stale_stall_does_not_step_back():
+    router = ModelRouter(MIXED, mode="adaptive", stall_iterations=1)
+    router.record("ChatGPT", "gpt-4", 100, 1.0, False)
+    assert router.choose(1) == ("Claude", "claude-opus")
+    # A late report about a model below the current level leaves the level alone
+    router.record("Claude", "claude-haiku", 100, 1.0, False)
+    assert router.choose(2) == ("Claude", "claude-opus")
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError, match="Invalid routing mode"):
+        ModelRouter(MIXED, mode="random")
+
+
+def test_stats_file_round_trip(tmp_path):
+    path = str(tmp_path / "routing.json")
+    stats = RoutingStats(path)
+    stats.record("Claude", "claude-haiku", 120, 1.5, True)
+    stats.record("Claude", "claude-haiku", 80, 0.5, False)
+    assert os.listdir(tmp_path) == ["routing.json"]
+    reloaded = RoutingStats(path)
+    assert reloaded.get("Claude", "claude-haiku") == {"requests": 2, "improvements": 1, "tokens": 200, "seconds": 2.0}
+    assert reloaded.mean_tokens("Claude", "claude-haiku") == 100
+    assert reloaded.progress_rate("Claude", "claude-haiku") == pytest.approx(0.5)
+    assert reloaded.mean_tokens("Claude", "claude-opus") is None
+
+
+def test_stats_file_is_replaced_atomically(tmp_path, monkeypatch):
+    path = str(tmp_path / "routing.json")
+    stats = RoutingStats(path)
+    replaced = []
+    replace = os.replace
+    monkeypatch.setattr(os, "replace", lambda source, target: replaced.append((source, target)) or replace(source, target))
+
+    def record():
+        for _ in range(25):
+            stats.record("Claude", "claude-haiku", 10, 0.1, False)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(replaced) == 100 and all(source == path + ".tmp" and target == path for source, target in replaced)
+    with open(path) as f:
+        assert json.load(f)["Claude/claude-haiku"]["requests"] == 100
+
+
+def test_unreadable_stats_file_starts_empty(tmp_path, capsys):
+    path = tmp_path / "routing.json"
+    path.write_text("{not json")
+    stats = RoutingStats(str(path))
+    assert stats.models == {}
+    assert "Could not read routing statistics" in capsys.readouterr().out
+
+
+def test_load_stats_is_shared_per_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_router, "_stats", {})
+    path = str(tmp_path / "routing.json")
+    assert model_router.load_stats(path) is model_router.load_stats(path)
+    assert model_router.load_stats() is not model_router.load_stats()
+
+
+def test_from_config(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_router, "_stats", {})
+    config = {"routing": "adaptive", "routing_stats": str(tmp_path / "routing.json"), "stall_iterations": 3}
+    assert model_router.from_config(config, {}) is None
+    router = model_router.from_config(config, MIXED)
+    assert router.mode == "adaptive" and router.stall_iterations == 3
+    assert router.stats is model_router.load_stats(config["routing_stats"])
@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+import pipeline
+
+
+def prepare(idx, candidate):
+    return ((candidate,), None) if candidate is not None else (None, "lint failure")
+
+
+def test_first_result_arrives_while_streaming():
+    first = threading.Event()
+    events = []
+
+    def stream():
+        yield 0, "a"
+        # The next candidate only comes once the first result has been handed out
+        events.append(("stream waits", first.wait(timeout=5)))
+        yield 1, "b"
+        yield 2, None
+
+    def on_first_result(idx, result):
+        events.append(("first result", idx, result))
+        first.set()
+
+    results, sim_seconds = pipeline.run_round(stream(), prepare, str.upper, workers=2, on_first_result=on_first_result)
+    assert results == {0: "A", 1: "B", 2: "lint failure"}
+    assert events == [("first result", 0, "A"), ("stream waits", True)]
+    assert sim_seconds >= 0
+
+
+def test_stream_error_is_raised():
+    def stream():
+        yield 0, "a"
+        raise RuntimeError("connection reset")
+
+    with pytest.raises(RuntimeError, match="connection reset"):
+        pipeline.run_round(stream(), prepare, str.upper)
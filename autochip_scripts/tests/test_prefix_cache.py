@@ -0,0 +1,41 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from languagemodels import PrefixCache
+
+
+def make_cache(length, layers=2):
+    cache = transformers.DynamicCache()
+    for layer in range(layers):
+        cache.update(torch.randn(1, 2, length, 4), torch.randn(1, 2, length, 4), layer)
+    return cache
+
+
+def test_lookup_crops_a_copy_to_the_shared_prefix():
+    prefix_cache = PrefixCache()
+    stored = make_cache(5)
+    prefix_cache.store([1, 2, 3, 4, 5], stored)
+    length, past_key_values = prefix_cache.lookup([1, 2, 3, 9, 9, 9])
+    assert length == 3
+    assert past_key_values.get_seq_length() == 3
+    # The stored entry keeps its full length for later prompts
+    assert stored.get_seq_length() == 5
+    assert prefix_cache.lookup([1, 2, 3, 4, 5, 6])[1].get_seq_length() == 5
+
+
+def test_lookup_without_match():
+    prefix_cache = PrefixCache()
+    prefix_cache.store([1, 2], make_cache(2))
+    assert prefix_cache.lookup([7, 8]) == (0, None)
+
+
+def test_least_recently_used_entry_is_evicted():
+    prefix_cache = PrefixCache(max_entries=2)
+    prefix_cache.store([1], make_cache(1))
+    prefix_cache.store([2], make_cache(1))
+    prefix_cache.lookup([1, 5])
+    prefix_cache.store([3], make_cache(1))
+    assert prefix_cache.lookup([2])[0] == 0
+    assert prefix_cache.lookup([1])[0] == 1
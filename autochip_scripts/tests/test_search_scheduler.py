@@ -0,0 +1,94 @@
+import pytest
+
+from search_scheduler import SearchScheduler
+from sim_result import SimulationResult
+
+
+def simulate(mismatches, budget, samples=100):
+    """The result of a candidate with mismatches spread evenly over samples, under the abort monitor."""
+    if budget and mismatches > budget:
+        reached = samples * (budget + 1) // mismatches
+        return SimulationResult.parse(0, f"AutoChip: early abort after {budget + 1} mismatches (budget {budget})\n"
+                                         f"Mismatches: {budget + 1} in {reached} samples\n")
+    return SimulationResult.parse(0, f"Mismatches: {mismatches} in {samples} samples\n")
+
+
+class Evaluator:
+    """evaluate(jobs, budget) for jobs that are each a candidate's mismatch count, recording every rung."""
+
+    def __init__(self):
+        self.rungs = []
+
+    def __call__(self, jobs, budget):
+        self.rungs.append((list(jobs), budget))
+        return [("", simulate(mismatches, budget)) for mismatches in jobs]
+
+
+def test_fixed_mode_simulates_every_candidate_once():
+    evaluate = Evaluator()
+    results = SearchScheduler(4).evaluate([50, 10, 30, 20], evaluate, final_budget=None)
+    assert evaluate.rungs == [([50, 10, 30, 20], None)]
+    assert [result.mismatches for _, result in results] == [50, 10, 30, 20]
+
+
+def test_successive_halving_keeps_the_furthest_candidates():
+    scheduler = SearchScheduler(4, mode="adaptive", first_rung_budget=4)
+    evaluate = Evaluator()
+    results = scheduler.evaluate([50, 10, 30, 6], evaluate)
+    # Rung budgets double; the half that got through the most samples goes on each time
+    assert evaluate.rungs == [([50, 10, 30, 6], 4), ([6, 10], 8)]
+    assert [result.aborted for _, result in results] == [True, True, True, False]
+    assert results[3][1].mismatches == 6
+    assert scheduler.simulations == 6
+
+
+def test_successive_halving_ends_with_the_final_budget():
+    evaluate = Evaluator()
+    results = SearchScheduler(4, mode="adaptive", first_rung_budget=4).evaluate([50, 40, 30, 20], evaluate)
+    # The last candidate left runs to completion
+    assert evaluate.rungs == [([50, 40, 30, 20], 4), ([20, 30], 8), ([20], 0)]
+    assert not results[3][1].aborted and results[3][1].mismatches == 20
+    capped = Evaluator()
+    SearchScheduler(4, mode="adaptive", first_rung_budget=4).evaluate([50, 40, 30, 20], capped, final_budget=6)
+    assert capped.rungs == [([50, 40, 30, 20], 4), ([20, 30], 6)]
+
+
+def test_compile_failures_are_not_halved():
+    def evaluate(jobs, budget):
+        return [("Error: syntax", None) for _ in jobs]
+
+    results = SearchScheduler(3, mode="adaptive").evaluate([1, 2, 3], evaluate)
+    assert results == [("Error: syntax", None)] * 3
+
+
+def test_adaptive_candidate_count_narrows_with_progress():
+    scheduler = SearchScheduler(8, mode="adaptive", min_candidates=2)
+    assert scheduler.num_candidates() == 8
+    assert scheduler.num_candidates(40) == 8
+    assert scheduler.num_candidates(20) == 5
+    assert scheduler.num_candidates(0) == 2
+
+
+def test_token_budget():
+    scheduler = SearchScheduler(5, token_budget=1000)
+    assert scheduler.record_generation(100, []) == 0
+    tokens = scheduler.record_generation(300, ["x" * 400] * 2)
+    assert scheduler.tokens_used == tokens > 300
+    # Only as many candidates as the remaining budget pays for, and at least one
+    per_candidate = tokens / 2
+    assert scheduler.num_candidates() == min(5, int((1000 - tokens) // per_candidate))
+    assert scheduler.exhausted() is None
+    scheduler.record_generation(1000, ["x"])
+    assert scheduler.num_candidates() == 1
+    assert scheduler.exhausted().startswith("token budget spent")
+
+
+def test_sim_seconds_budget(monkeypatch):
+    clock = iter([0.0, 4.0, 10.0, 17.0])
+    monkeypatch.setattr("search_scheduler.time", lambda: next(clock))
+    scheduler = SearchScheduler(2, sim_seconds_budget=10)
+    scheduler.evaluate([1, 2], Evaluator())
+    assert scheduler.sim_seconds == pytest.approx(4.0) and scheduler.exhausted() is None
+    scheduler.evaluate([1, 2], Evaluator())
+    assert scheduler.exhausted().startswith("simulation budget spent (11.0/10 s)")
+    assert "11.0 s simulating of 10" in scheduler.report()
@@ -0,0 +1,72 @@
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import rivierapro_backend
+import verilog_handling as vh
+
+
+@pytest.fixture
+def testbench(tmp_path):
+    path = tmp_path / "tb.sv"
+    path.write_text("module tb;\n    top_module dut();\nendmodule\n")
+    return str(path)
+
+
+def fake_vlog(output, calls=None, delay=None):
+    def run(command, **kwargs):
+        if calls is not None:
+            calls.append(command)
+        if delay is not None:
+            delay.wait(1)
+        return subprocess.CompletedProcess(command, 0, output, "")
+    return run
+
+
+def test_prepare_shared_testbench_compiles_once(tmp_path, testbench, monkeypatch):
+    calls = []
+    monkeypatch.setattr(rivierapro_backend.subprocess, "run", fake_vlog("Compile success 0 Errors", calls))
+    tb_lib_dir = vh.prepare_shared_testbench("RivieraPRO", testbench, str(tmp_path / "out"))
+    assert tb_lib_dir == str(tmp_path / "out" / "tb_lib")
+    assert rivierapro_backend.RivieraPROBackend.testbench_library_ready(testbench, tb_lib_dir)
+    assert vh.prepare_shared_testbench("RivieraPRO", testbench, str(tmp_path / "out")) == tb_lib_dir
+    assert len(calls) == 1
+
+
+def test_prepare_shared_testbench_falls_back_on_errors(tmp_path, testbench, monkeypatch, capsys):
+    monkeypatch.setattr(rivierapro_backend.subprocess, "run", fake_vlog("Error: syntax error\n1 Errors"))
+    assert vh.prepare_shared_testbench("RivieraPRO", testbench, str(tmp_path / "out")) is None
+    assert "Could not precompile the testbench" in capsys.readouterr().out
+
+
+def test_concurrent_prompts_prepare_the_library_once(tmp_path, testbench, monkeypatch):
+    calls = []
+    release = threading.Event()
+    monkeypatch.setattr(rivierapro_backend.subprocess, "run", fake_vlog("Compile success 0 Errors", calls, release))
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(vh.prepare_shared_testbench, "RivieraPRO", testbench, str(tmp_path / "out"))
+                   for _ in range(4)]
+        release.set()
+        results = [future.result() for future in futures]
+    assert len(set(results)) == 1 and results[0] is not None
+    assert len(calls) == 1
+
+
+def test_backend_never_rebuilds_the_library(tmp_path, testbench, monkeypatch):
+    design = tmp_path / "top_module.sv"
+    design.write_text("module top_module;\nendmodule\n")
+    tb_lib_dir = tmp_path / "out" / "tb_lib"
+    tb_lib_dir.mkdir(parents=True)
+    (tb_lib_dir / rivierapro_backend.RivieraPROBackend.testbench_stamp).write_text("stale")
+    calls = []
+    monkeypatch.setattr(rivierapro_backend.subprocess, "run", fake_vlog("Compile success 0 Errors", calls))
+    backend = rivierapro_backend.RivieraPROBackend(str(design), testbench, run_dir=str(tmp_path / "run"),
+                                                   tb_lib_dir=str(tb_lib_dir))
+    backend._compile()
+    # The stale library is left alone and the testbench is compiled with the design
+    assert os.path.exists(tb_lib_dir / rivierapro_backend.RivieraPROBackend.testbench_stamp)
+    assert backend.tb_lib_dir is None
+    assert any(testbench in command for command in calls if isinstance(command, str) and command.startswith("vlog"))
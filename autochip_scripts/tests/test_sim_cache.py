@@ -0,0 +1,84 @@
+import os
+import subprocess
+
+import tools
+from search_scheduler import SearchScheduler
+from sim_cache import SimulationCache, normalize_design
+from sim_result import SimulationResult
+
+STDOUT = "Mismatches: 2 in 50 samples\n"
+
+
+def make_backend(tmp_path, cache, run_dir="run"):
+    testbench = tmp_path / "tb.sv"
+    testbench.write_text("module tb;\n    top_module dut();\nendmodule\n")
+    design = tmp_path / "top_module.sv"
+    design.write_text("module top_module;\nendmodule\n")
+    backend = tools.create_backend("Icarus", str(design), str(testbench), run_dir=str(tmp_path / run_dir), cache=cache)
+    runs = []
+
+    def run_tool(command, timeout=None):
+        runs.append(command)
+        return subprocess.CompletedProcess(command, 0, STDOUT, "")
+
+    backend._run_tool = run_tool
+    return backend, runs
+
+
+def test_cached_simulation_is_flagged(tmp_path):
+    cache = SimulationCache(str(tmp_path / "cache"))
+    backend, runs = make_backend(tmp_path, cache)
+    backend.compile()
+    first = backend.simulate()
+    assert not first.cached and len(runs) == 2
+
+    backend, runs = make_backend(tmp_path, cache, run_dir="run2")
+    backend.compile()
+    second = backend.simulate()
+    assert second.cached and runs == []
+    assert second.mismatches == first.mismatches == 2
+    assert cache.hits == 1
+
+
+def test_scheduler_counts_cached_results_from_workers():
+    scheduler = SearchScheduler(3)
+    fresh = SimulationResult.parse(0, STDOUT)
+    cached = fresh._replace(cached=True)
+
+    # As evaluate_candidates returns them from worker processes: compile output and result per job
+    def evaluate(jobs, budget):
+        return [("", cached), ("", fresh), ("compile error", None)]
+
+    scheduler.evaluate([None] * 3, evaluate)
+    assert (scheduler.simulations, scheduler.cached_simulations) == (2, 1)
+    assert "1 of 2 simulations from the cache" in scheduler.report()
+
+
+def test_old_cache_entries_load():
+    record = SimulationResult.parse(0, STDOUT).to_dict()
+    del record["cached"]
+    assert SimulationResult.from_dict(record).cached is False
+
+
+def test_normalize_design_keeps_string_literals():
+    design = 'module m;\n  initial   $display("a  b\\t c");   // note  here\nendmodule\n'
+    assert normalize_design(design) == 'module m;\ninitial $display("a  b\\t c"); // note here\nendmodule'
+    assert normalize_design(design.replace('"a  b', '"a b')) != normalize_design(design)
+    assert normalize_design(design.replace("initial   ", "\tinitial ")) == normalize_design(design)
+
+
+def test_eviction_lists_the_directory_every_interval(tmp_path, monkeypatch):
+    cache = SimulationCache(str(tmp_path / "cache"), max_entries=10, evict_interval=5)
+    listings = []
+    listdir = os.listdir
+    monkeypatch.setattr(os, "listdir", lambda path: listings.append(path) or listdir(path))
+    for idx in range(23):
+        cache.put(f"key{idx}", {"idx": idx})
+        os.utime(cache._entry_path(f"key{idx}"), (idx, idx))
+        if idx == 19:
+            assert len(listdir(cache.cache_dir)) == 10
+    assert len(listings) == 4
+    assert len(listdir(cache.cache_dir)) == 13
+    # The most recently used entries are the ones kept
+    assert cache.get("key10") is not None and cache.get("key9") is None
+    assert cache.evictions == 10
@@ -0,0 +1,94 @@
+import json
+
+from sim_result import SignalMismatch, SimulationResult
+
+# What the HDLBits-style testbenches print at the end of a run
+OUTPUT = """# KERNEL: Simulation has finished.
+Hint: Output 'q' has 3 mismatches. First mismatch occurred at time 40.
+Hint: Output 'valid' has no mismatches.
+Hint: Output 'out' has 0 mismatches. First mismatch occurred at time 0.
+Hint: Total mismatched samples is 3 out of 20 samples
+
+Simulation finished at 200 ps
+Mismatches: 3 in 20 samples
+"""
+
+
+def test_parse_counts_and_signals():
+    result = SimulationResult.parse(0, OUTPUT)
+    assert (result.mismatches, result.samples) == (3, 20)
+    assert result.signals == (SignalMismatch("q", 3, 40), SignalMismatch("out", 0, 0))
+    assert result.summary == tuple(line for line in OUTPUT.split("\n")[1:] if line.startswith(("Hint", "Mismatches")))
+    assert not result.passed and not result.aborted and not result.cached
+    assert result.mismatch_count == 3
+
+
+def test_parse_crlf_output():
+    result = SimulationResult.parse(0, OUTPUT.replace("\n", "\r\n"))
+    assert (result.mismatches, result.samples) == (3, 20)
+    assert result.summary[0] == "Hint: Output 'q' has 3 mismatches. First mismatch occurred at time 40."
+
+
+def test_parse_passing_run():
+    result = SimulationResult.parse(0, "Hint: Total mismatched samples is 0 out of 8 samples\nMismatches: 0 in 8 samples\n")
+    assert result.passed
+    assert result.feedback() == ["\nDetected 0 mismatches out of 8 samples"]
+
+
+def test_parse_first_summary_line_counts():
+    result = SimulationResult.parse(0, "Mismatches: 2 in 10 samples\nMismatches: 5 in 10 samples\n")
+    assert (result.mismatches, result.samples) == (2, 10)
+
+
+def test_parse_without_summary():
+    for stdout in ("", None, "# Error: could not elaborate top_module\n"):
+        result = SimulationResult.parse(1, stdout, None)
+        assert result.mismatches is None and result.mismatch_count == float("inf")
+        assert not result.passed
+        assert result.stdout == (stdout or "") and result.stderr == ""
+        assert result.feedback() == []
+
+
+def test_parse_early_abort():
+    result = SimulationResult.parse(0, "AutoChip: early abort after 10 mismatches (budget 9) at time 120\n"
+                                       "Mismatches: 10 in 12 samples\n")
+    assert result.aborted
+    assert result.mismatches == 10
+    assert "stopped early" in result.feedback()[1]
+
+
+def test_failed():
+    result = SimulationResult.failed("Simulation timed out", stdout="partial")
+    assert result.returncode is False
+    assert result.error == "Simulation timed out"
+    assert result.stdout == "partial" and result.mismatches is None
+
+
+def test_feedback_lists_mismatching_signals():
+    assert SimulationResult.parse(0, OUTPUT).feedback() == [
+        "\nDetected 3 mismatches out of 20 samples",
+        "- Signal q: 3 mismatches, first occurred at time 40",
+    ]
+
+
+def test_signal_mismatches():
+    assert SimulationResult.parse(0, OUTPUT).signal_mismatches() == {
+        "q": {"count": 3, "first_time": 40},
+        "out": {"count": 0, "first_time": 0},
+    }
+
+
+def test_dict_round_trip():
+    result = SimulationResult.parse(0, OUTPUT, "warning")
+    record = json.loads(json.dumps(result.to_dict()))
+    assert SimulationResult.from_dict(record) == result
+    assert "stdout" not in result.to_dict(include_output=False)
+
+
+def test_from_dict_of_older_records():
+    # Records cached before aborted and cached existed
+    record = SimulationResult.parse(0, OUTPUT).to_dict()
+    del record["aborted"], record["cached"]
+    result = SimulationResult.from_dict(record)
+    assert not result.aborted and not result.cached
+    assert result.signals[0] == SignalMismatch("q", 3, 40)
@@ -0,0 +1,48 @@
+import subprocess
+
+import pytest
+
+import rivierapro_backend
+import tools
+
+TESTBENCH = "module tb;\n    top_module dut();\nendmodule\n"
+DESIGN = "module top_module;\nendmodule\n"
+STDOUT = ("Hint: Output 'out' has 3 mismatches. First mismatch occurred at time 40.\n"
+          "Hint: Total mismatched samples is 3 out of 100 samples\n"
+          "Mismatches: 3 in 100 samples\n")
+
+
+@pytest.fixture
+def files(tmp_path):
+    testbench = tmp_path / "tb.sv"
+    testbench.write_text(TESTBENCH)
+    design = tmp_path / "top_module.sv"
+    design.write_text(DESIGN)
+    return str(design), str(testbench), str(tmp_path / "run")
+
+
+def test_base_parse_results(files):
+    design, testbench, run_dir = files
+    backend = tools.create_backend("Icarus", design, testbench, run_dir=run_dir)
+    result = backend.parse_results(STDOUT)
+    assert (result.mismatches, result.samples) == (3, 100)
+    assert result.signal_mismatches() == {"out": {"count": 3, "first_time": 40}}
+
+
+@pytest.mark.parametrize("simulator", ["Icarus", "Verilator", "RivieraPRO"])
+def test_backends_simulate_through_parse_results(files, monkeypatch, simulator):
+    design, testbench, run_dir = files
+    backend = tools.create_backend(simulator, design, testbench, run_dir=run_dir)
+    completed = subprocess.CompletedProcess([], 0, STDOUT, "")
+    monkeypatch.setattr(backend, "_run_tool", lambda command, timeout=None: completed)
+    monkeypatch.setattr(rivierapro_backend.subprocess, "run", lambda *args, **kwargs: completed)
+    parsed = []
+
+    def parse_results(stdout, returncode=0, stderr=""):
+        parsed.append(stdout)
+        return tools.SimulationResult.parse(returncode, stdout, stderr)
+
+    monkeypatch.setattr(backend, "parse_results", parse_results)
+    result = backend._simulate()
+    assert parsed == [STDOUT]
+    assert result.mismatches == 3
@@ -0,0 +1,102 @@
+import re
+
+import pytest
+
+import tree_search
+import verilog_handling as vh
+from sim_result import SimulationResult
+
+PROMPT = "module top_module(input a, output b);"
+
+
+def design(score, spacing=" "):
+    """A design whose testbench run reports score mismatches; scores starting with b fail to compile."""
+    if str(score).startswith("b"):
+        return f"module top_module(input a, output b);\n  // score {score}\n  begin\nendmodule"
+    return f"module top_module(input a, output b);\n  // score {score}\n  assign{spacing}b = a;\nendmodule"
+
+
+class FakeSearch:
+    """Repairs follow a fixed tree: children maps a parent's score (None for the prompt) to its children's."""
+
+    def __init__(self, children):
+        self.children = children
+        self.requests = []
+        self.simulated = []
+
+    def parent(self, conversation):
+        replies = [message['content'] for message in conversation.messages if message['role'] == "assistant"]
+        if not replies:
+            return None
+        score = re.search(r"score (\w+)", replies[-1]).group(1)
+        return int(score) if score.isdigit() else score
+
+    def generate(self, conversation, model_type, model_id="", num_candidates=1, stop_at_module=None, header=None):
+        parent = self.parent(conversation)
+        self.requests.append(parent)
+        responses = []
+        for idx, child in enumerate(self.children.get(parent, [])):
+            text = design(*child) if isinstance(child, tuple) else design(child)
+            response = vh.lm.LLMResponse(0, idx, text)
+            response.parse_verilog()
+            responses.append(response)
+        return responses
+
+    def evaluate(self, jobs, workers=1, executor=None, mismatch_budget=None, **options):
+        results = []
+        for verilog_file, _, _ in jobs:
+            with open(verilog_file) as f:
+                score = int(re.search(r"score (\d+)", f.read()).group(1))
+            self.simulated.append(score)
+            results.append(("", SimulationResult.parse(0, f"Mismatches: {score} in 20 samples\n")))
+        return results
+
+
+@pytest.fixture
+def search(tmp_path, monkeypatch):
+    def run(children, max_iterations=5, **kwargs):
+        fake = FakeSearch(children)
+        monkeypatch.setattr(vh, "generate_verilog_responses", fake.generate)
+        monkeypatch.setattr(vh, "evaluate_candidates", fake.evaluate)
+        best = tree_search.tree_search(PROMPT, "top_module", str(tmp_path / "tb.sv"), max_iterations, "Fake",
+                                       outdir=str(tmp_path), **kwargs)
+        return fake, best
+    return run
+
+
+def test_best_node_is_expanded_first(search):
+    fake, best = search({None: [10, 5, 8], 5: [4], 10: [1], 4: [0]}, beam_width=1)
+    assert fake.requests == [None, 5, 4]
+    assert best.mismatches == 0 and "score 0" in best.parsed_text
+
+
+def test_beam_expands_the_best_nodes_in_parallel(search):
+    fake, _ = search({None: [10, 5, 8], 5: [7], 8: [6], 6: [0]}, beam_width=2)
+    assert fake.requests[:2] == [None, 5] and fake.requests[2] == 8
+    # The second round left 6, 7 and 10; the beam takes the two best
+    assert sorted(fake.requests[3:5]) == [6, 7]
+
+
+def test_duplicate_designs_are_simulated_once(search):
+    fake, _ = search({None: [9, 9, (9, "   ")], 9: [(9, "\t"), 3]}, max_iterations=1, beam_width=1)
+    assert fake.simulated == [9, 3]
+
+
+def test_failed_candidates_are_dropped_once_one_simulates(search):
+    fake, best = search({None: ["b1", "b2"], "b1": [7, "b3"], "b2": [1], 7: ["b4"]}, max_iterations=4,
+                        beam_width=1)
+    # Failed candidates are repaired while nothing simulates; once 7 has, b2, b3 and b4 are dropped
+    assert fake.requests == [None, "b1", 7]
+    assert fake.simulated == [7]
+    assert best.mismatches == 7
+
+
+def test_rounds_match_the_linear_loop(search):
+    scores = iter(range(100, 0, -1))
+
+    class Endless(dict):
+        def get(self, parent, default=None):
+            return [next(scores)]
+
+    fake, _ = search(Endless(), max_iterations=2, beam_width=1)
+    assert len(fake.requests) == 3
@@ -0,0 +1,159 @@
+import pytest
+
+import vcd_reader
+from vcd_reader import MismatchWindow, VCDReader, mismatch_feedback, mismatch_windows
+
+HEADER = """$date today $end
+$timescale 1ps $end
+$scope module tb $end
+$scope module stim1 $end
+$var reg 1 ! clk $end
+$upscope $end
+$var wire 1 " tb_mismatch $end
+$var reg 1 # a $end
+$var reg 4 $ data [3:0] $end
+$var logic 1 % out_ref $end
+$var logic 1 & out_dut $end
+$var logic 4 ' q_ref [3:0] $end
+$var logic 4 ( q_dut [3:0] $end
+$upscope $end
+$enddefinitions $end
+#0
+$dumpvars
+0!
+0"
+0#
+b0 $
+0%
+0&
+b0 '
+b0 (
+$end
+"""
+
+
+def write(tmp_path, body, name="wave.vcd"):
+    path = tmp_path / name
+    path.write_text(HEADER + body)
+    return str(path)
+
+
+def steps(*changes):
+    """One '#time' line per (time, lines) pair."""
+    return "".join(f"#{time}\n" + "".join(line + "\n" for line in lines) for time, lines in changes)
+
+
+def test_header(tmp_path):
+    with VCDReader(write(tmp_path, "")) as reader:
+        assert reader.timescale == "1ps"
+        assert reader.find("clk").scope == "tb.stim1"
+        assert reader.find("tb.data").width == 4
+        assert reader.find("missing") is None
+
+
+def test_windows_with_inputs_and_end(tmp_path):
+    path = write(tmp_path, steps(
+        (10, ["1#", "b101 $", "1%", "1&"]),
+        (20, ["b11 '", "b10 ("]),
+        (30, ["b10 '"]),
+        (40, ["0#", "b11 '", "b11 ("]),
+    ))
+    assert mismatch_windows(path) == {
+        "q": [MismatchWindow("q", 20, 30, "4'b0011", "4'b0010", {"a": "1", "data": "4'b0101"})],
+    }
+
+
+def test_x_in_reference_is_dont_care(tmp_path):
+    path = write(tmp_path, steps((10, ["bx1 '", "b1 ("]), (20, ["b1x '", "b11 ("]), (30, ["b0 '", "b0 ("])))
+    assert mismatch_windows(path) == {}
+
+
+def test_window_open_at_end_of_dump(tmp_path):
+    path = write(tmp_path, steps((10, ["1%"]), (20, ["1#"])))
+    assert mismatch_windows(path) == {"out": [MismatchWindow("out", 10, None, "1", "0", {"a": "0", "data": "4'b0000"})]}
+
+
+def test_max_windows_per_output(tmp_path):
+    changes = []
+    for idx in range(10):
+        changes.append((idx * 20 + 10, ["1%"]))
+        changes.append((idx * 20 + 20, ["0%"]))
+    windows = mismatch_windows(write(tmp_path, steps(*changes)), max_windows=2)
+    assert [(window.start, window.end) for window in windows["out"]] == [(10, 20), (30, 40)]
+
+
+def test_outputs_limit_what_is_read(tmp_path):
+    path = write(tmp_path, steps((10, ["1%", "b1 '"]), (20, ["0%", "b1 ("])))
+    assert set(mismatch_windows(path)) == {"out", "q"}
+    assert set(mismatch_windows(path, outputs={"q"})) == {"q"}
+    assert mismatch_windows(path, outputs=set()) == {}
+
+
+def test_stops_once_every_output_has_its_windows(tmp_path, monkeypatch):
+    changes = [(10 + idx * 10, [f"{(idx + 1) % 2}%"]) for idx in range(50)]
+    path = write(tmp_path, steps(*changes))
+    read = []
+    iter_timesteps = VCDReader.iter_timesteps
+
+    def counting(self, signals, end=None):
+        for step in iter_timesteps(self, signals, end):
+            read.append(step[0])
+            yield step
+
+    monkeypatch.setattr(VCDReader, "iter_timesteps", counting)
+    assert len(mismatch_windows(path, max_windows=1, outputs={"out"})["out"]) == 1
+    # $dumpvars, the window's start at 10 and its end at 20
+    assert len(read) == 3
+    # Without outputs, q might still mismatch later, so the whole dump is read
+    del read[:]
+    mismatch_windows(path, max_windows=1)
+    assert len(read) == 51
+
+
+def test_max_bytes(tmp_path):
+    filler = [(10 + idx * 10, [f"{(idx + 1) % 2}#"]) for idx in range(200)]
+    path = write(tmp_path, steps(*filler, (5000, ["1%"])))
+    assert "out" in mismatch_windows(path)
+    assert mismatch_windows(path, max_bytes=200) == {}
+
+
+def test_comments_in_body_are_skipped(tmp_path):
+    path = write(tmp_path, "#10\n$comment\n1%\n$end\n#20\n1#\n")
+    assert mismatch_windows(path) == {}
+
+
+def test_value_at_ignores_codes_that_end_other_codes(tmp_path):
+    header = HEADER.replace('$var reg 1 # a $end', '$var reg 1 # a $end\n$var reg 4 !# wide [3:0] $end')
+    path = tmp_path / "wave.vcd"
+    path.write_text(header + steps((10, ["1#"]), (20, ["b1010 !#"]), (30, ["1%"])))
+    with VCDReader(str(path)) as reader:
+        offset = len(path.read_text())
+        assert reader.value_at(reader.find("a"), offset) == "1"
+        assert reader.value_at(reader.find("wide"), offset) == "1010"
+
+
+def test_feedback_is_read_once_per_dump(tmp_path, monkeypatch):
+    path = write(tmp_path, steps((10, ["1%"]), (20, ["0%"])))
+    calls = []
+    original = vcd_reader.mismatch_windows
+    monkeypatch.setattr(vcd_reader, "mismatch_windows", lambda *args: calls.append(args) or original(*args))
+    first = mismatch_feedback(path, 3, ["out"])
+    assert first == mismatch_feedback(path, 3, ["out"])
+    assert len(calls) == 1
+    assert first[1] == "- out at t=10..20: expected 1, got 0 (inputs: a=0 data=4'b0000)"
+
+
+def test_feedback_without_dump(tmp_path):
+    assert mismatch_feedback(str(tmp_path / "missing.vcd")) == []
+
+
+def test_feedback_for_broken_dump(tmp_path, capsys):
+    path = tmp_path / "wave.vcd"
+    path.write_text("$var wire 1 ! a $end\n")
+    assert mismatch_feedback(str(path)) == []
+    assert "Could not read waveform dump" in capsys.readouterr().out
+
+
+@pytest.fixture(autouse=True)
+def clear_feedback_cache():
+    vcd_reader._cached_windows.cache_clear()
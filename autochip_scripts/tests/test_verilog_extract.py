@@ -0,0 +1,213 @@
+import time
+
+import verilog_extract
+from verilog_extract import (ModuleStreamExtractor, extract_design, extract_module_body, extract_modules,
+                             find_verilog_modules, hoist_directives, iter_module_spans)
+from verilog_header import parse_module_header
+
+TOP = "module top_module(input a, output b);\n    assign b = a;\nendmodule\n"
+HELPER = "module helper(input x, output y);\n    assign y = ~x;\nendmodule\n"
+
+
+def stream(text, chunk_size=7, **kwargs):
+    """Feed text in small chunks, so keywords are split between them; returns (extractor, characters read)."""
+    extractor = ModuleStreamExtractor(**kwargs)
+    for position in range(0, len(text), chunk_size):
+        if extractor.feed(text[position:position + chunk_size]):
+            return extractor, position + chunk_size
+    return extractor, len(text)
+
+
+def test_stream_stops_after_target_module():
+    text = TOP + "\nThis module works as follows: it copies a to b.\n" * 20
+    extractor, read = stream(text)
+    assert extractor.reason == "top_module complete"
+    assert read < len(TOP) + 20
+
+
+def test_stream_prose_before_fence():
+    text = ("Here is the corrected Verilog module:\n\n```verilog\n" + TOP + "```\n"
+            + "The module top_module now assigns b.\n" * 20)
+    extractor, read = stream(text)
+    assert extractor.reason == "top_module complete"
+    assert read <= text.index("```\n", text.index("endmodule")) + 10
+
+
+def test_stream_prose_mentioning_module_names_is_not_a_declaration():
+    text = "The module top_module that you asked for:\n```verilog\n" + TOP + "```\nMore text.\n" * 10
+    extractor, _ = stream(text)
+    assert extractor.reason == "top_module complete"
+
+
+def test_stream_waits_for_all_modules_in_a_fence():
+    text = "```verilog\n" + TOP + "\n" + HELPER + "```\nExplanation follows.\n" * 10
+    extractor, read = stream(text)
+    assert extractor.reason == "top_module complete"
+    # The helper after top_module in the same block is still read
+    assert read >= text.index("```", 3)
+
+
+def test_stream_helper_before_target():
+    text = HELPER + "\n" + TOP + "\nExplanation follows.\n" * 10
+    extractor, read = stream(text)
+    assert extractor.reason == "top_module complete"
+    assert read >= len(HELPER) + len(TOP)
+
+
+def test_stream_nested_module_stops():
+    text = "module top_module(input a, output b);\nmodule inner(input c);\nendmodule\nendmodule\n"
+    extractor, _ = stream(text)
+    assert extractor.reason == "module declared inside another module"
+
+
+def test_stream_stop_inside_trailing_comment():
+    text = TOP.replace("endmodule\n", "endmodule // end of module top_module\n") + "```\nmodule, as you see\n" * 10
+    extractor, read = stream(text)
+    assert extractor.reason == "top_module complete"
+    assert read < len(TOP) + 40
+
+
+def test_stream_keywords_in_comments_and_strings_are_ignored():
+    text = ("module top_module(input a, output b);\n"
+            "    // endmodule is below; module foo(x);\n"
+            "    /* module bar; endmodule */\n"
+            "    initial $display(\"endmodule module baz;\");\n"
+            "    assign b = a;\n"
+            "endmodule\n")
+    extractor, read = stream(text + "Trailing prose.\n" * 10)
+    assert extractor.reason == "top_module complete"
+    assert read >= len(text)
+
+
+def test_stream_without_module_gives_up():
+    extractor, _ = stream("I cannot help with that. " * 400, max_preamble=1000)
+    assert extractor.reason == "no module declaration"
+
+
+def test_stream_incomplete_module_keeps_reading():
+    extractor, _ = stream("Sure, here it is:\n```verilog\nmodule top_module(input a, output b);\n    assign b")
+    assert not extractor.done
+
+
+def test_stream_stops_when_long_comment_line_ends():
+    text = TOP.replace("endmodule\n", "endmodule // " + "x" * 50 + "\n") + "Trailing prose.\n" * 10
+    extractor, read = stream(text)
+    assert extractor.reason == "top_module complete"
+    assert read < text.index("Trailing") + 10
+
+
+
+def test_stream_headers_and_comments_split_across_lines():
+    text = ("```verilog\n/* the helper\nmodule helper(input x);\nendmodule */\nmodule top_module(\n    input a,\n"
+            "    output b\n);\n    assign b = a;\nendmodule\n```\n" + "Trailing prose.\n" * 10)
+    for chunk_size in (1, 3, 7, 64):
+        extractor, read = stream(text, chunk_size)
+        assert extractor.reason == "top_module complete"
+        assert read < text.index("Trailing") + chunk_size
+
+
+def test_stream_scans_each_line_once(monkeypatch):
+    scanned = []
+
+    class CountingPattern:
+        def search(self, text, position, end=None):
+            end = len(text) if end is None else end
+            match = pattern.search(text, position, end)
+            scanned.append((match.end() if match else end) - position)
+            return match
+
+    pattern = verilog_extract._SCAN_PATTERN
+    monkeypatch.setattr(verilog_extract, "_SCAN_PATTERN", CountingPattern())
+    body = "".join(f"    assign w{idx} = a; // module w{idx}\n" for idx in range(500))
+    text = "module top_module(input a, output b);\n" + body + "endmodule\n"
+    extractor, _ = stream(text)
+    assert extractor.reason == "top_module complete"
+    assert sum(scanned) <= len(text)
+
+def test_extract_modules_from_markdown():
+    text = "Here is the design:\n```verilog\n" + TOP + "```\nAnd a helper:\n```verilog\n" + HELPER + "```\n"
+    assert extract_modules(text) == [TOP.strip(), HELPER.strip()]
+
+
+def test_extract_modules_keeps_directives_above_module():
+    text = "```verilog\n`timescale 1ns / 1ps\n`define WIDTH 4\n\n" + TOP + "```"
+    assert extract_modules(text) == ["`timescale 1ns / 1ps\n`define WIDTH 4\n\n" + TOP.strip()]
+    # A directive separated from the module by prose stays behind
+    assert extract_modules("`define WIDTH 4\nSome prose.\n" + TOP) == [TOP.strip()]
+
+
+def test_extract_modules_headers():
+    parameterized = ("module top_module #(parameter W = (2*3), parameter D = 4) (\n"
+                     "    input [W-1:0] a, output [(W*2)-1:0] b);\n    assign b = {a, a};\nendmodule")
+    no_ports = "module top_module;\n  initial $display(\"hi\");\nendmodule"
+    macro = "macromodule top_module(input a, output b);\n  assign b = a;\nendmodule"
+    for module in (parameterized, no_ports, macro):
+        assert extract_modules("Code:\n" + module + "\nDone.") == [module]
+
+
+def test_extract_modules_ignores_prose_comments_and_strings():
+    text = ("This module is simple. The module top_module copies a to b; the endmodule closes it.\n"
+            "// module fake(input x); endmodule\n"
+            "/* module other(input y);\nendmodule */\n" + TOP)
+    assert [span.name for span in iter_module_spans(text)] == ["top_module"]
+    assert extract_modules(text) == [TOP.strip()]
+
+
+def test_extract_modules_drops_unterminated_declarations():
+    text = "module broken(input a);\n  assign b = \n" + TOP + "module tail(input c);\n"
+    assert extract_modules(text) == [TOP.strip()]
+    assert extract_modules("no code here") == []
+
+
+def test_module_spans():
+    text = "`timescale 1ns/1ps\n" + TOP
+    [span] = iter_module_spans(text)
+    assert (span.name, span.start, span.end) == ("top_module", 0, len(text.rstrip()))
+    assert text[span.body_start:span.body_end] == "\n    assign b = a;\n"
+
+
+def test_module_spans_are_linear():
+    # The old regexes took quadratic time on many headers that never reach endmodule
+    text = "module m(input a);\n" * 20000 + "/* unterminated comment " + "x" * 100000
+    started = time.perf_counter()
+    assert extract_modules(text) == []
+    assert time.perf_counter() - started < 2
+
+
+def test_extract_module_body():
+    text = HELPER + TOP
+    assert extract_module_body(text) == "assign y = ~x;"
+    assert extract_module_body(text, "top_module") == "assign b = a;"
+    assert extract_module_body(text, "missing") == ""
+
+
+def test_hoist_directives():
+    code = "  module m;\n\n`timescale 1ns/1ps\n  wire a;\n`timescale 1ns/1ps\n`define X 1\nendmodule\n"
+    assert hoist_directives(code) == "`timescale 1ns/1ps\n`define X 1\n\nmodule m;\nwire a;\nendmodule"
+
+
+def test_extract_design_without_header():
+    assert extract_design("```verilog\n" + TOP + "```") == "\n\n" + "\n".join(line.strip() for line in TOP.strip().split("\n"))
+    # Without any module, the response is kept as it is
+    assert extract_design("assign b = a;") == "\n\nassign b = a;"
+
+
+def test_extract_design_places_body_under_prompt_header():
+    header = parse_module_header("module top_module(input [3:0] a, output [3:0] b);")
+    response = "module top_module(input a, output reg b);\n  always @* b = a;\nendmodule"
+    design = extract_design(response, header)
+    assert design.startswith("`timescale 1ns / 1ps\n`define RESET_VAL 4'b0000\n\n")
+    assert "input [3:0] a,\noutput reg [3:0] b\n);\nalways @* b = a;\nendmodule" in design
+
+
+def test_extract_design_keeps_non_ansi_module():
+    header = parse_module_header("module top_module(input a, output b);")
+    response = "module top_module(a, b);\n  input a;\n  output b;\n  assign b = a;\nendmodule"
+    assert extract_design(response, header) == "\n\n" + "\n".join(line.strip() for line in response.split("\n"))
+
+
+def test_find_verilog_modules_wraps_bare_body():
+    header = parse_module_header("module top_module(input a, output b);")
+    assert find_verilog_modules("assign b = a;") == []
+    [module] = find_verilog_modules("```verilog\nassign b = a;\n```", header)
+    assert module.startswith("module top_module (") and module.endswith("assign b = a;\nendmodule")
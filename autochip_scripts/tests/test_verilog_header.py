@@ -0,0 +1,106 @@
+from verilog_header import (ModuleHeader, Parameter, Port, header_mismatches, parse_module_header, render_header,
+                            repair_module)
+
+PROMPT = """// Implement the module below.
+module top_module #(
+    parameter WIDTH = 8,
+    parameter DEPTH = (WIDTH * 2)
+) (
+    input clk,
+    input signed [WIDTH-1:0] a, b,
+    input [3:0][7:0] packed_in,
+    output reg [DEPTH-1:0] q,
+    output logic valid
+);
+"""
+
+
+def test_parse_ansi_header():
+    header = parse_module_header(PROMPT)
+    assert header.name == "top_module"
+    assert header.ansi
+    assert header.parameters == [Parameter("WIDTH", "8"), Parameter("DEPTH", "(WIDTH * 2)")]
+    assert header.ports == [
+        Port("clk", "input", None, False, None),
+        Port("a", "input", None, True, "[WIDTH-1:0]"),
+        Port("b", "input", None, True, "[WIDTH-1:0]"),
+        Port("packed_in", "input", None, False, "[3:0][7:0]"),
+        Port("q", "output", "reg", False, "[DEPTH-1:0]"),
+        Port("valid", "output", "logic", False, None),
+    ]
+    assert PROMPT[header.start:header.end].startswith("module top_module #(")
+    assert PROMPT[header.start:header.end].endswith(");")
+
+
+def test_parse_non_ansi_header():
+    text = ("module top_module(clk, d, q);\n"
+            "    input clk;\n"
+            "    input [7:0] d;\n"
+            "    output [7:0] q;\n"
+            "    reg [7:0] q;\n"
+            "endmodule\n")
+    header = parse_module_header(text)
+    assert not header.ansi
+    assert header.ports == [Port("clk", "input", None, False, None), Port("d", "input", None, False, "[7:0]"),
+                            Port("q", "output", "reg", False, "[7:0]")]
+
+
+def test_parse_picks_the_named_module():
+    text = "module helper(input x, output y);\nendmodule\nmodule top_module(input a, output b);\nendmodule\n"
+    assert parse_module_header(text).name == "helper"
+    assert parse_module_header(text, "top_module").ports[0].name == "a"
+    assert parse_module_header(text, "missing") is None
+
+
+def test_parse_skips_prose_and_comments():
+    text = "The module top_module is below.\n// module fake(input z);\nmodule top_module(input a);"
+    header = parse_module_header(text)
+    assert header.name == "top_module"
+    assert [port.name for port in header.ports] == ["a"]
+
+
+def test_parse_without_ports_or_semicolon():
+    assert parse_module_header("module top_module;").ports == []
+    assert parse_module_header("module top_module(input a, output b)") is None
+
+
+def test_render_header():
+    header = parse_module_header(PROMPT)
+    assert render_header(header) == ("module top_module #(\n"
+                                     "    parameter WIDTH = 8,\n"
+                                     "    parameter DEPTH = (WIDTH * 2)\n"
+                                     ") (\n"
+                                     "    input clk,\n"
+                                     "    input signed [WIDTH-1:0] a,\n"
+                                     "    input signed [WIDTH-1:0] b,\n"
+                                     "    input [3:0][7:0] packed_in,\n"
+                                     "    output reg [DEPTH-1:0] q,\n"
+                                     "    output logic valid\n"
+                                     ");")
+    assert render_header(header, {"valid": "reg"}).endswith("output reg valid\n);")
+    assert render_header(ModuleHeader("m", [], [], True, 0, 0)) == "module m;"
+
+
+def test_header_mismatches():
+    expected = parse_module_header("module top_module(input [3:0] a, output b);")
+    assert header_mismatches(parse_module_header("module top_module(input [3 : 0] a, output reg b);"), expected) == []
+    assert header_mismatches(parse_module_header("module top_module(input a, output b, input c);"), expected) == [
+        "port a should be declared as input [3:0] a", "unexpected port c"]
+    assert header_mismatches(parse_module_header("module top_module(output [3:0] a);"), expected) == [
+        "port a should be input, not output", "missing port output b"]
+
+
+def test_repair_module_replaces_mismatched_header():
+    expected = parse_module_header("module top_module(input [3:0] a, output [3:0] b);")
+    module = "module top_module(input a, output reg b);\n  always @* b = a;\nendmodule"
+    assert repair_module(module, expected) == ("module top_module (\n    input [3:0] a,\n    output reg [3:0] b\n);\n"
+                                               "  always @* b = a;\nendmodule")
+
+
+def test_repair_module_keeps_matching_and_non_ansi_modules():
+    expected = parse_module_header("module top_module(input a, output b);")
+    matching = "module top_module(input wire a, output reg b);\n  always @* b = a;\nendmodule"
+    assert repair_module(matching, expected) == matching
+    non_ansi = "module top_module(a);\n  input a;\nendmodule"
+    assert repair_module(non_ansi, expected) == non_ansi
+    assert repair_module("module other(input a);\nendmodule", expected) == "module other(input a);\nendmodule"
@@ -0,0 +1,148 @@
+from verilog_lint import format_lint_errors, lint_verilog, prescreen, tokenize
+
+TOP = """module top_module(input clk, input [1:0] sel, output reg [3:0] q);
+    always @(posedge clk) begin
+        case (sel)
+            2'b00: q <= 4'hA;
+            default: q <= {2'b0, sel};
+        endcase
+    end
+endmodule
+"""
+
+
+def kinds(text, **kwargs):
+    return [(token.kind, token.value) for token in tokenize(text, **kwargs)]
+
+
+def messages(code):
+    return [error.message for error in lint_verilog(code)]
+
+
+def test_tokenize_kinds():
+    assert kinds("assign y = 8'hFF + `WIDTH; // note\n") == [
+        ("identifier", "assign"), ("identifier", "y"), ("symbol", "="), ("number", "8'hFF"), ("symbol", "+"),
+        ("directive", "`WIDTH"), ("symbol", ";")]
+
+
+def test_tokenize_comments_and_strings():
+    text = 'x /* a\nb */ y "end // not a comment" // tail\nz'
+    assert kinds(text) == [("identifier", "x"), ("identifier", "y"), ("string", '"end // not a comment"'),
+                           ("identifier", "z")]
+    assert [kind for kind, _ in kinds(text, keep_comments=True)].count("comment") == 2
+
+
+def test_tokenize_positions():
+    tokens = list(tokenize("a\n  /* x\n */ b\n  c"))
+    assert [(token.value, token.line, token.column) for token in tokens] == [("a", 1, 1), ("b", 3, 5), ("c", 4, 3)]
+    text = "skip\nmodule m;"
+    assert next(tokenize(text, start=5)) == ("identifier", "module", 1, 1, 5, 11)
+
+
+def test_tokenize_unterminated_comment_and_escaped_identifier():
+    assert kinds("a /* never closed\nendmodule") == [("identifier", "a")]
+    assert kinds(r"wire \bus[0] ;") == [("identifier", "wire"), ("identifier", r"\bus[0]"), ("symbol", ";")]
+
+
+def test_valid_design():
+    assert lint_verilog(TOP) == []
+
+
+def test_unbalanced_blocks_and_brackets():
+    # endmodule closing the open begin is reported too
+    assert "Syntax error. begin without matching end." in messages(TOP.replace("    end\n", ""))
+    assert messages(TOP.replace("endmodule\n", "")) == ["module/macromodule...endmodule pair(s) mismatch."]
+    assert messages(TOP.replace("{2'b0, sel}", "{2'b0, sel")) == ["Syntax error. Unmatched {."]
+    assert messages(TOP.replace("(sel)", "(sel))")) == ["Syntax error. Unexpected token: )."]
+    assert messages("module m;\nendcase\nendmodule\n") == ["Syntax error. Unexpected token: endcase."]
+
+
+def test_macros():
+    assert messages("module m;\nassign a = `WIDTH;\nendmodule\n") == ["Macro WIDTH is not defined."]
+    assert messages("`define WIDTH 4\nmodule m;\nassign a = `WIDTH;\nendmodule\n") == []
+    assert messages("`define A 1\n`undef A\nmodule m;\nassign a = `A;\nendmodule\n") == ["Macro A is not defined."]
+    assert messages("`timescale 1ns/1ps\n`ifdef SIM\n`endif\nmodule m;\nendmodule\n") == []
+    assert messages("module m;\nassign a = ` ;\nendmodule\n") == ["Name of macro is not specified."]
+
+
+def test_wait_and_disable_fork():
+    code = "module m;\ninitial begin\n  fork\n    #1;\n  join_none\n  wait fork;\n  disable fork;\nend\nendmodule\n"
+    assert lint_verilog(code) == []
+
+
+def test_pure_virtual_prototype():
+    code = ("virtual class base;\n"
+            "  pure virtual function int f(int a);\n"
+            "  pure virtual task t();\n"
+            "endclass\n"
+            "module m;\nendmodule\n")
+    assert lint_verilog(code) == []
+
+
+def test_dpi_import_and_export():
+    code = ('module m;\n'
+            '  import "DPI-C" function int c_add(input int a, input int b);\n'
+            '  import "DPI-C" context task c_wait(input int cycles);\n'
+            '  export "DPI-C" function sv_add;\n'
+            '  function int sv_add(input int a);\n'
+            '    return a + 1;\n'
+            '  endfunction\n'
+            'endmodule\n')
+    assert lint_verilog(code) == []
+
+
+def test_extern_prototypes():
+    code = ("extern module leaf(input a, output b);\n"
+            "class c;\n"
+            "  extern function void f(int a);\n"
+            "  extern virtual task t();\n"
+            "endclass\n"
+            "function void c::f(int a);\nendfunction\n"
+            "module m;\nendmodule\n")
+    assert lint_verilog(code) == []
+
+
+def test_prototype_ends_at_semicolon():
+    # A function after an extern prototype still needs its endfunction
+    code = "module m;\n  extern function void f();\n  function void g();\nendmodule\n"
+    assert "Syntax error. function without matching endfunction." in messages(code)
+
+
+def test_multiline_define_body():
+    code = ("`define CLOCKED(clk, body) \\\n"
+            "  always @(posedge clk) begin \\\n"
+            "    case (sel) \\\n"
+            "      default: body; \\\n"
+            "    endcase \\\n"
+            "  end\n"
+            "`define OPEN begin\n"
+            "`define CLOSE end\n"
+            "module m;\n"
+            "  `CLOCKED(clk, q <= d)\n"
+            "  initial `OPEN $display(\"x\"); `CLOSE\n"
+            "endmodule\n")
+    assert lint_verilog(code) == []
+
+
+def test_define_body_ends_without_continuation():
+    code = "`define ONE 1 \\\n  + 0\nmodule m;\n  begin\nendmodule\n"
+    assert "Syntax error. begin without matching end." in messages(code)
+    # Macros used inside a continued body are only checked where the macro is used
+    assert messages("`define TWO \\\n  `ONE + `ONE\nmodule m;\nendmodule\n") == []
+
+
+def test_define_body_with_crlf_continuation():
+    code = "`define BODY begin \\\r\n  x = 1; \\\r\n  end\r\nmodule m;\r\nendmodule\r\n"
+    assert lint_verilog(code) == []
+
+
+def test_prescreen(tmp_path):
+    good = tmp_path / "good.v"
+    good.write_text(TOP)
+    assert prescreen(str(good)) == (True, "")
+    bad = tmp_path / "bad.v"
+    bad.write_text(TOP.replace("endcase\n", ""))
+    ok, output = prescreen(str(bad))
+    assert not ok
+    assert output == format_lint_errors(lint_verilog(bad.read_text()), str(bad))
+    assert "endcase" in output and output.endswith(" Errors 0 Warnings")
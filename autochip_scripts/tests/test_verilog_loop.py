@@ -0,0 +1,76 @@
+import pytest
+
+import verilog_handling as vh
+
+PROMPT = "module top_module(input a, output b);"
+
+
+class SilentModel:
+    """A model whose requests end before any candidate arrives."""
+
+    def __init__(self):
+        self.requests = []
+
+    def generate(self, conversation, num_candidates=1, stop_at_module=None):
+        self.requests.append(len(conversation.get_messages()))
+        return []
+
+    def generate_streaming(self, conversation, num_candidates=1, stop_at_module=None):
+        yield from enumerate(self.generate(conversation, num_candidates, stop_at_module))
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_round_without_candidates(tmp_path, monkeypatch, capsys, pipelined):
+    model = SilentModel()
+    monkeypatch.setattr(vh, "get_model", lambda model_type, model_id="": model)
+    best = vh.verilog_loop(PROMPT, "top_module", str(tmp_path / "tb.sv"), 2, "Fake", outdir=str(tmp_path),
+                           pipelined=pipelined, speculative=pipelined)
+    assert best.rank == -3 and best.parsed_text == ""
+    # Every iteration asks again with the unchanged conversation
+    assert model.requests == [2, 2, 2]
+    assert "Iteration 0 produced no candidates" in capsys.readouterr().out
+
+
+class BrokenModel(SilentModel):
+    """A model whose every candidate fails the lint prescreen, with a growing body."""
+
+    def generate(self, conversation, num_candidates=1, stop_at_module=None):
+        self.requests.append([message['role'] for message in conversation.get_messages()])
+        padding = "\n".join(f"  wire w{idx};" for idx in range(len(self.requests) * 10))
+        return [f"module top_module(input a, output b);\n{padding}\n  begin\nendmodule"]
+
+
+def test_default_history_is_bounded(tmp_path, monkeypatch):
+    model = BrokenModel()
+    monkeypatch.setattr(vh, "get_model", lambda model_type, model_id="": model)
+    vh.verilog_loop(PROMPT, "top_module", str(tmp_path / "tb.sv"), 5, "Fake", num_candidates=1, outdir=str(tmp_path))
+    assert len(model.requests) == 6
+    # Only the latest candidate and its feedback follow the system message and design prompt
+    assert model.requests[0] == ["system", "user"]
+    assert all(roles == ["system", "user", "assistant", "user"] for roles in model.requests[1:])
+
+
+def test_context_tokens_keeps_the_history_windowed(tmp_path, monkeypatch):
+    model = BrokenModel()
+    monkeypatch.setattr(vh, "get_model", lambda model_type, model_id="": model)
+    vh.verilog_loop(PROMPT, "top_module", str(tmp_path / "tb.sv"), 3, "Fake", num_candidates=1, outdir=str(tmp_path),
+                    context_tokens=100000)
+    assert [len(roles) for roles in model.requests] == [2, 4, 6, 8]
+
+
+@pytest.mark.parametrize("logged", [True, False])
+def test_response_record_round_trip(tmp_path, logged):
+    log = str(tmp_path / "conversation.jsonl") if logged else None
+    conv = vh.start_conversation(PROMPT, log)
+    conv.add_message("assistant", "module top_module(input a, output b);\nendmodule")
+    conv.add_message("user", "Mismatches: 1 in 4 samples")
+    request = conv.request_records()
+    conv.flush_log()
+    response = vh.lm.LLMResponse(1, 0, "module top_module(input a, output b);\n  assign b = a;\nendmodule")
+    vh.write_response_record(str(tmp_path), response, log, request, "fake", conv.request_tokens(), {}, None)
+
+    record = vh.load_response_log(str(tmp_path))
+    assert record["response"] == response.full_text
+    assert record["request_message_ids"] == [0, 1, 2, 3]
+    assert [(message["role"], message["content"]) for message in record["messages"]] == [
+        (message["role"], message["content"]) for message in conv.get_messages()]
@@ -1,16 +1,262 @@
-from abc import ABC, abstractmethod
-import sys
-
-class AbstractCompilationTool(ABC):
-    """Abstract Compilation Tool."""
-
-    def __init__(self):
-        pass
-
-    @abstractmethod
-    def compile(self, file: str):
-        """Compile the given file."""
-        pass
-
-class
-
+from abc import ABC, abstractmethod
+import importlib
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+from sim_result import SimulationResult
+
+# Simulator name (lowercase) -> backend class, filled by register_simulator
+_simulators = {}
+
+# Backends shipped with AutoChip, imported the first time they are asked for
+_builtin_backends = {
+    "rivierapro": "rivierapro_backend",
+    "icarus": "icarus_backend",
+    "verilator": "verilator_backend",
+}
+
+# Loaded as a second top level next to the testbench when early abort is on. It counts the
+# samples the testbench flags in tb_mismatch (at both clock edges, as the testbench does) and
+# stops once there are more than +autochip_mismatch_budget; $finish still runs the
+# testbench's final block, so the usual summary of the samples so far is printed.
+ABORT_MONITOR = """module autochip_abort_monitor;
+   int budget = 0;
+   int mismatches = 0;
+   initial if (!$value$plusargs("autochip_mismatch_budget=%d", budget)) budget = 0;
+   always @(posedge {tb}.clk, negedge {tb}.clk)
+      if (budget > 0 && {tb}.tb_mismatch === 1'b1) begin
+         mismatches++;
+         if (mismatches > budget) begin
+            $display("AutoChip: early abort after %0d mismatches (budget %0d) at time %0t", mismatches, budget, $time);
+            $finish;
+         end
+      end
+endmodule
+"""
+
+class AbstractCompilationTool(ABC):
+    """Abstract Compilation Tool.
+
+    A backend compiles one candidate design together with the testbench and simulates it.
+    compile() and simulate() consult the optional SimulationCache; backends implement
+    _compile(), _simulate() and compile_succeeded(), and build their SimulationResult from
+    the simulator output with parse_results().
+    """
+
+    name = None
+    # Executables that must be on PATH for the tool to be usable
+    executables = ()
+    # Backends that can elaborate ABORT_MONITOR as an extra top-level module
+    supports_early_abort = False
+    abort_monitor_module = "autochip_abort_monitor"
+
+    def __init__(self, verilog_file, testbench_file, run_dir=None, cache=None, mismatch_budget=None, **options):
+        # Options meant for other backends are accepted and ignored so callers can pass one set
+        self.verilog_file = verilog_file
+        self.testbench_file = testbench_file
+        # Optional SimulationCache; a hit skips the simulator entirely
+        self.cache = cache
+        self._cache_key = None
+        self._cached_entry = None
+        self._compiled = False
+        # With a run_dir every tool invocation runs inside it, so build products,
+        # scripts and waveform dumps are private to this backend
+        self.run_dir = run_dir
+        if run_dir:
+            os.makedirs(run_dir, exist_ok=True)
+            self.verilog_file = os.path.abspath(verilog_file)
+            self.testbench_file = os.path.abspath(testbench_file)
+        self.tb_module = self._get_testbench_module_name()
+        # With a mismatch_budget (None disables early abort) the monitor is compiled in and the
+        # simulation stops after more than that many mismatching samples; 0 never stops
+        self.mismatch_budget = mismatch_budget
+        self.early_abort = (mismatch_budget is not None and self.supports_early_abort
+                            and self._testbench_flags_mismatches())
+
+    @classmethod
+    def available(cls):
+        """Return True if the tool's executables are installed."""
+        return all(shutil.which(executable) for executable in cls.executables)
+
+    def _run_path(self, path):
+        """Resolve a path relative to the directory the tools run in."""
+        return os.path.join(self.run_dir, path) if self.run_dir else path
+
+    def _get_testbench_module_name(self):
+        """Extract the testbench module name from the testbench file."""
+        try:
+            with open(self.testbench_file, 'r') as f:
+                content = f.read()
+                # Look for the main testbench module that isn't stimulus_gen or reference_module
+                for pattern in [
+                    r'module\s+(\w+)\s*[;(]',
+                    r'module\s+(\w+)\s*#\s*\([^)]*\)\s*[(;]',
+                    r'module\s+(\w+)\s*\([^)]*\)\s*;'
+                ]:
+                    matches = re.finditer(pattern, content)
+                    for match in matches:
+                        module_name = match.group(1)
+                        if module_name not in ['stimulus_gen', 'reference_module']:
+                            return module_name
+                return "tb"  # Default fallback
+        except Exception as e:
+            print(f"Warning: Could not extract testbench module name: {e}")
+            return "tb"
+
+    def _testbench_flags_mismatches(self):
+        """True if the testbench has the clk and tb_mismatch signals the abort monitor watches."""
+        try:
+            with open(self.testbench_file, 'r') as f:
+                content = f.read()
+        except OSError:
+            return False
+        return re.search(r'\btb_mismatch\b', content) is not None and re.search(r'\bclk\b', content) is not None
+
+    def abort_monitor_file(self):
+        """Write the early-abort monitor for this testbench into the run directory and return its path."""
+        path = os.path.abspath(self._run_path(f"{self.abort_monitor_module}.sv"))
+        with open(path, 'w') as f:
+            f.write(ABORT_MONITOR.replace("{tb}", self.tb_module))
+        return path
+
+    def abort_plusargs(self):
+        """Simulator arguments that pass the mismatch budget to the monitor."""
+        return [f"+autochip_mismatch_budget={self.mismatch_budget}"] if self.early_abort else []
+
+    def _run_tool(self, command, timeout=None):
+        """Run a tool inside run_dir and return the CompletedProcess."""
+        print(f"Debug: Running command: {' '.join(command)}")
+        return subprocess.run(
+            command,
+            check=False,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=timeout,
+            cwd=self.run_dir
+        )
+
+    def cache_flags(self):
+        """Tool settings that change results and therefore belong in the cache key."""
+        return f"{self.name}|{self.tb_module}"
+
+    def _get_cache_key(self):
+        """Hash the design, testbench and flags that determine this backend's results."""
+        if self._cache_key is None:
+            with open(self.verilog_file, 'r') as f:
+                design_text = f.read()
+            with open(self.testbench_file, 'r') as f:
+                testbench_text = f.read()
+            # The monitor is part of the compiled image, but the budget only changes aborted runs, which are never cached
+            flags = self.cache_flags() + ("|abort-monitor" if self.early_abort else "")
+            self._cache_key = self.cache.make_key(design_text, testbench_text, flags)
+        return self._cache_key
+
+    def compile(self):
+        """Compile the design, returning a cached compile output when one exists."""
+        if self.cache is not None:
+            self._cached_entry = self.cache.get(self._get_cache_key())
+            if self._cached_entry is not None:
+                print("Debug: Using cached compile result.")
+                return self._cached_entry["compile_output"]
+
+        compile_output = self._compile()
+        if self.cache is not None:
+            self._cached_entry = {"compile_output": compile_output}
+            self.cache.put(self._get_cache_key(), self._cached_entry)
+        self._compiled = True
+        return compile_output
+
+    def simulate(self):
+        """Simulate the design, returning a SimulationResult (from the cache when one exists)."""
+        if self._cached_entry is not None and isinstance(self._cached_entry.get("simulation"), dict):
+            print("Debug: Using cached simulation result.")
+            return SimulationResult.from_dict(self._cached_entry["simulation"])._replace(cached=True)
+        if not self._compiled:
+            # Only the compile output came from the cache, so the design still has to be built
+            self._compile()
+            self._compiled = True
+
+        result = self._simulate()
+        # Timeouts and tool failures are not worth caching, and aborted runs depend on the budget
+        if self._cached_entry is not None and result.error is None and not result.aborted:
+            self._cached_entry = dict(self._cached_entry, simulation=result.to_dict())
+            self.cache.put(self._get_cache_key(), self._cached_entry)
+        return result
+
+    def check_syntax(self):
+        """Check the design on its own and return the tool output. Defaults to a full compile."""
+        return self.compile()
+
+    def parse_results(self, stdout, returncode=0, stderr=""):
+        """Turn the simulator's output into a SimulationResult.
+
+        The testbenches print the same summary whichever tool runs them, so backends only
+        override this when their tool adds output that changes the outcome.
+        """
+        return SimulationResult.parse(returncode, stdout, stderr)
+
+    @abstractmethod
+    def compile_succeeded(self, compile_output):
+        """Return True if compile_output (from compile or check_syntax) reports no errors."""
+        pass
+
+    @abstractmethod
+    def _compile(self):
+        """Compile the design and testbench, returning the tool output."""
+        pass
+
+    @abstractmethod
+    def _simulate(self):
+        """Simulate the compiled design, returning a SimulationResult."""
+        pass
+
+
+def _simulator_key(name):
+    return name.lower().replace("-", "").replace("_", "")
+
+
+def register_simulator(name):
+    """Class decorator that makes a backend selectable by the config 'simulator' value."""
+    def decorator(cls):
+        cls.name = name
+        _simulators[_simulator_key(name)] = cls
+        return cls
+    return decorator
+
+
+def get_simulator(name):
+    """Return the backend class registered under name."""
+    key = _simulator_key(name)
+    if key not in _simulators and key in _builtin_backends:
+        importlib.import_module(_builtin_backends[key])
+    if key not in _simulators:
+        raise ValueError(f"Unknown simulator '{name}'. Known simulators: "
+                         f"{', '.join(sorted(set(_simulators) | set(_builtin_backends)))}")
+    return _simulators[key]
+
+
+def create_backend(name, verilog_file, testbench_file, **options):
+    """Instantiate the backend registered under name."""
+    return get_simulator(name)(verilog_file, testbench_file, **options)
+
+
+def available_simulators(preference=("Icarus", "Verilator", "RivieraPRO")):
+    """Return the installed simulators, fastest first."""
+    available = []
+    for name in preference:
+        try:
+            if get_simulator(name).available():
+                available.append(name)
+        except ValueError as e:
+            print(f"Warning: {e}", file=sys.stderr)
+    return available
+
+
+def fastest_available_simulator(preference=("Icarus", "Verilator", "RivieraPRO")):
+    """Return the name of the fastest installed simulator, or None if there is none."""
+    available = available_simulators(preference)
+    return available[0] if available else None
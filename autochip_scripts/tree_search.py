@@ -0,0 +1,188 @@
+import hashlib
+import heapq
+import itertools
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from time import time
+
+import languagemodels as lm
+import verilog_handling as vh
+from model_router import ModelRouter
+from search_scheduler import SearchScheduler
+from sim_cache import normalize_design
+
+STRATEGIES = ("linear", "tree")
+
+# A node of the repair tree. conversation is the request that produced the node's candidate
+# (response, written to outdir); the root has neither and only holds the design prompt.
+SearchNode = namedtuple("SearchNode", ["conversation", "response", "outdir", "depth"])
+# The candidates requested for one expanded node; results are filled in as they are evaluated
+Expansion = namedtuple("Expansion", ["node", "conversation", "request_tokens", "request_messages", "responses",
+                                     "outdirs", "results"])
+
+
+def design_hash(text):
+    """Hash of a design that ignores whitespace differences, as the simulation cache keys it."""
+    return hashlib.sha256(normalize_design(text).encode('utf-8')).hexdigest()
+
+
+def branch_conversation(node, vcd_windows=3):
+    """The conversation that asks for repairs of node's candidate."""
+    if node.response is None:
+        return node.conversation
+    conv = node.conversation.fork()
+    conv.add_message("assistant", node.response.parsed_text)
+    conv.add_message("user", vh.candidate_feedback(node.response, node.outdir, vcd_windows))
+    return conv
+
+
+def tree_search(design_prompt, module, testbench, max_iterations, model_type, model_id="", num_candidates=5, outdir="", log=None, mixed_model_config={}, workers=1, executor=None, simulator="RivieraPRO", shared_testbench=False, syntax_prescreen=True, llm_semaphore=None, early_stop=True, context_tokens=None, context_policy="collapse", vcd_windows=3, early_abort=False, mismatch_budget=None, scheduler=None, beam_width=2, max_depth=None, max_frontier=16, router=None, **sim_options):
+    """Best-first search over repair branches, with the same arguments and result as verilog_loop.
+
+    Every evaluated candidate becomes a node of a tree, and the frontier of unexpanded nodes
+    is a priority queue ordered by mismatch count (candidates that did not simulate last).
+    Like verilog_loop, the search makes max_iterations + 1 rounds of requests. Each round
+    expands the beam_width best nodes in parallel: every node's conversation is forked,
+    given the node's candidate and feedback, and asked for num_candidates repairs (as many
+    as scheduler allows), which are evaluated together. Nodes at max_depth (by default the
+    depth the linear loop reaches) are not expanded, only the max_frontier best nodes are
+    kept waiting, and a design already seen (ignoring whitespace) is not evaluated again.
+    Candidates that failed to compile or simulate are only kept while nothing has simulated;
+    from then on they are dropped. router picks the model of every round, as in
+    verilog_loop. The search stops at the first passing candidate and returns the best one found.
+    """
+    if executor is None and workers > 1:
+        # Keep one pool for the whole run so worker processes (and their simulator sessions) are reused
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return tree_search(design_prompt, module, testbench, max_iterations, model_type, model_id, num_candidates,
+                               outdir, log, mixed_model_config, workers=workers, executor=pool, simulator=simulator,
+                               shared_testbench=shared_testbench, syntax_prescreen=syntax_prescreen,
+                               llm_semaphore=llm_semaphore, early_stop=early_stop, context_tokens=context_tokens,
+                               context_policy=context_policy, vcd_windows=vcd_windows, early_abort=early_abort,
+                               mismatch_budget=mismatch_budget, scheduler=scheduler, beam_width=beam_width,
+                               max_depth=max_depth, max_frontier=max_frontier, router=router, **sim_options)
+
+    if shared_testbench:
+        sim_options["tb_lib_dir"] = vh.prepare_shared_testbench(simulator, testbench, outdir)
+    conv = vh.start_conversation(design_prompt, log, context_tokens, context_policy)
+    header = vh.prompt_header(design_prompt, module)
+    if scheduler is None:
+        scheduler = SearchScheduler(num_candidates)
+    if max_depth is None:
+        max_depth = max_iterations + 1
+    if router is None and mixed_model_config:
+        router = ModelRouter(mixed_model_config)
+
+    def evaluate(batch, budget):
+        return vh.evaluate_candidates(batch, workers=workers, executor=executor, simulator=simulator,
+                                      mismatch_budget=budget, **sim_options)
+
+    def expand(node, count, family, model):
+        """Ask for count repairs of node; runs in a thread so the beam's requests overlap."""
+        branch = branch_conversation(node, vcd_windows)
+        request_tokens = branch.request_tokens()
+        request_messages = branch.request_records()
+        with llm_semaphore or nullcontext():
+            responses = vh.generate_verilog_responses(branch, family, model, num_candidates=count,
+                                                      stop_at_module=module if early_stop else None, header=header)
+        return branch, request_tokens, request_messages, responses
+
+    best = lm.LLMResponse(-3, -3, "")
+    # Entries are (mismatches, depth, order, node); order breaks ties first come, first served
+    order = itertools.count()
+    frontier = [(float('inf'), 0, next(order), SearchNode(conv, None, None, 0))]
+    seen = set()
+    with ThreadPoolExecutor(max_workers=beam_width) as request_pool:
+        for iteration in range(max_iterations + 1):
+            exhausted = scheduler.exhausted()
+            if exhausted:
+                print(f"Debug: Stopping search: {exhausted}")
+                break
+            if not frontier:
+                print("Debug: Search frontier is empty")
+                break
+
+            beam = [heapq.heappop(frontier)[-1] for _ in range(min(beam_width, len(frontier)))]
+            if router is not None:
+                model_type, model_id = router.choose(iteration)
+            round_start = time()
+            previous_best = best.mismatches
+            count = scheduler.num_candidates(best.mismatches)
+            print(f"Debug: Iteration {iteration}: expanding {len(beam)} of {len(beam) + len(frontier)} nodes "
+                  f"(best {best.mismatches} mismatches)")
+            requested = [future.result() for future in
+                         [request_pool.submit(expand, node, count, model_type, model_id) for node in beam]]
+            generation_seconds = time() - round_start
+            tokens = 0
+
+            # Every branch's candidates are evaluated in one batch, so they share the simulator workers
+            expansions, jobs, owners = [], [], []
+            for idx, (node, (branch, request_tokens, request_messages, responses)) in enumerate(zip(beam, requested)):
+                tokens += scheduler.record_generation(request_tokens, [response.full_text for response in responses])
+                unique = []
+                for response in responses:
+                    digest = design_hash(response.parsed_text)
+                    if digest not in seen:
+                        seen.add(digest)
+                        unique.append(response)
+                if len(unique) < len(responses):
+                    print(f"Debug: Skipping {len(responses) - len(unique)} duplicate designs")
+                branch_jobs, job_indices, response_outdirs, results = vh.prepare_candidates(
+                    unique, os.path.join(outdir, f"iter{iteration}", f"branch{idx}"), module, testbench, header,
+                    syntax_prescreen)
+                jobs.extend(branch_jobs)
+                owners.extend((len(expansions), job_idx) for job_idx in job_indices)
+                expansions.append(Expansion(node, branch, request_tokens, request_messages, unique,
+                                            response_outdirs, results))
+
+            job_results = scheduler.evaluate(jobs, evaluate, vh.abort_budget(early_abort, mismatch_budget, best.mismatches))
+            for (expansion_idx, response_idx), result in zip(owners, job_results):
+                expansions[expansion_idx].results[response_idx] = result
+
+            for expansion in expansions:
+                depth = expansion.node.depth + 1
+                for response, response_outdir, (compile_output, sim_output) in zip(
+                        expansion.responses, expansion.outdirs, expansion.results):
+                    current_mismatches = vh.rank_candidate(response, compile_output, sim_output)
+                    # An aborted run's count is only a lower bound, so it never becomes the best
+                    if response.mismatches < best.mismatches and not sim_output.aborted:
+                        response.rank = 1
+                        best = response
+                        print(f"Debug: New best at depth {depth}: {response.mismatches} mismatches")
+                    vh.write_response_record(response_outdir, response, log, expansion.request_messages, model_id,
+                                             expansion.request_tokens, current_mismatches, sim_output)
+                    # Once a candidate has simulated, repairing one that did not is a step backwards
+                    failed = response.mismatches == float('inf')
+                    if depth < max_depth and not (failed and best.mismatches != float('inf')):
+                        heapq.heappush(frontier, (response.mismatches, depth, next(order),
+                                                  SearchNode(expansion.conversation, response, response_outdir, depth)))
+            if router is not None:
+                router.record(model_type, model_id, tokens, generation_seconds, best.mismatches < previous_best)
+            conv.flush_log()
+            if best.mismatches == 0:
+                print("Perfect match achieved - stopping search")
+                break
+            if best.mismatches != float('inf') and any(entry[0] == float('inf') for entry in frontier):
+                # Drop the failed candidates kept while nothing had simulated
+                frontier = [entry for entry in frontier if entry[0] != float('inf')]
+                heapq.heapify(frontier)
+            if len(frontier) > max_frontier:
+                # A sorted list is a valid heap
+                frontier = heapq.nsmallest(max_frontier, frontier)
+
+    print(f"Debug: {scheduler.report()}")
+    return best
+
+
+def search_loop(config_values):
+    """The repair loop a config asks for: verilog_loop with its pipelining, or tree_search with its limits."""
+    strategy = config_values['strategy']
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Invalid strategy '{strategy}'. Must be one of: {', '.join(STRATEGIES)}")
+    if strategy == "linear":
+        return partial(vh.verilog_loop, pipelined=config_values['pipeline'], speculative=config_values['speculate'])
+    return partial(tree_search, beam_width=config_values['beam_width'], max_depth=config_values['max_depth'],
+                   max_frontier=config_values['max_frontier'])
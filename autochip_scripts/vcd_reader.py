@@ -0,0 +1,246 @@
+import functools
+import mmap
+import os
+import re
+from collections import namedtuple
+
+Signal = namedtuple("Signal", ["code", "scope", "name", "width"])
+# end is None when the output was still mismatching at the end of the dump
+MismatchWindow = namedtuple("MismatchWindow", ["output", "start", "end", "expected", "actual", "inputs"])
+
+# Value changes of the wanted codes (filled in per read), or a comment to skip. A change is
+# a whole line, so the regex engine only tries the alternatives at line starts and steps over
+# the changes of other signals without reaching Python.
+_CHANGE_TEMPLATE = r'''
+    \n(?:([01xzXZ])|[bBrR](\S+)[ \t]+)({codes})(?=\s)
+  | \$comment\b.*?\$end\b
+'''
+_TIMESTAMP = re.compile(rb'#(\d+)')
+# Signals the VerilogEval testbenches dump that are neither design inputs nor compared outputs
+_IGNORED_SIGNALS = {"clk", "tb_match", "tb_mismatch", "wavedrom_enable", "wavedrom_title"}
+# Value changes read per dump at most; a window still open there is reported as lasting to the end
+MAX_BYTES = 16 * 1024 * 1024
+
+
+class VCDReader:
+    """Reads a VCD dump through a read-only memory map, so its size does not matter.
+
+    The header is parsed on open; value changes are streamed by iter_timesteps(), which
+    only decodes the signals it was asked for.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.timescale = None
+        self.signals = []
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._body_start = self._parse_header()
+        except (ValueError, OSError):
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _parse_header(self):
+        """Read the $scope/$var declarations; returns the offset of the value changes."""
+        definitions_end = self._map.find(b"$enddefinitions")
+        if definitions_end == -1:
+            raise ValueError(f"{self.path} has no $enddefinitions")
+        tokens = self._map[:definitions_end].decode('utf-8', 'replace').split()
+        scope = []
+        idx = 0
+        while idx < len(tokens):
+            token = tokens[idx]
+            close = tokens.index("$end", idx) if token in ("$scope", "$var", "$timescale") and "$end" in tokens[idx:] else idx
+            if token == "$scope" and close > idx + 2:
+                scope.append(tokens[idx + 2])
+            elif token == "$upscope" and scope:
+                scope.pop()
+            elif token == "$var" and close > idx + 4:
+                # $var <type> <width> <code> <name> [<range>] $end
+                self.signals.append(Signal(tokens[idx + 3], ".".join(scope), tokens[idx + 4], int(tokens[idx + 2])))
+            elif token == "$timescale":
+                self.timescale = "".join(tokens[idx + 1:close])
+            idx = close + 1
+        body_start = self._map.find(b"$end", definitions_end + len(b"$enddefinitions"))
+        return len(self._map) if body_start == -1 else body_start + len(b"$end")
+
+    def find(self, name):
+        """Return the outermost signal called name (or with the dotted path name), or None."""
+        for signal in self.signals:
+            if name in (signal.name, f"{signal.scope}.{signal.name}"):
+                return signal
+        return None
+
+    def iter_timesteps(self, signals, end=None):
+        """Yield (offset, values) after every timestep in which one of signals changed.
+
+        values maps each signal's code to its current value (lowercase, as dumped) and is
+        updated in place; offset is where the timestep's last change ends, for time_at()
+        and value_at(). Changes of other signals are never decoded, and reading stops at
+        byte offset end.
+        """
+        wanted = {signal.code.encode(): signal.code for signal in signals}
+        values = {signal.code: "x" for signal in signals}
+        if not wanted:
+            return
+        # Longest codes first, so a code is never matched by its own prefix
+        codes = "|".join(re.escape(code.decode()) for code in sorted(wanted, key=len, reverse=True))
+        pattern = re.compile(_CHANGE_TEMPLATE.format(codes=codes).encode(), re.VERBOSE | re.DOTALL)
+        find = self._map.find
+        changed = None
+        # Timestamps start a line, so a new timestep began if one lies between two changes
+        for match in pattern.finditer(self._map, self._body_start - 1, len(self._map) if end is None else end):
+            scalar, vector, code = match.groups()
+            if code is None:
+                continue
+            if changed is not None and find(b"\n#", changed, match.start()) != -1:
+                yield changed, values
+            values[wanted[code]] = (scalar if scalar is not None else vector).decode().lower()
+            changed = match.end()
+        if changed is not None:
+            yield changed, values
+
+    def time_at(self, offset):
+        """The time of the timestep that offset lies in."""
+        stamp = self._map.rfind(b"\n#", self._body_start - 1, offset)
+        return 0 if stamp == -1 else int(_TIMESTAMP.match(self._map, stamp + 1).group(1))
+
+    def value_at(self, signal, offset):
+        """The value signal had at offset, found by searching back for its last change line."""
+        code = signal.code.encode()
+        end = offset + 1
+        while True:
+            position = max(self._map.rfind(code + b"\n", self._body_start - 1, end),
+                           self._map.rfind(code + b"\r\n", self._body_start - 1, end))
+            if position == -1:
+                return "x"
+            line_start = self._map.rfind(b"\n", 0, position) + 1
+            line = self._map[line_start:position]
+            # The code may also end another signal's code or a value, so the line must be its change
+            if len(line) == 1 and line in b"01xzXZ":
+                return line.decode().lower()
+            if line[:1] in (b"b", b"B", b"r", b"R") and line[-1:] in (b" ", b"\t"):
+                return line[1:].decode().strip().lower()
+            end = position + len(code) - 1
+
+
+def _extend(value, width):
+    """Left-extend a dumped vector to width bits, as VCD drops leading zeros."""
+    if len(value) >= width:
+        return value
+    return value[0] * (width - len(value)) + value if value[0] in "xz" else value.zfill(width)
+
+
+def _mismatches(expected, actual):
+    """True if actual differs from expected in a bit the reference drives (x is don't-care)."""
+    return any(e != a for e, a in zip(expected, actual) if e not in "xz")
+
+
+def format_value(value, width):
+    if width == 1:
+        return value
+    if width > 8 and not value.strip("01"):
+        return f"{width}'h{int(value, 2):x}"
+    return f"{width}'b{value}"
+
+
+def mismatch_windows(path, max_windows=3, outputs=None, max_bytes=MAX_BYTES):
+    """Return the first max_windows mismatch windows of every output in a VerilogEval dump.
+
+    Outputs are the <name>_ref/<name>_dut pairs the testbench dumps, limited to outputs
+    when given (e.g. the ones the simulation reported mismatches for). Every other dumped
+    signal except the clock and the testbench's own flags counts as an input, and its value
+    at the start of each window is looked up when the window opens. Reading stops once
+    every output has max_windows closed windows, or after max_bytes of value changes.
+    """
+    with VCDReader(path) as reader:
+        by_name = {}
+        for signal in reader.signals:
+            by_name.setdefault(signal.name, signal)
+        pairs = {name[:-len("_ref")]: (signal, by_name[name[:-len("_ref")] + "_dut"])
+                 for name, signal in by_name.items() if name.endswith("_ref") and name[:-len("_ref")] + "_dut" in by_name}
+        if outputs is not None:
+            pairs = {output: pair for output, pair in pairs.items() if output in outputs}
+        if not pairs:
+            return {}
+        inputs = [signal for name, signal in by_name.items()
+                  if name not in _IGNORED_SIGNALS and not name.endswith(("_ref", "_dut"))]
+        end = reader._body_start + max_bytes if max_bytes else None
+
+        windows = {output: [] for output in pairs}
+        open_windows = {}
+        timesteps = reader.iter_timesteps([signal for pair in pairs.values() for signal in pair], end)
+        try:
+            for offset, values in timesteps:
+                for output, (ref, dut) in pairs.items():
+                    expected, actual = values[ref.code], values[dut.code]
+                    if expected == actual:
+                        mismatch = False
+                    else:
+                        expected, actual = _extend(expected, ref.width), _extend(actual, dut.width)
+                        mismatch = _mismatches(expected, actual)
+                    if mismatch and output not in open_windows and len(windows[output]) < max_windows:
+                        window = [output, reader.time_at(offset), None, format_value(expected, ref.width),
+                                  format_value(actual, dut.width),
+                                  {signal.name: format_value(_extend(reader.value_at(signal, offset), signal.width),
+                                                             signal.width) for signal in inputs}]
+                        windows[output].append(window)
+                        open_windows[output] = window
+                    elif not mismatch and output in open_windows:
+                        open_windows.pop(output)[2] = reader.time_at(offset)
+                if not open_windows and all(len(found) >= max_windows for found in windows.values()):
+                    break
+        finally:
+            # The generator holds a view of the map, which must be released before it closes
+            timesteps.close()
+    return {output: [MismatchWindow(*window) for window in found] for output, found in windows.items() if found}
+
+
+def format_mismatch_windows(windows):
+    """Compact feedback lines describing mismatch windows, one line per window."""
+    lines = []
+    for output, found in windows.items():
+        for window in found:
+            span = f"t={window.start}..{window.end}" if window.end is not None else f"t={window.start} onward"
+            inputs = " ".join(f"{name}={value}" for name, value in window.inputs.items())
+            lines.append(f"- {output} at {span}: expected {window.expected}, got {window.actual}"
+                         + (f" (inputs: {inputs})" if inputs else ""))
+    return lines
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_windows(path, mtime_ns, size, max_windows, outputs):
+    # mtime_ns and size are only part of the key, so a rewritten dump is read again
+    return mismatch_windows(path, max_windows, outputs)
+
+
+def mismatch_feedback(vcd_file, max_windows=3, outputs=None):
+    """Feedback lines from a simulation's waveform dump, or [] if there is none to read.
+
+    Only the outputs given are read (all when None). The best candidate is usually sent back
+    in several iterations, so the windows of an unchanged dump are read once.
+    """
+    try:
+        stat = os.stat(vcd_file)
+    except OSError:
+        return []
+    try:
+        windows = _cached_windows(vcd_file, stat.st_mtime_ns, stat.st_size, max_windows,
+                                  None if outputs is None else frozenset(outputs))
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read waveform dump {vcd_file}: {e}")
+        return []
+    if not windows:
+        return []
+    return ["Mismatch windows from the waveform (values at the start of each window):"] + format_mismatch_windows(windows)
@@ -0,0 +1,61 @@
+import os
+import subprocess
+from tools import AbstractCompilationTool, register_simulator
+from sim_result import SimulationResult
+
+@register_simulator("Verilator")
+class VerilatorBackend(AbstractCompilationTool):
+    """Verilator backend: builds the testbench into a native binary with --binary --timing."""
+
+    executables = ("verilator",)
+    verilator_flags = ["--binary", "--timing", "-Wno-fatal", "-Wno-lint", "-Wno-style"]
+    # Verilator builds a single top-level module, so the abort monitor cannot be added
+    supports_early_abort = False
+
+    def __init__(self, verilog_file, testbench_file, run_dir=None, cache=None, **options):
+        super().__init__(verilog_file, testbench_file, run_dir=run_dir, cache=cache, **options)
+        self.build_dir = "obj_dir"
+        self._returncode = None
+
+    def cache_flags(self):
+        return f"{self.name}|{' '.join(self.verilator_flags)}|{self.tb_module}"
+
+    def compile_succeeded(self, compile_output):
+        if self._returncode is not None:
+            return self._returncode == 0
+        return "%Error" not in compile_output
+
+    def _verilator(self, arguments, timeout=None):
+        try:
+            result = self._run_tool(["verilator"] + arguments, timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"Compilation failed with exception: {e}")
+            self._returncode = -1
+            return str(e)
+        self._returncode = result.returncode
+        return result.stdout + result.stderr
+
+    def _compile(self):
+        """Verilate and build the testbench binary."""
+        return self._verilator(self.verilator_flags + [
+            "--top-module", self.tb_module, "-Mdir", self.build_dir, "-o", f"V{self.tb_module}",
+            self.verilog_file, self.testbench_file
+        ], timeout=600)
+
+    def check_syntax(self):
+        """Lint the design alone; this never invokes the C++ compiler."""
+        return self._verilator(["--lint-only", "-Wno-fatal", "-Wno-lint", "-Wno-style", self.verilog_file])
+
+    def _simulate(self):
+        """Run the Verilated binary."""
+        binary = os.path.join(".", self.build_dir, f"V{self.tb_module}")
+        try:
+            print("Simulating with Verilator...")
+            result = self._run_tool([binary], timeout=300)
+        except subprocess.TimeoutExpired:
+            print("Simulation timed out after 300 seconds")
+            return SimulationResult.failed("Simulation timeout")
+        except OSError as e:
+            print(f"Simulation failed: {e}")
+            return SimulationResult.failed(str(e))
+        return self.parse_results(result.stdout, result.returncode, result.stderr)
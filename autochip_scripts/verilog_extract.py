@@ -0,0 +1,297 @@
+import re
+from collections import namedtuple
+
+import verilog_header
+from verilog_lint import tokenize
+
+_FENCE = "```"
+_MODULE_WORD = re.compile(r'\b(?:macro)?module\b')
+_MODULE_KEYWORDS = {"module", "macromodule"}
+_SPAN_KEYWORDS = _MODULE_KEYWORDS | {"endmodule"}
+# Everything iter_module_spans needs outside module headers; comments and strings are
+# matched only so the keywords inside them are skipped
+_SCAN_PATTERN = re.compile(r'''
+    //[^\n]*
+  | /\*(?:[^*]|\*(?!/))*(?:\*/|\Z)
+  | "(?:[^"\\\n]|\\.)*"
+  | (?P<directive>`(?:timescale|define|default_nettype|include)\b)
+  | (?<![\w$`\\])(?P<keyword>endmodule|macromodule|module)(?![\w$])
+''', re.VERBOSE)
+
+_MARKDOWN_ARTIFACTS = re.compile(r"```verilog|```|Here's [^:\n]*:\s*|Here is [^:\n]*:\s*")
+_BLANK_LINES = re.compile(r'\n(?:[ \t\r\f\v]*\n)+')
+
+# start/end cover the module and the directives just before it; body_start..body_end is
+# the text between the header's ';' and endmodule
+ModuleSpan = namedtuple("ModuleSpan", ["name", "start", "body_start", "body_end", "end"])
+
+
+def _parse_header(text, position, unfinished=None):
+    """Parse a module header starting after its keyword. Returns (name, body start) or None.
+
+    Stops at the next module keyword, so a broken header costs no more than the text up to it.
+    A header that is still going when the text ends returns unfinished instead.
+    """
+    name = None
+    depth = 0
+    seen_port_list = False
+    for token in tokenize(text, start=position):
+        if token.kind == "identifier" and token.value in _SPAN_KEYWORDS:
+            return None
+        if name is None:
+            if token.kind != "identifier":
+                return None
+            name = token.value
+        elif not seen_port_list:
+            if token.value not in ("#", "(", ";"):
+                return None
+            seen_port_list = True
+        if token.value in ("(", "[", "{"):
+            depth += 1
+        elif token.value in (")", "]", "}"):
+            depth -= 1
+        elif token.value == ";" and depth <= 0:
+            return name, token.end
+    return unfinished
+
+
+def iter_module_spans(text):
+    """Yield a ModuleSpan for every complete module in text.
+
+    Outside module headers only comments, strings, directives and module keywords are
+    matched, by one precompiled regex with no backtracking between alternatives, so long
+    prose and module bodies are skipped at C speed. Prose is not mistaken for code: a
+    "module" that is not followed by a name and then '#', '(' or ';' is no declaration, and
+    a declaration that never reaches endmodule is dropped when the next one starts. Every
+    character is scanned a bounded number of times, so the time is linear in len(text).
+    """
+    directive_start = None
+    directive_end = None
+    start = name = body_start = None
+    position = 0
+    while True:
+        match = _SCAN_PATTERN.search(text, position)
+        if match is None:
+            return
+        position = match.end()
+        if match.group("directive"):
+            if start is None:
+                # Consecutive directive lines stay together and attach to the module below them
+                if directive_start is None or text[directive_end:match.start()].strip():
+                    directive_start = match.start()
+                line_end = text.find('\n', match.end())
+                directive_end = line_end if line_end != -1 else len(text)
+                position = max(position, directive_end)
+            continue
+
+        keyword = match.group("keyword")
+        if keyword is None:
+            continue
+        if keyword == "endmodule":
+            if start is not None:
+                yield ModuleSpan(name, start, body_start, match.start(), match.end())
+                start = None
+                directive_start = None
+            continue
+
+        header = _parse_header(text, match.end())
+        if header is None:
+            continue
+        name, body_start = header
+        start = match.start()
+        if directive_start is not None and not text[directive_end:start].strip():
+            start = directive_start
+        directive_start = None
+        position = body_start
+
+
+def extract_modules(text):
+    """Return the source of every complete module in text, with the directives just before it."""
+    return [text[span.start:span.end].strip() for span in iter_module_spans(text)]
+
+
+def extract_module_body(text, module_name=None):
+    """Return the body of the first module (or of module_name) with blank lines removed, or ""."""
+    for span in iter_module_spans(text):
+        if module_name is None or span.name == module_name:
+            body = text[span.body_start:span.body_end]
+            return '\n'.join(line.strip() for line in body.split('\n') if line.strip())
+    return ""
+
+
+def hoist_directives(code):
+    """Move compiler directives to the top (each once) and strip blank lines and indentation."""
+    directives = []
+    seen = set()
+    lines = []
+    for line in code.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('`'):
+            if line not in seen:
+                seen.add(line)
+                directives.append(line)
+        else:
+            lines.append(line)
+    return '\n'.join(directives) + '\n\n' + '\n'.join(lines)
+
+
+def extract_design(text, header=None):
+    """Turn an LLM response into a design file.
+
+    With header (the prompt's verilog_header.ModuleHeader), the body of the response's
+    module is placed under the prompt's header, so the ports always match the testbench.
+    The response's net kinds (output reg) are kept. A non-ANSI module is kept as written,
+    since its body redeclares the ports and would clash with an ANSI header.
+    """
+    if header is not None:
+        body = extract_module_body(text, header.name) or extract_module_body(text)
+        if body:
+            candidate = verilog_header.parse_module_header(text, header.name)
+            if candidate is not None and not candidate.ansi:
+                return hoist_directives("\n\n".join(extract_modules(text)))
+            kinds = {port.name: port.kind for port in candidate.ports if port.kind} if candidate else {}
+            return hoist_directives(f"`timescale 1ns / 1ps\n`define RESET_VAL 4'b0000\n\n"
+                                    f"{verilog_header.render_header(header, kinds)}\n{body}\nendmodule")
+    modules = extract_modules(text)
+    return hoist_directives("\n\n".join(modules) if modules else text)
+
+
+def clean_generated_verilog(code):
+    """Clean up generated Verilog code by removing markdown artifacts and formatting."""
+    code = _MARKDOWN_ARTIFACTS.sub('', code)
+    code = _BLANK_LINES.sub('\n\n', code)
+    return code.strip()
+
+
+def find_verilog_modules(text, header=None):
+    """Return the complete modules of an LLM response.
+
+    A response with only module internals (assign/always statements) is wrapped in header,
+    the prompt's verilog_header.ModuleHeader, when one is given.
+    """
+    modules = extract_modules(text)
+    if modules or header is None:
+        return modules
+
+    cleaned_text = clean_generated_verilog(text)
+    if not re.search(r'module\s+', cleaned_text, re.IGNORECASE) and ('assign' in cleaned_text or 'always' in cleaned_text):
+        cleaned_text = verilog_header.render_header(header) + "\n" + cleaned_text
+        if 'endmodule' not in cleaned_text:
+            cleaned_text += "\nendmodule"
+        return extract_modules(cleaned_text)
+    return []
+
+
+class ModuleStreamExtractor:
+    """Follows a streamed LLM response and reports when it no longer needs to be read.
+
+    feed() returns True once the target module has been closed by its endmodule (and any
+    markdown code block around it has been closed), or once the response has obviously
+    diverged: no module after max_preamble characters, or a module opened inside another.
+    Everything after that point would be discarded by parse_verilog anyway.
+    """
+
+    def __init__(self, module_name="top_module", max_preamble=4000):
+        self.module_name = module_name
+        self.max_preamble = max_preamble
+        self.done = False
+        self.reason = None
+        self._chunks = []
+        self._length = 0
+        self._tail = ""
+        self._module_seen = False
+        self._pending = False
+        # Scan state of _check, which resumes where the last scan settled instead of from the start
+        self._scanned = 0
+        self._open_module = None
+        self._target_end = None
+        self._target_fences = 0
+        self._fences = 0
+        self._fences_counted = 0
+
+    @property
+    def text(self):
+        """Everything received so far."""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def feed(self, chunk):
+        """Add the next piece of the response; returns True when the rest can be skipped."""
+        if self.done or not chunk:
+            return self.done
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        # Keywords can be split across chunks, so new text is searched together with the end of the old
+        window = self._tail + chunk
+        self._tail = window[-len("endmodule"):]
+
+        if not self._module_seen:
+            self._module_seen = _MODULE_WORD.search(window) is not None
+            if not self._module_seen and self._length > self.max_preamble:
+                return self._finish("no module declaration")
+        # Only a new endmodule, module or fence can change the outcome, and only once its line is
+        # complete, so most chunks skip the scan
+        if "module" in window or _FENCE in window:
+            self._pending = True
+        if self._pending and '\n' in chunk:
+            self._pending = False
+            self._check()
+        return self.done
+
+    def _finish(self, reason):
+        self.done = True
+        self.reason = reason
+        return True
+
+    def _check(self):
+        # Declarations are recognized as iter_module_spans recognizes them, so "module" in prose,
+        # comments or strings neither opens a module nor names the target. Only complete lines are
+        # scanned, since a string still being streamed would not be recognized as one. Each scan
+        # resumes after the last match that more text cannot change, so a response is scanned once.
+        text = self.text
+        end = text.rfind('\n') + 1
+        position = self._scanned
+        while True:
+            match = _SCAN_PATTERN.search(text, position, end)
+            if match is None:
+                self._scanned = end
+                break
+            if match.group().startswith("/*") and not match.group().endswith("*/"):
+                # A block comment still open at the end of the lines so far
+                self._scanned = match.start()
+                break
+            position = match.end()
+            keyword = match.group("keyword")
+            if keyword is None:
+                continue
+            if keyword == "endmodule":
+                if self._open_module is not None:
+                    if self._open_module == self.module_name:
+                        self._target_end = match.end()
+                        self._target_fences = text.count(_FENCE, 0, self._target_end)
+                    self._open_module = None
+                continue
+            header = _parse_header(text[:end], match.end(), unfinished=False)
+            if header is False:
+                # The header goes on past the complete lines; parse it again once they do
+                self._scanned = match.start()
+                break
+            if header is None:
+                continue
+            if self._open_module is not None:
+                self._finish("module declared inside another module")
+                return
+            self._open_module, position = header
+
+        # Lines end in newlines, so no fence is split between two counts
+        self._fences += text.count(_FENCE, self._fences_counted, end)
+        self._fences_counted = end
+        if self._target_end is None or self._open_module is not None:
+            return
+        # Inside an unclosed markdown block more modules may follow, so wait for the closing fence
+        if self._target_fences % 2 == 1 and self._fences % 2 == 1:
+            return
+        self._finish(f"{self.module_name} complete")
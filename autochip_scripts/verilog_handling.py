@@ -1,277 +1,581 @@
-import subprocess
-import languagemodels as lm
-import conversation as cv
-import os
-import re
-import tiktoken
-import anthropic
-from rivierapro_backend import RivieraPROBackend
-
-def format_message(role, content):
-   return f"\n{{role : '{role}', content : '{content}'}}"
-
-def clean_generated_verilog(code):
-   """Clean up generated Verilog code by removing markdown artifacts and formatting."""
-   code = re.sub(r'```verilog|```', '', code)
-   code = re.sub(r"Here's .*?:\s*", '', code)
-   code = re.sub(r"Here is .*?:\s*", '', code)
-   code = re.sub(r'\n\s*\n', '\n\n', code)
-   return code.strip()
-
-def sanitize_verilog_code(code):
-   """Clean and format Verilog code."""
-   code = clean_generated_verilog(code)
-   if not code.strip().startswith('`timescale'):
-       code = '`timescale 1ns / 1ps\n\n' + code
-   lines, indent_level = [], 0
-   for line in code.split('\n'):
-       line = line.strip()
-       if line:
-           if any(keyword in line for keyword in ['end', 'endmodule', 'endcase']):
-               indent_level = max(0, indent_level - 1)
-           lines.append('    ' * indent_level + line)
-           if any(keyword in line for keyword in ['begin', 'case', 'module']):
-               indent_level += 1
-   return '\n'.join(lines)
-
-def find_verilog_modules(text):
-   cleaned_text = clean_generated_verilog(text)
-   
-   # If text contains only module internals, wrap it with the module declaration
-   if not re.search(r'module\s+', cleaned_text, re.IGNORECASE) and ('assign' in cleaned_text or 'always' in cleaned_text):
-       module_header = """
-module top_module(
-   input [2:0] vec, 
-   output [2:0] outv,
-   output o2,
-   output o1,
-   output o0
-);
-"""
-       cleaned_text = module_header + cleaned_text
-       if 'endmodule' not in cleaned_text:
-           cleaned_text += "\nendmodule"
-   
-   # Try to find complete modules first
-   module_pattern = r'(?:^|\n)\s*(?:`timescale\s+[^`\n]*\s*\n)?\s*(?:`define\s+[^`\n]*\s*\n)*\s*module\s+[\w\\_]+\s*(?:#\s*\([^)]*\))?\s*\([^)]*\)\s*;.*?endmodule'
-   matches = re.findall(module_pattern, cleaned_text, re.DOTALL | re.MULTILINE)
-   
-   if not matches:
-       module_pattern = r'module\s+[\w\\_]+\s*(?:#\s*\([^)]*\))?\s*\([^)]*\)\s*;.*?endmodule'
-       matches = re.findall(module_pattern, cleaned_text, re.DOTALL)
-   
-   return [match.strip() for match in matches]
-def write_code_blocks_to_file(markdown_string, module_name, filename):
-   code_blocks = find_verilog_modules(markdown_string)
-   if not code_blocks:
-       print("No valid Verilog modules found in response")
-       return False
-   try:
-       with open(filename, 'w') as file:
-           for code_block in code_blocks:
-               cleaned_code = sanitize_verilog_code(code_block)
-               if '`timescale' not in cleaned_code:
-                   file.write('`timescale 1ns / 1ps\n\n')
-               if '`define RESET_VAL' not in cleaned_code:
-                   file.write('`define RESET_VAL 4\'b0000\n\n')
-               file.write(cleaned_code)
-               file.write('\n\n')
-       return True
-   except Exception as e:
-       print(f"Error writing to file: {e}")
-       return False
-
-def analyze_compilation_errors(compile_output):
-   """Analyze compilation output to identify common Verilog syntax issues."""
-   issues = {
-       'missing_endmodule': False,
-       'undefined_macros': set(),
-       'syntax_errors': [],
-       'timing_issues': False,
-       'macro_name_errors': False
-   }
-   if compile_output:
-       lines = compile_output.split('\n')
-       for line in lines:
-           if "module/macromodule...endmodule pair(s) mismatch" in line:
-               issues['missing_endmodule'] = True
-           elif "Macro" in line and "is not defined" in line:
-               macro_name = line.split("Macro")[1].split("is not defined")[0].strip()
-               issues['undefined_macros'].add(macro_name)
-           elif "Name of macro is not specified" in line:
-               issues['macro_name_errors'] = True
-           elif "Syntax error" in line:
-               issues['syntax_errors'].append(line)
-           elif "timescale" in line:
-               issues['timing_issues'] = True
-   return issues
-
-def generate_verilog_responses(conv, model_type, model_id="", num_candidates=1):
-   if model_type == "ChatGPT":
-       model = lm.ChatGPT(model_id)
-   elif model_type == "Claude":
-       model = lm.Claude(model_id)
-   elif model_type == "Gemini":
-       model = lm.Gemini(model_id)
-   elif model_type == "Human":
-       model = lm.HumanInput()
-   else:
-       raise ValueError("Invalid model type")
-
-   response_texts = model.generate(conversation=conv, num_candidates=num_candidates)
-   responses = [lm.LLMResponse(0, idx, response_text) for idx, response_text in enumerate(response_texts)]
-   for response in responses:
-       response.parse_verilog()
-   return responses
-
-def get_iteration_model(iteration, mixed_model_config):
-   sorted_models = sorted(mixed_model_config.values(), key=lambda x: x['start_iteration'], reverse=True)
-   family, model_id = None, None
-   for model_info in sorted_models:
-       if iteration >= model_info['start_iteration']:
-           family = model_info['model_family']
-           model_id = model_info['model_id']
-           break
-   return family, model_id
-
-def analyze_simulation_results(stdout):
-    """Analyze simulation output and extract mismatch information."""
-    feedback = []
-    current_mismatches = {}
-    mismatch_count = float('inf')
-    
-    # Extract total mismatches
-    total_match = re.search(r'Mismatches:\s*(\d+)\s*in\s*(\d+)', stdout)
-    if total_match:
-        mismatch_count = int(total_match.group(1))
-        total_samples = int(total_match.group(2))
-        feedback.append(f"\nDetected {mismatch_count} mismatches out of {total_samples} samples")
-    
-    # Extract per-signal mismatches and timing
-    signal_pattern = r"Output '(\w+)' has (\d+) mismatches. First mismatch occurred at time (\d+)"
-    for match in re.finditer(signal_pattern, stdout):
-        signal, count, first_time = match.group(1), int(match.group(2)), int(match.group(3))
-        current_mismatches[signal] = {"count": count, "first_time": first_time}
-        if count > 0:
-            feedback.append(f"- Signal {signal}: {count} mismatches, first occurred at time {first_time}")
-    
-    return feedback, current_mismatches, mismatch_count
-def verilog_loop(design_prompt, module, testbench, max_iterations, model_type, model_id="", num_candidates=5, outdir="", log=None, mixed_model_config={}):
-   if outdir != "":
-       outdir = outdir + "/"
-   conv = cv.Conversation(log_file=log)
-   conv.add_message("system", """You are a Verilog code generator that learns from compilation and simulation feedback. 
-   Follow these rules:
-   1. Only use signals/ports defined in the module interface
-   2. Follow the design requirements exactly as specified in the prompt
-   3. Learn from any compilation errors
-   4. Maintain the exact module interface as given""")
-   conv.add_message("user", design_prompt)
-
-   success = False
-   timeout = False
-   iterations = 0
-   global_max_response = lm.LLMResponse(-3, -3, "")
-   best_mismatches = float('inf')  # Track best result
-   best_output_mismatches = {}  # Track best performance per signal
-   best_code = None  # Store best code
-
-   while not (success or timeout):
-       # If we have successful compilation from previous iteration, include it
-       if best_code and best_mismatches < float('inf'):
-           feedback = [
-               f"\nPrevious iteration achieved {best_mismatches} mismatches.",
-               "Analysis of best attempt so far:"
-           ]
-           
-           # Add timing-based analysis
-           early_failures = [sig for sig, data in best_output_mismatches.items() 
-                           if data['first_time'] < 100 and data['count'] > 0]
-           if early_failures:
-               feedback.append(f"Signals failing early (check initialization): {', '.join(early_failures)}")
-           
-           late_failures = [sig for sig, data in best_output_mismatches.items() 
-                          if data['first_time'] >= 100 and data['count'] > 0]
-           if late_failures:
-               feedback.append(f"Signals failing during operation: {', '.join(late_failures)}")
-           
-           conv.add_message("user", "\n".join(feedback))
-
-       if mixed_model_config:
-           model_type, model_id = get_iteration_model(iterations, mixed_model_config)
-
-       responses = generate_verilog_responses(conv, model_type, model_id, num_candidates=num_candidates)
-       
-       for idx, response in enumerate(responses):
-           response_outdir = os.path.join(outdir, f"iter{iterations}/response{idx}/")
-           os.makedirs(response_outdir, exist_ok=True)
-           response.parse_verilog()
-
-           backend = RivieraPROBackend(
-               verilog_file=os.path.join(response_outdir, f"{module}.sv"),
-               testbench_file=testbench
-           )
-
-           compile_output = backend.compile()
-           if "0 Errors" in compile_output:
-               return_code, stderr, stdout = backend.simulate()
-               
-               if stdout:
-                   feedback, current_mismatches, mismatch_count = analyze_simulation_results(stdout)
-                   
-                   # Check for improvement
-                   if mismatch_count < best_mismatches:
-                       improvement_msg = [
-                           f"\nImprovement found: {best_mismatches} -> {mismatch_count} mismatches",
-                           "Changes in signal behavior:"
-                       ]
-                       
-                       for signal, data in current_mismatches.items():
-                           prev_data = best_output_mismatches.get(signal, {'count': float('inf')})
-                           if data['count'] < prev_data['count']:
-                               improvement_msg.append(
-                                   f"- {signal} improved: {prev_data['count']} -> {data['count']} mismatches"
-                               )
-                       
-                       feedback.extend(improvement_msg)
-                       best_mismatches = mismatch_count
-                       best_code = response.parsed_text
-                       best_output_mismatches = current_mismatches
-                       
-                       if mismatch_count == 0:
-                           print("Perfect match achieved - stopping iterations")
-                           return global_max_response
-                       
-                       response.rank = 1
-                       global_max_response = response
-                   else:
-                       response.rank = -1
-                   
-                   response.message = "\n".join(feedback)
-           else:
-               response.rank = -1
-               response.message = compile_output or "Compilation errors occurred."
-
-           # Save logs for each iteration
-           with open(os.path.join(response_outdir, "log.txt"), 'w') as file:
-               file.write('\n'.join(str(i) for i in conv.get_messages()))
-               file.write(format_message("assistant", response.full_text))
-               file.write('\n\n Iteration rank: ' + str(response.rank) + '\n')
-               file.write(f"\n Model: {model_id}")
-               if current_mismatches:
-                   file.write("\n\nMismatch Analysis:\n")
-                   for signal, data in current_mismatches.items():
-                       file.write(f"{signal}: {data['count']} mismatches (first at {data['first_time']})\n")
-
-       if not success:
-           max_rank_response = max(responses, key=lambda resp: (resp.rank, -resp.parsed_length))
-           
-           conv.add_message("assistant", max_rank_response.parsed_text)
-           conv.remove_message(2)
-           conv.remove_message(2)
-           conv.add_message("user", max_rank_response.message)
-
-       timeout = iterations >= max_iterations
-       iterations += 1
-
-   return global_max_response
+import subprocess
+import languagemodels as lm
+import model_pool
+import llm_cache
+import conversation as cv
+import os
+import re
+import json
+import copy
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from time import time
+import tools
+import verilog_lint
+import verilog_extract
+from verilog_extract import clean_generated_verilog, find_verilog_modules
+import verilog_header
+import vcd_reader
+import pipeline
+from sim_cache import SimulationCache
+from simulator_session import get_session
+from search_scheduler import SearchScheduler
+from model_router import ModelRouter
+
+def format_message(role, content):
+   return f"\n{{role : '{role}', content : '{content}'}}"
+
+def sanitize_verilog_code(code):
+   """Clean and format Verilog code."""
+   code = clean_generated_verilog(code)
+   if not code.strip().startswith('`timescale'):
+       code = '`timescale 1ns / 1ps\n\n' + code
+   lines, indent_level = [], 0
+   for line in code.split('\n'):
+       line = line.strip()
+       if line:
+           if any(keyword in line for keyword in ['end', 'endmodule', 'endcase']):
+               indent_level = max(0, indent_level - 1)
+           lines.append('    ' * indent_level + line)
+           if any(keyword in line for keyword in ['begin', 'case', 'module']):
+               indent_level += 1
+   return '\n'.join(lines)
+
+def write_code_blocks_to_file(markdown_string, module_name, filename):
+   code_blocks = find_verilog_modules(markdown_string)
+   if not code_blocks:
+       print("No valid Verilog modules found in response")
+       return False
+   try:
+       with open(filename, 'w') as file:
+           for code_block in code_blocks:
+               cleaned_code = sanitize_verilog_code(code_block)
+               if '`timescale' not in cleaned_code:
+                   file.write('`timescale 1ns / 1ps\n\n')
+               if '`define RESET_VAL' not in cleaned_code:
+                   file.write('`define RESET_VAL 4\'b0000\n\n')
+               file.write(cleaned_code)
+               file.write('\n\n')
+       return True
+   except Exception as e:
+       print(f"Error writing to file: {e}")
+       return False
+
+def analyze_compilation_errors(compile_output):
+   """Analyze compilation output to identify common Verilog syntax issues."""
+   issues = {
+       'missing_endmodule': False,
+       'undefined_macros': set(),
+       'syntax_errors': [],
+       'timing_issues': False,
+       'macro_name_errors': False
+   }
+   if compile_output:
+       lines = compile_output.split('\n')
+       for line in lines:
+           if "module/macromodule...endmodule pair(s) mismatch" in line:
+               issues['missing_endmodule'] = True
+           elif "Macro" in line and "is not defined" in line:
+               macro_name = line.split("Macro")[1].split("is not defined")[0].strip()
+               issues['undefined_macros'].add(macro_name)
+           elif "Name of macro is not specified" in line:
+               issues['macro_name_errors'] = True
+           elif "Syntax error" in line:
+               issues['syntax_errors'].append(line)
+           elif "timescale" in line:
+               issues['timing_issues'] = True
+   return issues
+
+def generate_verilog_responses(conv, model_type, model_id="", num_candidates=1, stop_at_module=None, header=None):
+   """Generate and parse num_candidates responses.
+
+   With stop_at_module, streaming providers stop reading a response once that module is complete.
+   With header (the prompt's parsed ModuleHeader), candidate headers are checked and repaired against it.
+   """
+   response_texts = get_model(model_type, model_id).generate(conversation=conv, num_candidates=num_candidates,
+                                                             stop_at_module=stop_at_module)
+   responses = [lm.LLMResponse(0, idx, response_text) for idx, response_text in enumerate(response_texts)]
+   for response in responses:
+       response.parse_verilog(header)
+   return responses
+
+def stream_verilog_responses(conv, model_type, model_id="", num_candidates=1, stop_at_module=None, header=None):
+   """Like generate_verilog_responses, but yield (index, response) as each candidate completes."""
+   model = get_model(model_type, model_id)
+   for idx, response_text in model.generate_streaming(conv, num_candidates, stop_at_module=stop_at_module):
+       response = lm.LLMResponse(0, idx, response_text)
+       response.parse_verilog(header)
+       yield idx, response
+
+def get_model(model_type, model_id=""):
+   """The model to request candidates from, behind the response cache when one is configured."""
+   # Models come from the process-wide pool, so local weights are loaded once per run
+   cache = llm_cache.get_cache()
+   if cache is not None:
+       return llm_cache.CachedLLM(cache, model_type, model_id, partial(model_pool.get_model, model_type, model_id))
+   return model_pool.get_model(model_type, model_id)
+
+def syntax_check(verilog_file, testbench, simulator="RivieraPRO", syntax_simulator=None, run_dir=None):
+   """Check the design with a cheap syntax-only tool before paying for a full compile.
+
+   syntax_simulator names the tool to use, or "auto" for the fastest installed one. Returns
+   (ok, output); the check is skipped (ok, "") when it would use the main simulator anyway.
+   """
+   name = tools.fastest_available_simulator() if syntax_simulator == "auto" else syntax_simulator
+   if not name or tools.get_simulator(name) is tools.get_simulator(simulator):
+       return True, ""
+   checker = tools.create_backend(name, verilog_file, testbench, run_dir=run_dir)
+   output = checker.check_syntax()
+   return checker.compile_succeeded(output), output
+
+def load_response_log(response_dir):
+   """Read a candidate's response.json, with the request's messages resolved from the conversation log.
+
+   Records written without a log already hold their messages.
+   """
+   with open(os.path.join(response_dir, "response.json"), 'r') as f:
+       record = json.load(f)
+   if record["conversation_log"]:
+       record["messages"] = cv.resolve_messages(record["conversation_log"], record["request_message_ids"])
+   return record
+
+def abort_budget(early_abort, mismatch_budget=None, best_mismatches=float('inf')):
+   """Mismatch budget for the next simulations, or None when early abort is off.
+
+   A candidate with more mismatches than the best so far cannot replace it, so the best count
+   caps the configured budget. 0 means no limit is known yet.
+   """
+   if not early_abort:
+       return None
+   limits = [limit for limit in (mismatch_budget, best_mismatches) if limit is not None and limit != float('inf')]
+   return int(min(limits)) if limits else 0
+
+def evaluate_candidate(verilog_file, testbench, run_dir=None, simulator="RivieraPRO", cache_dir=None, tb_lib_dir=None,
+                       persistent_simulator=False, syntax_simulator=None, mismatch_budget=None):
+   """Compile and simulate a single candidate. Runs in a worker process when evaluating in parallel."""
+   syntax_ok, syntax_output = syntax_check(verilog_file, testbench, simulator, syntax_simulator, run_dir)
+   if not syntax_ok:
+       return syntax_output, None
+
+   cache = SimulationCache(cache_dir) if cache_dir else None
+   # Each worker process keeps its own simulator session alive between candidates
+   session = get_session() if persistent_simulator else None
+   backend = tools.create_backend(simulator, verilog_file, testbench, run_dir=run_dir,
+                                  cache=cache, tb_lib_dir=tb_lib_dir, session=session, mismatch_budget=mismatch_budget)
+   compile_output = backend.compile()
+   if backend.compile_succeeded(compile_output):
+       return compile_output, backend.simulate()
+   return compile_output, None
+
+def evaluate_candidates(jobs, workers=1, executor=None, **options):
+   """Evaluate (verilog_file, testbench, run_dir) jobs, returning results in job order.
+
+   options are passed on to evaluate_candidate. With workers > 1 the jobs are spread over
+   a process pool; an existing executor can be passed in to share one pool between loops.
+   """
+   evaluate = partial(evaluate_candidate, **options)
+   if executor is not None:
+       futures = [executor.submit(evaluate, *job) for job in jobs]
+       return [future.result() for future in futures]
+   if workers <= 1 or len(jobs) <= 1:
+       return [evaluate(*job) for job in jobs]
+   with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+       return list(pool.map(evaluate, *zip(*jobs)))
+
+# One lock per testbench library, so prompts run concurrently by batch_runner never compile
+# (or remove) the same library at once
+_testbench_locks = {}
+_testbench_locks_lock = threading.Lock()
+
+def prepare_shared_testbench(simulator, testbench, outdir):
+   """Compile the testbench once into outdir/tb_lib; returns its path, or None if it cannot be used.
+
+   Only the process that runs the loop calls this; simulation workers just read the library.
+   When the simulator has no such library or the testbench fails to compile, every candidate
+   compiles the testbench itself, as without shared_testbench.
+   """
+   # Compiling it up front means parallel workers only compile their design
+   simulator_class = tools.get_simulator(simulator)
+   if not hasattr(simulator_class, "prepare_testbench_library"):
+       return None
+   tb_lib_dir = os.path.abspath(os.path.join(outdir, "tb_lib"))
+   with _testbench_locks_lock:
+       lock = _testbench_locks.setdefault(tb_lib_dir, threading.Lock())
+   with lock:
+       ok, output = simulator_class.prepare_testbench_library(testbench, tb_lib_dir)
+   if not ok:
+       print(f"Warning: Could not precompile the testbench into {tb_lib_dir}; "
+             f"compiling it with every candidate instead:\n{output}")
+       return None
+   return tb_lib_dir
+
+def start_conversation(design_prompt, log=None, context_tokens=None, context_policy="collapse"):
+   """A conversation holding the pinned system message and design prompt.
+
+   Without context_tokens, requests send only the latest candidate and its feedback after the prompt.
+   """
+   conv = cv.Conversation(log_file=log, token_budget=context_tokens, policy=context_policy,
+                          max_turns=1 if context_tokens is None else None)
+   conv.add_message("system", """You are a Verilog code generator that learns from compilation and simulation feedback. 
+   Follow these rules:
+   1. Only use signals/ports defined in the module interface
+   2. Follow the design requirements exactly as specified in the prompt
+   3. Learn from any compilation errors
+   4. Maintain the exact module interface as given""", pinned=True)
+   conv.add_message("user", design_prompt, pinned=True)
+   return conv
+
+def prompt_header(design_prompt, module):
+   """Port model of the prompt's module, used to wrap bare bodies and repair mismatched headers."""
+   header = verilog_header.parse_module_header(design_prompt, module)
+   if header is None:
+       print(f"Warning: No {module} header found in the design prompt; candidate headers will not be checked")
+   return header
+
+def prepare_candidate(response, response_outdir, module, testbench, header=None, syntax_prescreen=True):
+   """Write a response's design into response_outdir and lint it.
+
+   Returns (job, None) with the evaluate_candidate job, or (None, result) if linting already failed it.
+   """
+   os.makedirs(response_outdir, exist_ok=True)
+   response.parse_verilog(header)
+
+   verilog_file = os.path.join(response_outdir, f"{module}.sv")
+   with open(verilog_file, 'w') as file:
+       file.write(response.parsed_text)
+
+   # Lint failures are reported like compile errors and never reach the simulator
+   if syntax_prescreen:
+       lint_ok, lint_output = verilog_lint.prescreen(verilog_file)
+       if not lint_ok:
+           return None, (lint_output, None)
+   return (verilog_file, testbench, response_outdir), None
+
+def prepare_candidates(responses, response_dir, module, testbench, header=None, syntax_prescreen=True):
+   """Write every response's design into its own directory under response_dir and lint it.
+
+   Returns (jobs, job_indices, response_outdirs, results): the evaluate_candidates jobs, the
+   response index of each job, every response's directory, and a per-response results list
+   in which lint failures are already filled in.
+   """
+   # Write every candidate into its own directory so each one gets an isolated work library
+   jobs, job_indices = [], []
+   response_outdirs = []
+   results = [None] * len(responses)
+   for idx, response in enumerate(responses):
+       response_outdir = os.path.join(response_dir, f"response{idx}/")
+       response_outdirs.append(response_outdir)
+       job, results[idx] = prepare_candidate(response, response_outdir, module, testbench, header, syntax_prescreen)
+       if job is not None:
+           jobs.append(job)
+           job_indices.append(idx)
+   return jobs, job_indices, response_outdirs, results
+
+def rank_candidate(response, compile_output, sim_output):
+   """Set a response's mismatches, rank (-1) and feedback message from its evaluation.
+
+   Returns the per-signal mismatches of the simulation ({} if it did not simulate).
+   """
+   response.rank = -1
+   if sim_output is None:
+       response.message = compile_output or "Compilation errors occurred."
+       return {}
+   if not sim_output.stdout:
+       response.message = sim_output.error or sim_output.stderr or "Simulation produced no output."
+       return {}
+   # The simulation output was parsed once, when the result was built
+   response.mismatches = sim_output.mismatch_count
+   response.message = "\n".join(sim_output.feedback())
+   response.output_mismatches = sim_output.signal_mismatches()
+   return response.output_mismatches
+
+def candidate_feedback(response, response_outdir, vcd_windows=3):
+   """The message sent back about a candidate, with mismatch windows from its wave.vcd."""
+   # Only the candidate whose feedback is sent gets its waveform dump read, and only for the
+   # outputs the testbench reported mismatches on (all of them if it reported none by name)
+   if vcd_windows and 0 < response.mismatches < float('inf'):
+       vcd_file = os.path.join(response_outdir, "wave.vcd")
+       outputs = [name for name, info in response.output_mismatches.items() if info["count"] > 0] or None
+       return "\n".join([response.message] + vcd_reader.mismatch_feedback(vcd_file, vcd_windows, outputs))
+   return response.message
+
+def write_response_record(response_outdir, response, log, request_messages, model_id, request_tokens,
+                          mismatches, sim_output):
+   """Write a candidate's response.json (see load_response_log).
+
+   request_messages are the Conversation.request_records() of the request that produced the response.
+   """
+   record = {
+       "conversation_log": os.path.abspath(log) if log else None,
+       "request_message_ids": [message["id"] for message in request_messages],
+       "response": response.full_text,
+       "rank": response.rank,
+       "model": model_id,
+       "prompt_tokens": request_tokens,
+       "mismatches": mismatches,
+       "simulation": sim_output.to_dict(include_output=False) if sim_output is not None else None,
+   }
+   # The request is recorded as ids into the conversation log rather than a copy of every message;
+   # without a log there is nothing to point into, so the messages are written out
+   if not log:
+       record["messages"] = request_messages
+   with open(os.path.join(response_outdir, "response.json"), 'w') as file:
+       json.dump(record, file, indent=1)
+
+def improvement_feedback(best_mismatches, mismatch_count, best_output_mismatches, current_mismatches):
+   """Lines describing how a candidate improved on the best one so far."""
+   improvement_msg = [
+       f"\nImprovement found: {best_mismatches} -> {mismatch_count} mismatches",
+       "Changes in signal behavior:"
+   ]
+
+   for signal, data in current_mismatches.items():
+       prev_data = best_output_mismatches.get(signal, {'count': float('inf')})
+       if data['count'] < prev_data['count']:
+           improvement_msg.append(
+               f"- {signal} improved: {prev_data['count']} -> {data['count']} mismatches"
+           )
+   return improvement_msg
+
+def progress_feedback(best_mismatches, best_output_mismatches):
+   """Summary of the best attempt so far, sent before every request once one has simulated."""
+   feedback = [
+       f"\nPrevious iteration achieved {best_mismatches} mismatches.",
+       "Analysis of best attempt so far:"
+   ]
+
+   # Add timing-based analysis
+   early_failures = [sig for sig, data in best_output_mismatches.items()
+                     if data['first_time'] < 100 and data['count'] > 0]
+   if early_failures:
+       feedback.append(f"Signals failing early (check initialization): {', '.join(early_failures)}")
+
+   late_failures = [sig for sig, data in best_output_mismatches.items()
+                    if data['first_time'] >= 100 and data['count'] > 0]
+   if late_failures:
+       feedback.append(f"Signals failing during operation: {', '.join(late_failures)}")
+   return "\n".join(feedback)
+
+def next_messages(response, response_outdir, vcd_windows, best_mismatches, best_output_mismatches):
+   """The (role, content) messages that send response back for repair, ahead of the next request."""
+   messages = [("assistant", response.parsed_text),
+               ("user", candidate_feedback(response, response_outdir, vcd_windows))]
+   # If we have successful compilation from a previous iteration, include it
+   if best_mismatches < float('inf'):
+       messages.append(("user", progress_feedback(best_mismatches, best_output_mismatches)))
+   return messages
+
+def verilog_loop(design_prompt, module, testbench, max_iterations, model_type, model_id="", num_candidates=5, outdir="", log=None, mixed_model_config={}, workers=1, executor=None, simulator="RivieraPRO", shared_testbench=False, syntax_prescreen=True, llm_semaphore=None, early_stop=True, context_tokens=None, context_policy="collapse", vcd_windows=3, early_abort=False, mismatch_budget=None, scheduler=None, pipelined=False, speculative=False, router=None, **sim_options):
+   """Iteratively generate, evaluate and repair candidates until one passes the testbench.
+
+   With syntax_prescreen, structurally broken candidates are rejected in-process before any
+   simulator runs. llm_semaphore, when given, is held around every LLM request so several
+   loops running in threads share one concurrency limit. With early_stop, streamed responses are
+   cut off once the module is complete. With context_tokens, requests are kept within that many
+   tokens by collapsing or evicting older feedback turns (context_policy); without it only the
+   latest candidate and its feedback are sent back. The feedback on the best candidate lists up to vcd_windows mismatch windows per
+   output from its wave.vcd (0 disables this). With early_abort,
+   simulations stop once a candidate has more mismatches than mismatch_budget or than the best
+   candidate so far. scheduler (a search_scheduler.SearchScheduler, by default a fixed one with
+   num_candidates) picks the candidate count of every iteration, decides which candidates are
+   simulated in full and ends the loop when its token or simulation budget is spent.
+   With pipelined, candidates are compiled and simulated as soon as each one arrives rather
+   than once all have (see pipeline.run_round); with speculative as well, the next request is
+   sent as soon as one candidate has simulated, assuming it will be the one sent back, and its
+   responses are used if the assumption holds. router (a model_router.ModelRouter, by default
+   one following mixed_model_config's start_iterations) picks the model of every iteration
+   and is told how each request went.
+   sim_options (cache_dir, persistent_simulator, syntax_simulator) are passed to evaluate_candidate.
+   """
+   if executor is None and workers > 1:
+       # Keep one pool for the whole run so worker processes (and their simulator sessions) are reused
+       with ProcessPoolExecutor(max_workers=workers) as pool:
+           return verilog_loop(design_prompt, module, testbench, max_iterations, model_type, model_id, num_candidates,
+                               outdir, log, mixed_model_config, workers=workers, executor=pool, simulator=simulator,
+                               shared_testbench=shared_testbench, syntax_prescreen=syntax_prescreen,
+                               llm_semaphore=llm_semaphore, early_stop=early_stop, context_tokens=context_tokens,
+                               context_policy=context_policy, vcd_windows=vcd_windows, early_abort=early_abort,
+                               mismatch_budget=mismatch_budget, scheduler=scheduler, pipelined=pipelined,
+                               speculative=speculative, router=router, **sim_options)
+
+   if outdir != "":
+       outdir = outdir + "/"
+
+   if shared_testbench:
+       sim_options["tb_lib_dir"] = prepare_shared_testbench(simulator, testbench, outdir)
+   conv = start_conversation(design_prompt, log, context_tokens, context_policy)
+   header = prompt_header(design_prompt, module)
+
+   success = False
+   timeout = False
+   iterations = 0
+   global_max_response = lm.LLMResponse(-3, -3, "")
+   best_mismatches = float('inf')  # Track best result
+   best_output_mismatches = {}  # Track best performance per signal
+   best_code = None  # Store best code
+   if scheduler is None:
+       scheduler = SearchScheduler(num_candidates)
+   if router is None and mixed_model_config:
+       router = ModelRouter(mixed_model_config)
+   if pipelined and scheduler.adaptive:
+       print("Warning: Successive halving needs every candidate of an iteration at once; not pipelining")
+       pipelined = False
+   # Next-iteration requests started early, and the one that turned out to be right
+   speculation, prefetched = None, None
+   speculation_pool = ThreadPoolExecutor(max_workers=1) if pipelined and speculative else None
+
+   def evaluate(batch, budget):
+       return evaluate_candidates(batch, workers=workers, executor=executor, simulator=simulator,
+                                  mismatch_budget=budget, **sim_options)
+
+   def request(request_conv, family, model, count):
+       with llm_semaphore or nullcontext():
+           return generate_verilog_responses(request_conv, family, model, num_candidates=count,
+                                             stop_at_module=module if early_stop else None, header=header)
+
+   def stream(request_conv, family, model, count):
+       with llm_semaphore or nullcontext():
+           yield from stream_verilog_responses(request_conv, family, model, num_candidates=count,
+                                               stop_at_module=module if early_stop else None, header=header)
+
+   def next_request(iteration, best):
+       """The model and candidate count of iteration, given the best mismatch count before it."""
+       family, model = router.choose(iteration) if router is not None else (model_type, model_id)
+       return family, model, scheduler.num_candidates(best)
+
+   while not (success or timeout):
+       exhausted = scheduler.exhausted()
+       if exhausted:
+           print(f"Debug: Stopping search: {exhausted}")
+           break
+
+       model_type, model_id, count = next_request(iterations, best_mismatches)
+       request_tokens = conv.request_tokens()
+       request_messages = conv.request_records()
+       print(f"Debug: Iteration {iterations} request: {request_tokens} tokens")
+       request_start = generated = time()
+       previous_best = best_mismatches
+
+       if pipelined:
+           response_dir = os.path.join(outdir, f"iter{iterations}")
+           arrived = {}
+
+           def prepare(idx, response):
+               nonlocal generated
+               arrived[idx] = response
+               generated = time()
+               return prepare_candidate(response, os.path.join(response_dir, f"response{idx}/"), module, testbench,
+                                        header, syntax_prescreen)
+
+           def start_speculation(idx, result):
+               """Request the next iteration as if the first candidate to finish is the one sent back."""
+               nonlocal speculation
+               if iterations >= max_iterations:
+                   return
+               response = copy.copy(arrived[idx])
+               current_mismatches = rank_candidate(response, *result)
+               best, best_outputs = best_mismatches, best_output_mismatches
+               if response.mismatches < best and not result[1].aborted:
+                   response.message = "\n".join([response.message] + improvement_feedback(
+                       best, response.mismatches, best_outputs, current_mismatches))
+                   best, best_outputs = response.mismatches, current_mismatches
+               if best == 0:
+                   return
+               messages = next_messages(response, os.path.join(response_dir, f"response{idx}/"), vcd_windows,
+                                        best, best_outputs)
+               speculation = pipeline.speculate(conv, messages, request, *next_request(iterations + 1, best),
+                                                speculation_pool)
+
+           if prefetched is not None:
+               candidates = enumerate(prefetched.future.result())
+           else:
+               candidates = stream(conv, model_type, model_id, count)
+           budget = abort_budget(early_abort, mismatch_budget, best_mismatches)
+           evaluated, sim_seconds = pipeline.run_round(
+               candidates, prepare, partial(evaluate_candidate, simulator=simulator, mismatch_budget=budget, **sim_options),
+               workers, executor, start_speculation if speculation_pool is not None else None)
+           scheduler.record_simulation(sim_seconds)
+           indices = sorted(arrived)
+           responses = [arrived[idx] for idx in indices]
+           results = [evaluated[idx] for idx in indices]
+           scheduler.record_results(results)
+           response_outdirs = [os.path.join(response_dir, f"response{idx}/") for idx in indices]
+       else:
+           if prefetched is not None:
+               responses = prefetched.future.result()
+           else:
+               responses = request(conv, model_type, model_id, count)
+           generated = time()
+           jobs, job_indices, response_outdirs, results = prepare_candidates(
+               responses, os.path.join(outdir, f"iter{iterations}"), module, testbench, header, syntax_prescreen)
+
+           job_results = scheduler.evaluate(jobs, evaluate, abort_budget(early_abort, mismatch_budget, best_mismatches))
+           for idx, result in zip(job_indices, job_results):
+               results[idx] = result
+       tokens = scheduler.record_generation(request_tokens, [response.full_text for response in responses])
+       prefetched = None
+
+       for idx, (response, (compile_output, sim_output)) in enumerate(zip(responses, results)):
+           current_mismatches = rank_candidate(response, compile_output, sim_output)
+           mismatch_count = response.mismatches
+
+           # Check for improvement
+           # An aborted run's count is only a lower bound, so it never becomes the best
+           if mismatch_count < best_mismatches and not sim_output.aborted:
+               response.message = "\n".join([response.message] + improvement_feedback(
+                   best_mismatches, mismatch_count, best_output_mismatches, current_mismatches))
+               best_mismatches = mismatch_count
+               best_code = response.parsed_text
+               best_output_mismatches = current_mismatches
+               response.rank = 1
+               global_max_response = response
+
+               if mismatch_count == 0:
+                   print("Perfect match achieved - stopping iterations")
+                   if router is not None:
+                       router.record(model_type, model_id, tokens, generated - request_start, True)
+                   conv.flush_log()
+                   if speculation_pool is not None:
+                       speculation_pool.shutdown(wait=False, cancel_futures=True)
+                   return global_max_response
+
+           write_response_record(response_outdirs[idx], response, log, request_messages, model_id, request_tokens,
+                                 current_mismatches, sim_output)
+
+       if router is not None:
+           router.record(model_type, model_id, tokens, generated - request_start, best_mismatches < previous_best)
+
+       if not responses:
+           # Nothing arrived (e.g. the stream ended before any candidate), so there is nothing
+           # to send back; the next iteration asks again with the same conversation
+           print(f"Warning: Iteration {iterations} produced no candidates")
+           if speculation is not None:
+               pipeline.discard(speculation, scheduler)
+               speculation = None
+       elif not success:
+           max_rank_response = max(responses, key=lambda resp: (resp.rank, -resp.parsed_length))
+           
+           # Older turns are dropped by the conversation's turn limit, or windowed to its token budget
+           messages = next_messages(max_rank_response, response_outdirs[responses.index(max_rank_response)],
+                                    vcd_windows, best_mismatches, best_output_mismatches)
+           if pipeline.matches(speculation, messages, *next_request(iterations + 1, best_mismatches)):
+               print("Debug: The speculative request for the next iteration was right; using its responses")
+               conv, prefetched = speculation.conversation, speculation
+           else:
+               if speculation is not None:
+                   print("Debug: Discarding the speculative request for the next iteration")
+                   pipeline.discard(speculation, scheduler)
+               for role, content in messages:
+                   conv.add_message(role, content)
+           speculation = None
+
+       conv.flush_log()
+       timeout = iterations >= max_iterations
+       iterations += 1
+
+   if speculation_pool is not None:
+       speculation_pool.shutdown(wait=False, cancel_futures=True)
+   print(f"Debug: {scheduler.report()}")
+   return global_max_response
@@ -0,0 +1,223 @@
+import re
+from collections import namedtuple
+
+from verilog_lint import tokenize
+
+Port = namedtuple("Port", ["name", "direction", "kind", "signed", "width"])
+Parameter = namedtuple("Parameter", ["name", "value"])
+# start/end are the offsets of the header ("module" .. ";") in the parsed text
+ModuleHeader = namedtuple("ModuleHeader", ["name", "parameters", "ports", "ansi", "start", "end"])
+
+_DIRECTIONS = {"input", "output", "inout"}
+_KINDS = {"wire", "reg", "logic", "tri", "var", "integer", "bit"}
+_SPACE = re.compile(r'\s+')
+
+
+def _split_items(tokens):
+    """Split tokens on commas that are not nested in brackets."""
+    items, current, depth = [], [], 0
+    for token in tokens:
+        if token.value in ("(", "[", "{"):
+            depth += 1
+        elif token.value in (")", "]", "}"):
+            depth -= 1
+        if token.value == "," and depth == 0:
+            items.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        items.append(current)
+    return items
+
+
+def _matching(tokens, index):
+    """Index of the bracket closing the one at tokens[index]."""
+    depth = 0
+    for position in range(index, len(tokens)):
+        if tokens[position].value in ("(", "[", "{"):
+            depth += 1
+        elif tokens[position].value in (")", "]", "}"):
+            depth -= 1
+            if depth == 0:
+                return position
+    return len(tokens) - 1
+
+
+def _parse_parameters(text, tokens):
+    parameters = []
+    for item in _split_items(tokens):
+        equals = next((idx for idx, token in enumerate(item) if token.value == "="), len(item))
+        names = [token.value for token in item[:equals] if token.kind == "identifier"]
+        if not names:
+            continue
+        value = text[item[equals + 1].start:item[-1].end] if equals + 1 < len(item) else ""
+        parameters.append(Parameter(names[-1], value))
+    return parameters
+
+
+def _parse_ports(text, tokens):
+    """Return (ports, ansi) for the tokens inside a module's port list."""
+    ports = []
+    ansi = False
+    direction = kind = width = None
+    signed = False
+    for item in _split_items(tokens):
+        idx = 0
+        if item[idx].value in _DIRECTIONS | _KINDS:
+            # A body declaration may give only the kind ("reg [7:0] q;")
+            if item[idx].value in _DIRECTIONS:
+                ansi = True
+                direction = item[idx].value
+                idx += 1
+            else:
+                direction = None
+            kind, signed, width = None, False, None
+            if idx < len(item) and item[idx].value in _KINDS:
+                kind = item[idx].value
+                idx += 1
+            if idx < len(item) and item[idx].value == "signed":
+                signed = True
+                idx += 1
+            ranges = []
+            while idx < len(item) and item[idx].value == "[":
+                end = _matching(item, idx)
+                ranges.append(text[item[idx].start:item[end].end])
+                idx = end + 1
+            width = "".join(ranges) or None
+        names = [token.value for token in item[idx:] if token.kind == "identifier"]
+        if not names:
+            continue
+        # A port without a direction continues the previous ANSI declaration ("input a, b")
+        ports.append(Port(names[0], direction, kind, signed, width))
+    return ports, ansi
+
+
+def _body_declarations(text, position):
+    """Directions, kinds and widths declared in a non-ANSI module body, keyed by port name."""
+    declarations = {}
+    statement = []
+    for token in tokenize(text, start=position):
+        if token.value == "endmodule":
+            break
+        if token.value != ";":
+            statement.append(token)
+            continue
+        if statement and statement[0].value in _DIRECTIONS | _KINDS:
+            ports, _ = _parse_ports(text, statement)
+            for port in ports:
+                previous = declarations.get(port.name)
+                if previous is not None and port.direction is None:
+                    # "reg q;" after "output q;" only adds the kind
+                    port = previous._replace(kind=port.kind or previous.kind)
+                elif previous is not None:
+                    port = port._replace(kind=port.kind or previous.kind)
+                declarations[port.name] = port
+        statement = []
+    return declarations
+
+
+def parse_module_header(text, module_name=None):
+    """Parse the header of the first module (or of module_name) in text into a ModuleHeader.
+
+    Handles parameter lists, parameterized and multi-dimensional widths, and both ANSI and
+    non-ANSI port lists (for the latter, directions are read from the module body). The
+    text only needs to contain the header, as in a design prompt. Returns None if there is
+    no such module. Module keywords in comments and strings are not declarations.
+    """
+    for keyword in tokenize(text):
+        if keyword.kind != "identifier" or keyword.value not in ("module", "macromodule"):
+            continue
+        tokens = []
+        depth = 0
+        for token in tokenize(text, start=keyword.end):
+            tokens.append(token)
+            if token.value in ("(", "[", "{"):
+                depth += 1
+            elif token.value in (")", "]", "}"):
+                depth -= 1
+            elif token.value == ";" and depth <= 0:
+                break
+            elif token.value in ("module", "endmodule"):
+                break
+        if not tokens or tokens[0].kind != "identifier" or tokens[-1].value != ";":
+            continue
+        name = tokens[0].value
+        if module_name is not None and name != module_name:
+            continue
+
+        idx = 1
+        parameters = []
+        if idx < len(tokens) and tokens[idx].value == "#" and idx + 1 < len(tokens) and tokens[idx + 1].value == "(":
+            end = _matching(tokens, idx + 1)
+            parameters = _parse_parameters(text, tokens[idx + 2:end])
+            idx = end + 1
+        ports, ansi = [], True
+        if idx < len(tokens) and tokens[idx].value == "(":
+            end = _matching(tokens, idx)
+            ports, ansi = _parse_ports(text, tokens[idx + 1:end])
+        if ports and not ansi:
+            declared = _body_declarations(text, tokens[-1].end)
+            ports = [declared.get(port.name, port)._replace(name=port.name) for port in ports]
+        return ModuleHeader(name, parameters, ports, ansi, keyword.start, tokens[-1].end)
+    return None
+
+
+def render_port(port):
+    parts = [port.direction, port.kind, "signed" if port.signed else None, port.width, port.name]
+    return " ".join(part for part in parts if part)
+
+
+def render_header(header, kinds=None):
+    """Write header as an ANSI module declaration. kinds overrides the net kind of ports by name."""
+    kinds = kinds or {}
+    ports = [render_port(port._replace(kind=kinds.get(port.name, port.kind))) for port in header.ports]
+    lines = [f"module {header.name}"]
+    if header.parameters:
+        parameters = ",\n".join(f"    parameter {p.name}" + (f" = {p.value}" if p.value else "") for p in header.parameters)
+        lines[0] += f" #(\n{parameters}\n)"
+    lines[0] += " (" if ports else ";"
+    if ports:
+        lines.append(",\n".join(f"    {port}" for port in ports))
+        lines.append(");")
+    return "\n".join(lines)
+
+
+def _same_width(first, second):
+    return _SPACE.sub("", first or "") == _SPACE.sub("", second or "")
+
+
+def header_mismatches(candidate, expected):
+    """Describe how candidate's ports differ from expected's; empty if they agree."""
+    problems = []
+    candidate_ports = {port.name: port for port in candidate.ports}
+    expected_ports = {port.name: port for port in expected.ports}
+    for name, port in expected_ports.items():
+        other = candidate_ports.get(name)
+        if other is None:
+            problems.append(f"missing port {render_port(port)}")
+        elif other.direction != port.direction:
+            problems.append(f"port {name} should be {port.direction}, not {other.direction}")
+        elif not _same_width(other.width, port.width) or other.signed != port.signed:
+            problems.append(f"port {name} should be declared as {render_port(port)}")
+    for name in candidate_ports:
+        if name not in expected_ports:
+            problems.append(f"unexpected port {name}")
+    for parameter in expected.parameters:
+        if parameter.name not in {p.name for p in candidate.parameters}:
+            problems.append(f"missing parameter {parameter.name}")
+    return problems
+
+
+def repair_module(module_text, expected):
+    """Replace a module's ANSI header with the expected one if their ports disagree.
+
+    The candidate's net kinds (e.g. output reg) are kept, since its body relies on them.
+    Non-ANSI candidates are returned unchanged, as their body redeclares the ports.
+    """
+    candidate = parse_module_header(module_text, expected.name)
+    if candidate is None or not candidate.ansi or not header_mismatches(candidate, expected):
+        return module_text
+    kinds = {port.name: port.kind for port in candidate.ports if port.kind}
+    print(f"Debug: Repairing {expected.name} header: {'; '.join(header_mismatches(candidate, expected))}")
+    return module_text[:candidate.start] + render_header(expected, kinds) + module_text[candidate.end:]
@@ -0,0 +1,175 @@
+import re
+from collections import namedtuple
+
+# One alternation scanned left to right; no alternative can backtrack over earlier text,
+# so tokenizing is linear in the input length even for malformed LLM output
+_TOKEN_PATTERN = re.compile(r'''
+    (?P<newline>\n)
+  | (?P<space>[ \t\r\f\v]+)
+  | (?P<comment>//[^\n]*|/\*(?:[^*]|\*(?!/))*(?:\*/|\Z))
+  | (?P<string>"(?:[^"\\\n]|\\.)*")
+  | (?P<directive>`[A-Za-z_]\w*|`)
+  | (?P<number>\d*'[sS]?[bBoOdDhH][ \t]*[0-9a-fA-FxXzZ_?]+|\d[\d_]*(?:\.\d+)?)
+  | (?P<identifier>[A-Za-z_][\w$]*|\\\S+)
+  | (?P<symbol>.)
+''', re.VERBOSE | re.DOTALL)
+
+Token = namedtuple("Token", ["kind", "value", "line", "column", "start", "end"])
+LintError = namedtuple("LintError", ["line", "column", "message"])
+
+# Opening keyword -> keywords that close it
+_BLOCKS = {
+    "module": ("endmodule",),
+    "macromodule": ("endmodule",),
+    "begin": ("end",),
+    "case": ("endcase",),
+    "casex": ("endcase",),
+    "casez": ("endcase",),
+    "function": ("endfunction",),
+    "task": ("endtask",),
+    "generate": ("endgenerate",),
+    "fork": ("join", "join_any", "join_none"),
+    "specify": ("endspecify",),
+    "primitive": ("endprimitive",),
+}
+_CLOSERS = {closer for closers in _BLOCKS.values() for closer in closers}
+# Keywords after which a block keyword does not open a block (wait fork, disable fork)
+_NON_OPENING_PREFIXES = {"wait", "disable"}
+# Keywords of a DPI import or export, whose prototype ends at the next ';'
+_DPI_KEYWORDS = {"import", "export"}
+_BRACKETS = {"(": ")", "[": "]", "{": "}"}
+
+# Compiler directives that are not macro uses
+_DIRECTIVES = {
+    "begin_keywords", "celldefine", "default_nettype", "define", "else", "elsif",
+    "end_keywords", "endcelldefine", "endif", "ifdef", "ifndef", "include", "line",
+    "nounconnected_drive", "pragma", "resetall", "timescale", "unconnected_drive",
+    "undef", "undefineall", "__FILE__", "__LINE__",
+}
+# A backslash that continues a `define body on the next line
+_CONTINUATION = re.compile(r'[ \t]*\r?\n')
+
+
+def tokenize(text, keep_comments=False, start=0):
+    """Yield the tokens of Verilog source text, skipping whitespace (and comments by default).
+
+    Scanning begins at offset start; line numbers then count from there.
+    """
+    line = 1
+    line_start = start
+    for match in _TOKEN_PATTERN.finditer(text, start):
+        kind = match.lastgroup
+        value = match.group()
+        start = match.start()
+        if kind == "newline":
+            line += 1
+            line_start = match.end()
+            continue
+        if kind != "space" and (kind != "comment" or keep_comments):
+            yield Token(kind, value, line, start - line_start + 1, start, match.end())
+        if kind == "comment" and "\n" in value:
+            line += value.count("\n")
+            line_start = start + value.rindex("\n") + 1
+
+
+def lint_verilog(code):
+    """Return LintErrors for structural problems that would certainly fail compilation.
+
+    Only checks that cannot reject a valid design are made: keyword block pairing,
+    bracket balance, undefined macros and empty macro names. Prototypes (extern, pure
+    virtual and DPI import/export declarations) open no blocks, and `define bodies,
+    including their continued lines, are not balanced since they are expanded elsewhere.
+    """
+    errors = []
+    blocks = []
+    brackets = []
+    defined_macros = set()
+    previous = None
+    expect_macro_name = False
+    # Macro bodies are expanded where they are used, so uses inside a `define are not checked
+    define_line = None
+    # Inside an extern, pure virtual or DPI prototype, which has no body to close
+    prototype = False
+
+    for token in tokenize(code):
+        if token.kind == "directive":
+            name = token.value[1:]
+            if not name:
+                errors.append(LintError(token.line, token.column, "Name of macro is not specified."))
+            elif expect_macro_name or token.line == define_line:
+                pass
+            elif name not in _DIRECTIVES and name not in defined_macros:
+                errors.append(LintError(token.line, token.column, f"Macro {name} is not defined."))
+            expect_macro_name = name in ("define", "undef", "ifdef", "ifndef", "elsif")
+            if name == "define":
+                define_line = token.line
+            previous = token
+            continue
+
+        if expect_macro_name and token.kind == "identifier":
+            if previous.value == "`define":
+                defined_macros.add(token.value)
+            elif previous.value == "`undef":
+                defined_macros.discard(token.value)
+        expect_macro_name = False
+
+        if token.line == define_line:
+            if token.value == "\\" and _CONTINUATION.match(code, token.end):
+                define_line += 1
+            previous = token
+            continue
+
+        if token.kind == "identifier":
+            word = token.value
+            if word == "extern" or (word == "virtual" and previous is not None and previous.value == "pure"):
+                prototype = True
+            if word in _BLOCKS:
+                if not (prototype or (previous is not None and previous.value in _NON_OPENING_PREFIXES)):
+                    blocks.append(token)
+            elif word in _CLOSERS:
+                if blocks and word in _BLOCKS[blocks[-1].value]:
+                    blocks.pop()
+                elif word == "endmodule":
+                    errors.append(LintError(token.line, token.column, "module/macromodule...endmodule pair(s) mismatch."))
+                else:
+                    errors.append(LintError(token.line, token.column, f"Syntax error. Unexpected token: {word}."))
+        elif token.kind == "string":
+            if previous is not None and previous.value in _DPI_KEYWORDS:
+                prototype = True
+        elif token.kind == "symbol":
+            if token.value == ";":
+                prototype = False
+            elif token.value in _BRACKETS:
+                brackets.append(token)
+            elif token.value in _BRACKETS.values():
+                if brackets and _BRACKETS[brackets[-1].value] == token.value:
+                    brackets.pop()
+                else:
+                    errors.append(LintError(token.line, token.column, f"Syntax error. Unexpected token: {token.value}."))
+        previous = token
+
+    for token in brackets:
+        errors.append(LintError(token.line, token.column, f"Syntax error. Unmatched {token.value}."))
+    for token in blocks:
+        if token.value in ("module", "macromodule"):
+            errors.append(LintError(token.line, token.column, "module/macromodule...endmodule pair(s) mismatch."))
+        else:
+            errors.append(LintError(token.line, token.column,
+                                    f"Syntax error. {token.value} without matching {_BLOCKS[token.value][0]}."))
+    return sorted(errors)
+
+
+def format_lint_errors(errors, filename):
+    """Render LintErrors like compiler output so analyze_compilation_errors can read them."""
+    lines = [f"Error: {filename} : ({error.line}, {error.column}): {error.message}" for error in errors]
+    lines.append(f"Compile failure {len(errors)} Errors 0 Warnings")
+    return "\n".join(lines)
+
+
+def prescreen(verilog_file):
+    """Lint a design file in-process. Returns (ok, output) with output in compiler format."""
+    with open(verilog_file, 'r') as f:
+        errors = lint_verilog(f.read())
+    if not errors:
+        return True, ""
+    return False, format_lint_errors(errors, verilog_file)